@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from metrics import registry
+
+try:
+    import psutil
+except ImportError:  # Host checks are skipped without psutil
+    psutil = None
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be queued; carries the estimated wait that was too long"""
+
+    def __init__(self, message, estimated_wait_s=None):
+        super().__init__(message)
+        self.estimated_wait_s = estimated_wait_s
+
+
+@dataclass
+class AdmissionConfig:
+    """Process-wide limits; each can be set with an ADMISSION_<NAME> environment variable"""
+    max_browsers: int = 3              # Concurrent Chromium instances
+    max_pages: int = 8                 # Concurrent tabs/contexts across all browsers
+    max_jobs_per_user: int = 1         # Running jobs per user; more wait in the queue
+    max_queue: int = 20                # Waiting jobs before new ones are rejected
+    max_wait_s: float = 600            # Reject when the estimated wait is longer
+    browser_memory_mb: int = 350       # Estimated RAM for one browser...
+    page_memory_mb: int = 120          # ...and for each page in it
+    memory_reserve_mb: int = 512       # RAM always left free so the host never swaps
+    max_cpu_percent: float = 90        # Don't start new browsers above this host CPU
+    initial_job_s: float = 60          # Job duration estimate before any job finished
+    poll_interval_s: float = 0.5
+
+    @classmethod
+    def from_env(cls):
+        config = cls()
+        for name, default in vars(cls()).items():
+            value = os.getenv(f"ADMISSION_{name.upper()}")
+            if value is not None:
+                setattr(config, name, type(default)(value))
+        return config
+
+
+@dataclass
+class Ticket:
+    """One job's claim on browser/page capacity"""
+    ticket_id: int
+    user_id: str
+    browsers: int
+    pages: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    admitted_at: float = None
+    released: bool = False
+
+
+class AdmissionController:
+    """
+    Admits browser jobs across every Streamlit session in the process.
+
+    A job is admitted when browser and page slots are free, the host has room
+    for the job's estimated memory on top of `memory_reserve_mb`, and CPU is
+    below `max_cpu_percent` (the last two need psutil). Waiting jobs are served
+    fairly: users with fewer running jobs go first, then in arrival order, and
+    no user runs more than `max_jobs_per_user` jobs at once. When the queue is
+    full or the estimated wait is too long, the job is rejected instead.
+
+    Sessions run on different threads and event loops, so state is guarded by
+    a threading lock and waiters poll.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or AdmissionConfig()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running = []
+        self._waiting = []
+        self._job_estimate_s = self.config.initial_job_s
+
+    # --- Accounting ---
+    def _usage(self):
+        return (sum(t.browsers for t in self._running), sum(t.pages for t in self._running))
+
+    def _user_running(self, user_id):
+        return sum(1 for t in self._running if t.user_id == user_id)
+
+    def _host_has_room(self, ticket):
+        if psutil is None or not self._running:
+            return True  # Always let one job run so the queue cannot stall
+        needed_mb = (ticket.browsers * self.config.browser_memory_mb
+                     + ticket.pages * self.config.page_memory_mb)
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        if available_mb - needed_mb < self.config.memory_reserve_mb:
+            return False
+        return psutil.cpu_percent(interval=None) < self.config.max_cpu_percent
+
+    def _fits(self, ticket):
+        browsers, pages = self._usage()
+        return (browsers + ticket.browsers <= self.config.max_browsers
+                and pages + ticket.pages <= self.config.max_pages
+                and self._user_running(ticket.user_id) < self.config.max_jobs_per_user
+                and self._host_has_room(ticket))
+
+    def _fair_order(self):
+        return sorted(self._waiting,
+                      key=lambda t: (self._user_running(t.user_id), t.enqueued_at, t.ticket_id))
+
+    def _admit(self, ticket):
+        ticket.admitted_at = time.monotonic()
+        self._running.append(ticket)
+        registry.observe("admission_wait_seconds", ticket.admitted_at - ticket.enqueued_at)
+        registry.inc("admission_total", outcome="admitted")
+
+    def _try_admit_waiting(self, ticket):
+        """Admits `ticket` if it is the first waiting job (in fair order) that may run"""
+        for candidate in self._fair_order():
+            if self._user_running(candidate.user_id) >= self.config.max_jobs_per_user:
+                continue  # This user is at its limit; don't let it block others
+            if candidate is not ticket:
+                return False
+            if not self._fits(ticket):
+                return False
+            self._waiting.remove(ticket)
+            self._admit(ticket)
+            return True
+        return False
+
+    def estimated_wait(self, position):
+        """Seconds until the job at queue `position` (1-based) can expect to start"""
+        rounds = math.ceil(position / max(self.config.max_browsers, 1))
+        return rounds * self._job_estimate_s
+
+    def queue_position(self, ticket):
+        with self._lock:
+            order = self._fair_order()
+            return order.index(ticket) + 1 if ticket in order else 0
+
+    def snapshot(self):
+        """Current usage, for display and metrics"""
+        with self._lock:
+            browsers, pages = self._usage()
+            return {"running": len(self._running), "waiting": len(self._waiting),
+                    "browsers": browsers, "pages": pages,
+                    "job_estimate_s": round(self._job_estimate_s, 1)}
+
+    # --- Public API ---
+    def try_admit(self, user_id, browsers=1, pages=1):
+        """Admits immediately if capacity is free and nobody is waiting; else returns None"""
+        ticket = Ticket(next(self._ids), user_id, browsers, pages)
+        with self._lock:
+            if self._waiting or not self._fits(ticket):
+                return None
+            self._admit(ticket)
+        return ticket
+
+    def resize(self, ticket, browsers, pages):
+        """
+        Changes the claim of a running ticket once the job's real size is known.
+
+        Returns False, leaving the ticket unchanged, if the new claim does not fit
+        right now or other jobs are waiting; the caller should then release the
+        ticket and admit() the job at its real size.
+        """
+        with self._lock:
+            if ticket not in self._running:
+                return False
+            resized = Ticket(ticket.ticket_id, ticket.user_id, browsers, pages)
+            self._running.remove(ticket)
+            try:
+                shrinking = browsers <= ticket.browsers and pages <= ticket.pages
+                if not shrinking and (self._waiting or not self._fits(resized)):
+                    return False
+                ticket.browsers, ticket.pages = browsers, pages
+                return True
+            finally:
+                self._running.append(ticket)
+
+    async def admit(self, user_id, browsers=1, pages=1, on_wait=None):
+        """
+        Waits for capacity and returns an admitted Ticket.
+
+        Args:
+            on_wait: Optional callback(position, estimated_wait_s), called while queued
+                whenever the position changes.
+
+        Raises:
+            AdmissionRejected: The queue is full or the estimated wait exceeds max_wait_s.
+        """
+        ticket = Ticket(next(self._ids), user_id, browsers, pages)
+        with self._lock:
+            self._waiting.append(ticket)
+            if self._try_admit_waiting(ticket):
+                return ticket
+            position = self._fair_order().index(ticket) + 1
+            estimate = self.estimated_wait(position)
+            if len(self._waiting) > self.config.max_queue or estimate > self.config.max_wait_s:
+                self._waiting.remove(ticket)
+                registry.inc("admission_total", outcome="rejected")
+                raise AdmissionRejected(
+                    f"Server busy: {len(self._waiting)} jobs waiting, estimated wait "
+                    f"{estimate:.0f}s", estimated_wait_s=estimate)
+        registry.inc("admission_total", outcome="queued")
+        logging.info(f"Job for {user_id} queued at position {position} (~{estimate:.0f}s)")
+
+        last_position = None
+        try:
+            while True:
+                with self._lock:
+                    if self._try_admit_waiting(ticket):
+                        return ticket
+                    position = self._fair_order().index(ticket) + 1
+                if on_wait and position != last_position:
+                    on_wait(position, self.estimated_wait(position))
+                    last_position = position
+                await asyncio.sleep(self.config.poll_interval_s)
+        except BaseException:
+            # Cancelled or the session went away: give up the place in the queue
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+            raise
+
+    def release(self, ticket):
+        """Frees the ticket's capacity; safe to call more than once"""
+        if ticket is None:
+            return
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket in self._running:
+                self._running.remove(ticket)
+                held_s = time.monotonic() - ticket.admitted_at
+                self._job_estimate_s = 0.8 * self._job_estimate_s + 0.2 * held_s
+
+    @contextlib.asynccontextmanager
+    async def admitted(self, user_id, browsers=1, pages=1, on_wait=None, ticket=None):
+        """Holds an admission for the duration of a block, reusing `ticket` if given"""
+        ticket = ticket or await self.admit(user_id, browsers, pages, on_wait)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """The process-wide AdmissionController, configured from the environment"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(AdmissionConfig.from_env())
+        return _controller
@@ -0,0 +1,236 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+import google.generativeai as genai
+
+from metrics import registry, span
+
+BATCH_RULES = """**Batch Mode:** You receive several numbered user requests at once. Plan each one
+independently, exactly as you would if it were the only request, and return one
+entry per request in the JSON response:
+- `request_index`: the number of the request.
+- `calls`: the function calls for that request, in execution order. Each call has a
+  `function_name` (one of the tools below) and `args` holding only that tool's arguments.
+- `text`: a short reply when the request needs no tool (otherwise empty).
+
+**Tools:**
+"""
+
+
+def build_response_schema(tools):
+    """JSON schema for a batch plan; call args accept the union of all tool arguments"""
+    arg_properties = {}
+    for tool in tools:
+        arg_properties.update(tool["parameters"]["properties"])
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "plans": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "request_index": {"type": "INTEGER"},
+                        "calls": {
+                            "type": "ARRAY",
+                            "items": {
+                                "type": "OBJECT",
+                                "properties": {
+                                    "function_name": {"type": "STRING"},
+                                    "args": {"type": "OBJECT", "properties": arg_properties},
+                                },
+                                "required": ["function_name", "args"],
+                            },
+                        },
+                        "text": {"type": "STRING"},
+                    },
+                    "required": ["request_index", "calls"],
+                },
+            },
+        },
+        "required": ["plans"],
+    }
+
+
+def validate_call(call, tools_by_name):
+    """
+    Checks one planned call against its tool schema and cleans its args in place.
+
+    Empty values are dropped; counts must be positive integers and arrays lists
+    of strings.
+
+    Returns:
+        list[str]: Problems found; empty when the call can be executed.
+    """
+    function_name = call.get("function_name")
+    tool = tools_by_name.get(function_name)
+    if tool is None:
+        return [f"unknown function {function_name!r}"]
+    parameters = tool["parameters"]
+    args = {name: value for name, value in (call.get("args") or {}).items()
+            if value not in (None, "", [])}
+    call["args"] = args
+    errors = []
+
+    for name in parameters.get("required", []):
+        if name not in args:
+            errors.append(f"{function_name}: missing required argument {name!r}")
+    for name, value in args.items():
+        spec = parameters["properties"].get(name)
+        if spec is None:
+            errors.append(f"{function_name}: unexpected argument {name!r}")
+        elif spec["type"] == "STRING" and not isinstance(value, str):
+            errors.append(f"{function_name}: {name!r} must be a string")
+        elif spec["type"] == "INTEGER" and (isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+            errors.append(f"{function_name}: {name!r} must be a positive integer")
+        elif spec["type"] == "ARRAY" and (not isinstance(value, list)
+                                          or not all(isinstance(item, str) for item in value)):
+            errors.append(f"{function_name}: {name!r} must be a list of strings")
+    return errors
+
+
+def validate_plan(calls, tools_by_name):
+    """Validates every call of one request's plan, plus search-before-message ordering"""
+    errors = []
+    for call in calls:
+        errors.extend(validate_call(call, tools_by_name))
+    names = [call.get("function_name") for call in calls]
+    if ("search_Maps" in names and "prepare_whatsapp_message" in names
+            and names.index("prepare_whatsapp_message") < names.index("search_Maps")):
+        errors.append("prepare_whatsapp_message is planned before search_Maps")
+    return errors
+
+
+@dataclass
+class BatchPlanStats:
+    requests: int = 0
+    round_trips: int = 0
+    retried: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class BatchPlanner:
+    """
+    Plans many user requests with one structured-output Gemini call.
+
+    The planning instructions and tool schemas are the model's system
+    instruction, built once per planner, so each batch only adds the numbered
+    requests. (Explicit context caching is not used: at about 2k tokens the
+    instructions are below Gemini's minimum cacheable size.) Every request's
+    calls are validated against the tool schemas; requests that fail are
+    re-planned one at a time.
+
+    plan() returns one (planned_calls, text) pair per request, the same shape
+    as get_agent_plan. A planner may be shared between sessions; its statistics
+    are kept per plan() call.
+    """
+    tools: list
+    instructions: str
+    model_name: str = "gemini-1.5-flash-002"
+    default_num_results: int = 20
+
+    def __post_init__(self):
+        self.tools_by_name = {tool["name"]: tool for tool in self.tools}
+        self._model = None
+
+    def _system_instruction(self):
+        return (f"{self.instructions}\n\n{BATCH_RULES}"
+                f"{json.dumps(self.tools, indent=1)}")
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = genai.GenerativeModel(
+                self.model_name,
+                system_instruction=self._system_instruction(),
+                generation_config=genai.GenerationConfig(
+                    response_mime_type="application/json",
+                    response_schema=build_response_schema(self.tools)))
+        return self._model
+
+    def _generate(self, numbered_requests, stats):
+        """Sends one planning round trip and returns the parsed {request_index: plan} map"""
+        contents = "\n".join(f"{index}. {request}" for index, request in numbered_requests)
+        response = self._get_model().generate_content(contents)
+        stats.round_trips += 1
+        registry.inc("llm_round_trips_total", mode="batch")
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            stats.prompt_tokens += usage.prompt_token_count
+            stats.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+            stats.output_tokens += usage.candidates_token_count
+            registry.inc("llm_tokens_total", usage.prompt_token_count, kind="prompt")
+            registry.inc("llm_tokens_total", usage.candidates_token_count, kind="output")
+
+        plans = json.loads(response.text).get("plans", [])
+        return {plan.get("request_index"): plan for plan in plans}
+
+    def _finalize(self, plan):
+        """Turns a parsed plan into (planned_calls, text), or returns error strings"""
+        calls = [{"function_name": call.get("function_name"), "args": dict(call.get("args") or {})}
+                 for call in plan.get("calls") or []]
+        errors = validate_plan(calls, self.tools_by_name)
+        if errors:
+            return None, errors
+        for call in calls:
+            if call["function_name"] == "search_Maps":
+                call["args"].setdefault("num_results", self.default_num_results)
+        return (calls, (plan.get("text") or "").strip()), []
+
+    def plan(self, requests, stats=None):
+        """
+        Plans every request in `requests` (a list of strings).
+
+        Args:
+            stats: Optional BatchPlanStats; this call's round trips, retries and
+                token counts are added to it.
+
+        Returns:
+            list[tuple]: (planned_calls, text) per request, in input order. A request
+                that still fails validation after its retry gets no calls and a text
+                explaining why.
+        """
+        stats = stats if stats is not None else BatchPlanStats()
+        start = time.perf_counter()
+        numbered = list(enumerate(requests, start=1))
+        results = {}
+        failures = []
+
+        with span("llm_batch_planning", requests=len(requests)):
+            try:
+                parsed = self._generate(numbered, stats)
+            except Exception as e:
+                logging.error(f"Batch planning call failed, planning one by one: {e}")
+                parsed = {}
+            for index, request in numbered:
+                result, errors = (self._finalize(parsed[index]) if index in parsed
+                                  else (None, ["no plan returned"]))
+                if result is None:
+                    failures.append((index, request, errors))
+                else:
+                    results[index] = result
+
+            for index, request, errors in failures:
+                logging.info(f"Re-planning request {index} ({'; '.join(errors)})")
+                stats.retried += 1
+                try:
+                    retry = self._generate([(1, request)], stats)
+                    result, errors = (self._finalize(retry[1]) if 1 in retry
+                                      else (None, ["no plan returned"]))
+                except Exception as e:
+                    result, errors = None, [f"{type(e).__name__}: {e}"]
+                if result is None:
+                    stats.failed += 1
+                    result = ([], f"Could not plan this request: {'; '.join(errors)}")
+                results[index] = result
+
+        stats.requests += len(requests)
+        stats.seconds += time.perf_counter() - start
+        return [results[index] for index, _ in numbered]
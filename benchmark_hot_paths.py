@@ -0,0 +1,215 @@
+"""
+Offline micro-benchmarks for the non-browser hot paths of main_setVal.py.
+
+Times and memory-profiles BusinessList.dataframe, save_to_excel/save_to_csv,
+Business hashing/equality (dedup) and get_agent_plan response parsing on
+synthetic data, then compares the results against a stored baseline.
+
+Usage:
+    python benchmark_hot_paths.py                      # compare to baseline
+    python benchmark_hot_paths.py --update-baseline    # record a new baseline
+    python benchmark_hot_paths.py --sizes 1000 10000 --threshold 0.3
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import main_setVal
+from main_setVal import Business, BusinessList
+from planner import GeminiPlanner, parse_agent_response
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_BASELINE = "benchmark_baseline.json"
+PLAN_PARSE_ITERATIONS = 2_000
+
+STREET_NAMES = ["Jinnah Avenue", "Blue Area", "F-7 Markaz", "Broadway", "5th Ave",
+                "Baker Street", "Gulshan Avenue", "Zindabazar", "Main Boulevard"]
+CITIES = ["Islamabad", "New York", "London", "Sylhet", "Lahore"]
+BUSINESS_WORDS = ["Cafe", "Coffee", "Barber", "Studio", "Bakery", "Design",
+                  "Kitchen", "Grill", "Roasters", "Salon"]
+
+
+# --- Synthetic Data ---
+def generate_business_list(size, seed=42, duplicate_ratio=0.05):
+    """Builds a BusinessList of `size` fake businesses, a few of them duplicated"""
+    rng = random.Random(seed)
+    businesses = []
+    for i in range(size):
+        if businesses and rng.random() < duplicate_ratio:
+            original = rng.choice(businesses)
+            businesses.append(Business(**{k: v for k, v in vars(original).items()}))
+            continue
+        name = f"{rng.choice(BUSINESS_WORDS)} {rng.choice(BUSINESS_WORDS)} {i}"
+        businesses.append(Business(
+            name=name,
+            address=f"{rng.randint(1, 999)} {rng.choice(STREET_NAMES)}, {rng.choice(CITIES)}",
+            website=f"{name.lower().replace(' ', '')}.com" if rng.random() < 0.6 else "",
+            phone_number=f"0300 {rng.randint(1000000, 9999999)}" if rng.random() < 0.8 else "",
+            reviews_average=round(rng.uniform(1, 5), 1) if rng.random() < 0.9 else None,
+        ))
+    return BusinessList(business_list=businesses)
+
+
+def make_stub_response(num_calls=2, with_text=True):
+    """Builds an object shaped like a Gemini GenerateContentResponse"""
+    parts = [
+        SimpleNamespace(function_call=SimpleNamespace(
+            name="search_Maps",
+            args={"query": "graphic designers in New York", "num_results": 20})),
+        SimpleNamespace(function_call=SimpleNamespace(
+            name="prepare_whatsapp_message",
+            args={"message": "Hello! We have a special offer today.", "k": 5})),
+    ][:num_calls]
+    if with_text:
+        parts.append(SimpleNamespace(function_call=None,
+                                     text="Searching first, then messaging the leads."))
+    content = SimpleNamespace(parts=parts)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=content)], text="")
+
+
+class StubChat:
+    def __init__(self, response):
+        self.response = response
+
+    def send_message(self, prompt):
+        return self.response
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel so get_agent_plan runs offline"""
+
+    def __init__(self, response):
+        self.response = response
+
+    def start_chat(self):
+        return StubChat(self.response)
+
+
+# --- Benchmarked Paths ---
+def build_benchmarks(sizes, output_dir):
+    """Returns {name: callable} for every path and size"""
+    benchmarks = {}
+    for size in sizes:
+        business_list = generate_business_list(size)
+        business_list.save_at = output_dir
+
+        benchmarks[f"dataframe[{size}]"] = business_list.dataframe
+        benchmarks[f"save_to_csv[{size}]"] = (
+            lambda bl=business_list, n=size: bl.save_to_csv(f"bench_{n}"))
+        benchmarks[f"save_to_excel[{size}]"] = (
+            lambda bl=business_list, n=size: bl.save_to_excel(f"bench_{n}"))
+        benchmarks[f"dedup_set[{size}]"] = (
+            lambda bl=business_list: set(bl.business_list))
+        benchmarks[f"dedup_ordered[{size}]"] = (
+            lambda bl=business_list: list(dict.fromkeys(bl.business_list)))
+
+    response = make_stub_response()
+    benchmarks[f"parse_agent_response[x{PLAN_PARSE_ITERATIONS}]"] = (
+        lambda: [parse_agent_response(response)
+                 for _ in range(PLAN_PARSE_ITERATIONS)])
+
+    async def plan_many():
+        for _ in range(PLAN_PARSE_ITERATIONS):
+            await main_setVal.get_agent_plan("find cafes in Islamabad")
+
+    benchmarks[f"get_agent_plan_stubbed[x{PLAN_PARSE_ITERATIONS}]"] = (
+        lambda: asyncio.run(plan_many()))
+    return benchmarks
+
+
+def measure(func, repeat):
+    """Returns the median wall time (s) over `repeat` runs and the peak traced memory (MB)"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate run so tracing overhead stays out of the timings
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / (1024 * 1024)
+
+
+def compare_to_baseline(results, baseline, threshold, memory_threshold):
+    """Returns a list of human-readable regressions"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result["seconds"] > base["seconds"] * (1 + threshold):
+            regressions.append(
+                f"{name}: time {result['seconds']:.4f}s vs baseline {base['seconds']:.4f}s")
+        if result["peak_mb"] > base["peak_mb"] * (1 + memory_threshold) + 0.5:
+            regressions.append(
+                f"{name}: peak memory {result['peak_mb']:.2f}MB vs baseline {base['peak_mb']:.2f}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="Allowed relative growth of peak memory before failing")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Timings are machine-specific, so no baseline is committed; without one the
+    # regression check cannot pass
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; run with --update-baseline first.")
+        return 2
+
+    # The save_* methods log every write; keep the benchmark output readable
+    logging.getLogger().setLevel(logging.WARNING)
+    main_setVal.planner = GeminiPlanner(
+        [main_setVal.search_Maps_func, main_setVal.prepare_whatsapp_message_func],
+        main_setVal.build_planning_prompt, model=StubModel(make_stub_response()))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, func in build_benchmarks(args.sizes, output_dir).items():
+            seconds, peak_mb = measure(func, args.repeat)
+            results[name] = {"seconds": seconds, "peak_mb": peak_mb}
+            print(f"{name:<45} {seconds * 1000:>10.2f} ms {peak_mb:>10.2f} MB")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    regressions = compare_to_baseline(results, baseline, args.threshold,
+                                      args.memory_threshold)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"- {regression}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
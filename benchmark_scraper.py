@@ -0,0 +1,140 @@
+"""
+End-to-end scraper performance harness against the local Maps fixture server.
+
+Starts maps_fixture_server.py in-process, runs scrape_business against it with
+the given scraper configuration and reports listings per second together with
+per-stage latencies.
+
+Usage:
+    python benchmark_scraper.py --total 40 --results 100 --place-latency 200 \\
+        --listing-wait 500 --scroll-wait 500
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from main_setVal import ScraperConfig, scrape_business
+from metrics import start_job
+from maps_fixture_server import FixtureConfig, MapsFixtureServer
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_stage_table(timings):
+    lines = [f"{'stage':<16}{'count':>7}{'mean ms':>11}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+    for stage, durations in timings.items():
+        if not durations:
+            continue
+        lines.append(
+            f"{stage:<16}{len(durations):>7}"
+            f"{statistics.mean(durations) * 1000:>11.1f}"
+            f"{percentile(durations, 0.50) * 1000:>10.1f}"
+            f"{percentile(durations, 0.95) * 1000:>10.1f}"
+            f"{max(durations) * 1000:>10.1f}")
+    return "\n".join(lines)
+
+
+async def run_benchmark(query, total, fixture_config, scraper_config, time_budget_s=None):
+    """
+    Runs one scrape against a fresh fixture server.
+
+    Returns:
+        dict: listings, seconds, listings_per_second, timings and server request counts.
+    """
+    with MapsFixtureServer(fixture_config) as server:
+        scraper_config.maps_url = server.maps_url
+        timings = {}
+        job = start_job(f"benchmark: {query}")
+        start = time.perf_counter()
+        business_list = await scrape_business(query, total, config=scraper_config,
+                                              timings=timings, time_budget_s=time_budget_s)
+        seconds = time.perf_counter() - start
+        listings = len(business_list.business_list)
+        return {
+            "listings": listings,
+            "seconds": seconds,
+            "listings_per_second": listings / seconds if seconds else 0.0,
+            "timings": timings,
+            "requests": dict(server.request_counts),
+            "completeness": business_list.completeness,
+            "renderer_memory": next((span.attributes for span in job.spans
+                                     if span.name == "renderer_memory"), None),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scrape_business against a local Maps stand-in.")
+    parser.add_argument("--query", default="cafes in Islamabad")
+    parser.add_argument("--total", type=int, default=20, help="Listings to scrape")
+    # Fixture shape
+    parser.add_argument("--results", type=int, default=FixtureConfig.results)
+    parser.add_argument("--page-size", type=int, default=FixtureConfig.page_size)
+    parser.add_argument("--page-load-latency", type=int, default=0, help="ms")
+    parser.add_argument("--search-latency", type=int, default=0, help="ms")
+    parser.add_argument("--scroll-latency", type=int, default=0, help="ms")
+    parser.add_argument("--place-latency", type=int, default=0, help="ms")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    # Scraper configuration (defaults are the production waits)
+    defaults = ScraperConfig()
+    parser.add_argument("--page-load-wait", type=int, default=defaults.page_load_wait_ms, help="ms")
+    parser.add_argument("--type-wait", type=int, default=defaults.type_wait_ms, help="ms")
+    parser.add_argument("--search-wait", type=int, default=defaults.search_wait_ms, help="ms")
+    parser.add_argument("--scroll-wait", type=int, default=defaults.scroll_wait_ms, help="ms")
+    parser.add_argument("--listing-wait", type=int, default=defaults.listing_wait_ms, help="ms")
+    parser.add_argument("--cards-only", action="store_true",
+                        help="Read listings from the feed cards instead of clicking each one")
+    parser.add_argument("--required-fields", nargs="*", default=[],
+                        help="In --cards-only mode, open listings missing these fields")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds; run a best-effort deadline scrape")
+    parser.add_argument("--prune-feed", action="store_true",
+                        help="Collapse processed feed cards while scrolling and report renderer memory")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args(argv)
+
+    fixture_config = FixtureConfig(
+        results=args.results, page_size=args.page_size,
+        page_load_latency_ms=args.page_load_latency,
+        search_latency_ms=args.search_latency,
+        scroll_latency_ms=args.scroll_latency,
+        place_latency_ms=args.place_latency, jitter=args.jitter)
+    scraper_config = ScraperConfig(
+        headless=not args.headed,
+        page_load_wait_ms=args.page_load_wait, type_wait_ms=args.type_wait,
+        search_wait_ms=args.search_wait, scroll_wait_ms=args.scroll_wait,
+        listing_wait_ms=args.listing_wait,
+        cards_only=args.cards_only, required_fields=tuple(args.required_fields),
+        prune_feed=args.prune_feed,
+        checkpoint_dir=None)  # Every benchmark run starts from scratch
+
+    result = asyncio.run(run_benchmark(args.query, args.total, fixture_config,
+                                       scraper_config, args.time_budget))
+
+    print(f"Listings scraped:  {result['listings']} / {args.total}")
+    print(f"Wall time:         {result['seconds']:.2f} s")
+    print(f"Listings/second:   {result['listings_per_second']:.2f}")
+    print(f"Server requests:   {result['requests']}")
+    if result["completeness"]:
+        print(f"Completeness:      {result['completeness']}")
+    if result["renderer_memory"]:
+        memory = result["renderer_memory"]
+        print(f"Renderer memory:   JS heap {memory['first_js_heap_mb']} -> "
+              f"{memory['last_js_heap_mb']} MB (peak {memory['peak_js_heap_mb']} MB), "
+              f"peak {memory['peak_dom_nodes']} DOM nodes")
+        for sample in memory["series"]:
+            print(f"  {sample['elapsed_s']:>7.1f}s  {sample['cards']:>5} cards  "
+                  f"{sample['js_heap_mb']:>7.1f} MB  {sample['dom_nodes']:>7} nodes")
+    print()
+    print(format_stage_table(result["timings"]))
+    return 0 if result["listings"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
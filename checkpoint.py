@@ -0,0 +1,90 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict, field
+
+DEFAULT_MAX_AGE_S = 24 * 3600  # Older checkpoints are discarded instead of resumed
+
+
+@dataclass
+class ScrapeCheckpoint:
+    """Progress of one scrape job: the harvested place URLs and what was extracted so far"""
+    search_term: str
+    total: int
+    hrefs: list[str] = field(default_factory=list)   # Harvested /maps/place manifest
+    last_index: int = -1                              # Every listing up to here is recorded
+    records: list[dict] = field(default_factory=list)  # asdict() of each extracted Business
+    cards: list[dict] = field(default_factory=list)    # Raw feed cards (cards_only mode)
+    updated_at: str = None
+    variant: str = ""                                  # Scraper settings the job ran with
+
+    @property
+    def next_index(self):
+        return self.last_index + 1
+
+    @property
+    def is_complete(self):
+        return bool(self.hrefs) and self.next_index >= len(self.hrefs)
+
+
+class CheckpointStore:
+    """
+    Saves scrape checkpoints as JSON files, one per (search term, total, variant).
+
+    `variant` identifies everything else that changes what a job collects (see
+    ScraperConfig.checkpoint_variant), so runs with different settings or for
+    different users never resume each other's work. Checkpoints older than
+    `max_age_s` are deleted instead of resumed.
+    """
+
+    def __init__(self, directory="output/checkpoints", max_age_s=DEFAULT_MAX_AGE_S):
+        self.directory = directory
+        self.max_age_s = max_age_s
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def job_key(search_term, total, variant=""):
+        normalized = " ".join(search_term.lower().split())
+        digest = hashlib.sha1(f"{normalized}|{total}|{variant}".encode("utf-8")).hexdigest()[:12]
+        return f"{normalized.replace(' ', '_').replace('/', '_')[:40]}_{digest}"
+
+    def path_for(self, search_term, total, variant=""):
+        return os.path.join(self.directory, f"{self.job_key(search_term, total, variant)}.json")
+
+    def load(self, search_term, total, variant=""):
+        """Returns the saved ScrapeCheckpoint for this job, or None if there is none or it expired"""
+        path = self.path_for(search_term, total, variant)
+        if not os.path.exists(path):
+            return None
+        try:
+            age_s = time.time() - os.path.getmtime(path)
+            if self.max_age_s is not None and age_s > self.max_age_s:
+                logging.info(f"Discarding checkpoint {path}: {age_s / 3600:.1f}h old")
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as fp:
+                return ScrapeCheckpoint(**json.load(fp))
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    def save(self, checkpoint):
+        """Atomically writes the checkpoint so a crash never leaves a torn file"""
+        checkpoint.updated_at = datetime.datetime.now().isoformat(timespec="seconds")
+        path = self.path_for(checkpoint.search_term, checkpoint.total, checkpoint.variant)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(asdict(checkpoint), fp)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Failed to save checkpoint {path}: {e}")
+
+    def delete(self, search_term, total, variant=""):
+        path = self.path_for(search_term, total, variant)
+        if os.path.exists(path):
+            os.remove(path)
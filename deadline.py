@@ -0,0 +1,80 @@
+import math
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class DeadlineScheduler:
+    """
+    Splits a scrape's time budget between scrolling the feed and opening listings.
+
+    Scrolling stops once `scroll_share` of the budget is spent. Detail extraction
+    then runs in ranked order while the remaining time covers another listing,
+    based on a running estimate of how long one takes.
+    """
+    budget_s: float
+    scroll_share: float = 0.4          # Fraction of the budget for load, search and scroll
+    detail_estimate_s: float = 3.5     # Initial guess for one click + extraction
+    safety_margin_s: float = 0.5       # Kept free for closing the browser and saving
+    start: float = field(default_factory=time.monotonic)
+    ran_out: bool = False
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return self.budget_s - self.elapsed()
+
+    def usable(self):
+        """Seconds left for work after keeping the safety margin free, never below 0.1"""
+        return max(self.remaining() - self.safety_margin_s, 0.1)
+
+    def harvest_over(self):
+        """True once the scroll phase has used its share of the budget"""
+        return self.elapsed() >= self.budget_s * self.scroll_share
+
+    def can_start_detail(self):
+        """True if another listing can be opened and extracted before the deadline"""
+        if self.remaining() - self.safety_margin_s >= self.detail_estimate_s:
+            return True
+        self.ran_out = True
+        return False
+
+    def record_detail(self, seconds):
+        """Updates the per-listing estimate with an observed duration (EWMA)"""
+        self.detail_estimate_s = 0.7 * self.detail_estimate_s + 0.3 * seconds
+
+    @staticmethod
+    def rank_for_detail(candidates):
+        """
+        Orders listings for full extraction.
+
+        Listings missing a required field come first, since only the detail panel
+        can fill them. Within each group, better leads come first: higher rating
+        weighted by the log of the review count.
+
+        Args:
+            candidates: list of (index, rating, reviews_count, missing_required) tuples.
+
+        Returns:
+            list[int]: Listing indexes, most valuable to open first.
+        """
+        def score(candidate):
+            index, rating, reviews_count, missing_required = candidate
+            quality = (rating or 0.0) * math.log1p(reviews_count or 0)
+            return (not missing_required, -quality, index)
+
+        return [candidate[0] for candidate in sorted(candidates, key=score)]
+
+    def report(self, requested, harvested, fully_extracted):
+        """Returns the completeness report attached to a deadline scrape"""
+        return {
+            "time_budget_s": self.budget_s,
+            "elapsed_s": round(self.elapsed(), 2),
+            "timed_out": self.ran_out,
+            "requested": requested,
+            "harvested": harvested,
+            "fully_extracted": fully_extracted,
+            "card_only": harvested - fully_extracted,
+            "completeness": round(fully_extracted / requested, 3) if requested else 0.0,
+        }
@@ -0,0 +1,89 @@
+"""
+Two-phase distributed scraping: one harvest run, any number of detail workers.
+
+    # 1. Harvest: search once and queue every place URL
+    python distributed_scrape.py harvest --query "cafes in Islamabad" --total 500
+
+    # 2. Detail: start workers on as many machines as needed (same queue file)
+    python distributed_scrape.py work --job-id <job_id> --pages 3
+
+    # 3. Collect: merge everything into one Excel file
+    python distributed_scrape.py collect --job-id <job_id>
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from main_setVal import (ScraperConfig, collect_results, harvest_place_urls,
+                         run_detail_worker)
+from work_queue import SQLiteWorkQueue, new_job_id, write_manifest
+
+
+def harvest(args, queue):
+    config = ScraperConfig(maps_url=args.maps_url, prune_feed=args.prune_feed)
+    hrefs = asyncio.run(harvest_place_urls(args.query, args.total, config))
+    if not hrefs:
+        logging.error("Harvest found no listings; nothing queued.")
+        return 1
+    job_id = args.job_id or new_job_id(args.query)
+    write_manifest(args.query, hrefs, job_id)
+    queue.enqueue(job_id, hrefs)
+    print(job_id)
+    return 0
+
+
+def work(args, queue):
+    config = ScraperConfig(maps_url=args.maps_url, listing_wait_ms=args.listing_wait)
+    processed = asyncio.run(run_detail_worker(queue, args.job_id, config,
+                                              worker_id=args.worker_id,
+                                              pages=args.pages))
+    logging.info(f"Worker done: {processed} places extracted. Queue: {queue.stats(args.job_id)}")
+    return 0
+
+
+def collect(args, queue):
+    stats = queue.stats(args.job_id)
+    if not queue.is_finished(args.job_id):
+        logging.warning(f"Job {args.job_id} is still running ({stats}); collecting partial results.")
+    business_list = collect_results(queue, args.job_id)
+    filename = args.output or f"({business_list.get_row_size()}_Rows)__{args.job_id}"
+    file_path = business_list.save_to_excel(filename)
+    logging.info(f"Collected {business_list.get_row_size()} businesses ({stats}) into {file_path}")
+    return 0 if file_path else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed Google Maps scraping.")
+    parser.add_argument("--queue", default="output/work_queue.db",
+                        help="SQLite queue file shared by all workers")
+    parser.add_argument("--maps-url", default=ScraperConfig.maps_url)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    harvest_parser = subparsers.add_parser("harvest", help="Queue the place URLs for a query")
+    harvest_parser.add_argument("--query", required=True)
+    harvest_parser.add_argument("--total", type=int, default=20)
+    harvest_parser.add_argument("--job-id")
+    harvest_parser.add_argument("--prune-feed", action="store_true",
+                                help="Collapse processed result cards while scrolling (large totals)")
+
+    work_parser = subparsers.add_parser("work", help="Extract details for queued places")
+    work_parser.add_argument("--job-id", required=True)
+    work_parser.add_argument("--worker-id")
+    work_parser.add_argument("--pages", type=int, default=1,
+                             help="Concurrent browser tabs in this worker")
+    work_parser.add_argument("--listing-wait", type=int,
+                             default=ScraperConfig.listing_wait_ms, help="ms")
+
+    collect_parser = subparsers.add_parser("collect", help="Merge results into one Excel file")
+    collect_parser.add_argument("--job-id", required=True)
+    collect_parser.add_argument("--output", help="Excel file name (without extension)")
+
+    args = parser.parse_args(argv)
+    queue = SQLiteWorkQueue(args.queue)
+    commands = {"harvest": harvest, "work": work, "collect": collect}
+    return commands[args.command](args, queue)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+# --- Extraction Patterns ---
+EMAIL_REGEX = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+HREF_REGEX = re.compile(r"""href\s*=\s*["']([^"'#>]+)["']""", re.IGNORECASE)
+CONTACT_LINK_REGEX = re.compile(r"contact|kontakt|contacto|about|impressum|reach-us",
+                                re.IGNORECASE)
+# Things that look like emails but are asset names (e.g. logo@2x.png)
+NON_EMAIL_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".css", ".js")
+
+SOCIAL_DOMAINS = {
+    "facebook.com": "facebook",
+    "instagram.com": "instagram",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "linkedin.com": "linkedin",
+    "youtube.com": "youtube",
+    "tiktok.com": "tiktok",
+}
+# Path segments that are never a handle (share widgets, intents, etc.)
+SOCIAL_IGNORED_SEGMENTS = {"sharer", "sharer.php", "share", "intent", "plugins",
+                           "dialog", "tr", "home", "watch", "embed", "p", "reel"}
+
+
+@dataclass
+class EnrichmentConfig:
+    """Limits and settings for the website enrichment crawler"""
+    max_concurrency: int = 50           # Sites fetched at once across all hosts
+    per_domain_concurrency: int = 2     # Requests in flight against one host
+    connection_limit_per_host: int = 4  # Pooled keep-alive connections per host
+    timeout_seconds: float = 15
+    max_bytes: int = 1_000_000          # Response bodies are truncated past this
+    max_contact_pages: int = 2          # Extra pages followed per site
+    respect_robots: bool = True
+    cache_dir: str = "output/.web_cache"
+    cache_ttl_seconds: int = 7 * 24 * 3600
+    error_cache_ttl_seconds: int = 3600  # 4xx pages; 5xx and network errors are never cached
+    user_agent: str = "Mozilla/5.0 (compatible; LeadGenerationBot/1.0)"
+
+
+class ResponseCache:
+    """On-disk cache of fetched pages, one JSON file per URL"""
+
+    def __init__(self, cache_dir, ttl_seconds, error_ttl_seconds=3600):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _path(self, url):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    # get() and set() do blocking file I/O; call them with asyncio.to_thread
+
+    def get(self, url):
+        """Returns (status, body, final_url) for a fresh cache entry, or None"""
+        if not self.cache_dir:
+            return None
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        ttl_seconds = self.ttl_seconds if entry["status"] == 200 else self.error_ttl_seconds
+        if time.time() - entry.get("fetched_at", 0) > ttl_seconds:
+            return None
+        return entry["status"], entry["body"], entry.get("final_url") or url
+
+    def set(self, url, status, body, final_url=None):
+        # Server errors are usually transient; the next run should try again
+        if not self.cache_dir or status >= 500:
+            return
+        entry = {"url": url, "final_url": final_url or url, "status": status, "body": body,
+                 "fetched_at": time.time()}
+        tmp_path = self._path(url) + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp_path, self._path(url))
+        except OSError as e:
+            logging.warning(f"Failed to cache response for {url}: {e}")
+
+
+def normalize_website_url(website):
+    """Turns the website text shown on Maps (e.g. 'example.com') into a fetchable URL"""
+    if not website:
+        return None
+    website = website.strip()
+    if not re.match(r"^https?://", website, re.IGNORECASE):
+        website = f"https://{website}"
+    parsed = urlparse(website)
+    return website if parsed.netloc else None
+
+
+def extract_emails(html):
+    """Returns the unique email addresses found in a page, in page order"""
+    emails = []
+    for match in EMAIL_REGEX.findall(html):
+        email = match.lower().rstrip(".")
+        if email.endswith(NON_EMAIL_SUFFIXES) or email in emails:
+            continue
+        emails.append(email)
+    return emails
+
+
+def extract_links(html, base_url):
+    """Returns absolute http(s) links found in a page"""
+    links = []
+    for href in HREF_REGEX.findall(html):
+        if href.lower().startswith(("mailto:", "tel:", "javascript:")):
+            continue
+        link = urljoin(base_url, href.strip())
+        if link.startswith(("http://", "https://")) and link not in links:
+            links.append(link)
+    return links
+
+
+def site_host(url):
+    """The host of `url` without a leading 'www.', so both spellings count as one site"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def extract_contact_pages(links, base_url):
+    """
+    Returns same-site links that look like contact/about pages.
+
+    `base_url` should be the page's URL after redirects (e.g. example.com
+    redirecting to www.example.com), since its links point at that host.
+    """
+    host = site_host(base_url)
+    return [link for link in links
+            if site_host(link) == host
+            and CONTACT_LINK_REGEX.search(urlparse(link).path)]
+
+
+def extract_social_handles(links):
+    """Returns a {network: handle} mapping from links to known social sites"""
+    handles = {}
+    for link in links:
+        parsed = urlparse(link)
+        domain = parsed.netloc.lower()
+        if domain.startswith("www."):
+            domain = domain[4:]
+        network = SOCIAL_DOMAINS.get(domain)
+        if not network or network in handles:
+            continue
+        segments = [segment for segment in parsed.path.split("/") if segment]
+        if network == "linkedin" and len(segments) >= 2:
+            # linkedin.com/company/<handle> or linkedin.com/in/<handle>
+            segments = segments[1:]
+        if segments and segments[0].lower() not in SOCIAL_IGNORED_SEGMENTS:
+            handles[network] = segments[0].lstrip("@")
+    return handles
+
+
+class WebsiteEnricher:
+    """
+    Fetches business websites concurrently and extracts contact details.
+
+    One aiohttp session (and so one connection pool) is shared by every
+    request; concurrency is capped globally and per host.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or EnrichmentConfig()
+        self.cache = ResponseCache(self.config.cache_dir, self.config.cache_ttl_seconds,
+                                   self.config.error_cache_ttl_seconds)
+        self._global_semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self._domain_semaphores = {}
+        self._robots = {}
+        self._robots_locks = {}
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.config.max_concurrency,
+            limit_per_host=self.config.connection_limit_per_host,
+            ttl_dns_cache=300,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.config.timeout_seconds),
+            headers={"User-Agent": self.config.user_agent},
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    def _domain_semaphore(self, host):
+        if host not in self._domain_semaphores:
+            self._domain_semaphores[host] = asyncio.Semaphore(
+                self.config.per_domain_concurrency)
+        return self._domain_semaphores[host]
+
+    async def _get(self, url):
+        """Performs a size-limited GET, returning (status, text, URL after redirects)"""
+        async with self._session.get(url, allow_redirects=True) as response:
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.config.max_bytes:
+                    body = body[:self.config.max_bytes]
+                    break
+            return (response.status,
+                    body.decode(response.charset or "utf-8", errors="replace"),
+                    str(response.url))
+
+    async def _allowed_by_robots(self, url):
+        if not self.config.respect_robots:
+            return True
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        lock = self._robots_locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            if origin not in self._robots:
+                parser = RobotFileParser()
+                try:
+                    status, text, _ = await self._get(f"{origin}/robots.txt")
+                    # Same rules as RobotFileParser.read(): a missing robots.txt (4xx)
+                    # allows everything, 401/403 and server errors allow nothing
+                    if status == 200:
+                        parser.parse(text.splitlines())
+                    elif status in (401, 403) or status >= 500:
+                        parser.disallow_all = True
+                    else:
+                        parser.parse([])
+                except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError):
+                    parser.parse([])
+                self._robots[origin] = parser
+        return self._robots[origin].can_fetch(self.config.user_agent, url)
+
+    async def fetch(self, url):
+        """
+        Fetches a page honoring the cache, robots.txt and concurrency limits.
+
+        Returns:
+            tuple: (page body, URL after redirects), or (None, url) if the page
+                could not be fetched.
+        """
+        cached = await asyncio.to_thread(self.cache.get, url)
+        if cached is not None:
+            status, body, final_url = cached
+            return (body if status == 200 else None), final_url
+
+        host = urlparse(url).netloc.lower()
+        # Per-host slot first: requests queued for a busy host (e.g. the many leads
+        # whose website is facebook.com) must not hold global slots while they wait
+        async with self._domain_semaphore(host), self._global_semaphore:
+            if not await self._allowed_by_robots(url):
+                logging.info(f"Skipping {url}: disallowed by robots.txt")
+                return None, url
+            try:
+                status, body, final_url = await self._get(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError) as e:
+                logging.warning(f"Failed to fetch {url}: {type(e).__name__} - {e}")
+                return None, url
+
+        await asyncio.to_thread(self.cache.set, url, status, body, final_url)
+        return (body if status == 200 else None), final_url
+
+    async def enrich_business(self, business):
+        """Fills emails, contact_pages and social_handles on a single business"""
+        url = normalize_website_url(business.website)
+        if not url:
+            return business
+        html, final_url = await self.fetch(url)
+        if html is None:
+            return business
+
+        # Relative links and the same-site check follow the redirected URL
+        links = extract_links(html, final_url)
+        emails = extract_emails(html)
+        contact_pages = extract_contact_pages(links, final_url)
+        social_handles = extract_social_handles(links)
+
+        # Contact pages are only worth a request if the homepage had no email
+        if not emails:
+            pages = contact_pages[:self.config.max_contact_pages]
+            for page_html, _ in await asyncio.gather(*(self.fetch(page) for page in pages)):
+                if page_html:
+                    emails.extend(e for e in extract_emails(page_html) if e not in emails)
+
+        business.emails = "; ".join(emails)
+        business.contact_pages = "; ".join(contact_pages)
+        business.social_handles = "; ".join(
+            f"{network}:{handle}" for network, handle in social_handles.items())
+        return business
+
+    async def enrich(self, business_list):
+        """Enriches every business in a BusinessList concurrently"""
+        results = await asyncio.gather(
+            *(self.enrich_business(business) for business in business_list.business_list),
+            return_exceptions=True)
+        for business, result in zip(business_list.business_list, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error enriching {business.website}: {result}")
+        return business_list
+
+
+async def enrich_business_list(business_list, config=None):
+    """
+    Convenience wrapper: enriches a BusinessList from each business's website.
+
+    Args:
+        business_list: BusinessList whose businesses have a 'website' field.
+        config: Optional EnrichmentConfig.
+
+    Returns:
+        The same BusinessList, with emails/contact_pages/social_handles filled.
+    """
+    async with WebsiteEnricher(config) as enricher:
+        return await enricher.enrich(business_list)
@@ -0,0 +1,311 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+
+# Scraped fields whose change makes a lead "changed"; derived fields
+# (phone_e164, enrichment) follow from these and are not compared
+TRACKED_FIELDS = ("name", "address", "website", "phone_number", "reviews_average",
+                  "reviews_count", "category")
+DEFAULT_MAX_AGE_S = 7 * 24 * 3600          # Re-check leads not seen for a week...
+DEFAULT_MAX_INTERVAL_S = 8 * DEFAULT_MAX_AGE_S  # ...backing off to 8 weeks while they don't change
+# Place id in a /maps/place URL ("...!1s0x3dfbf...:0x5a1e...!8m2..."); the same for every search
+PLACE_ID_REGEX = re.compile(r"!1s([^!?&]+)")
+
+
+def place_id(place_url):
+    """The Maps place id in `place_url`, or None if it has none"""
+    match = PLACE_ID_REGEX.search(place_url or "")
+    return match.group(1) if match else None
+
+
+def lead_key(place_url):
+    """The Maps place id in `place_url` (stable across searches), else the URL itself"""
+    return place_id(place_url) or place_url
+
+
+def tracked_values(record):
+    values = {}
+    for name in TRACKED_FIELDS:
+        value = record.get(name)
+        if isinstance(value, str):
+            value = " ".join(value.split()) or None
+        elif isinstance(value, float) and value != value:  # NaN from a DataFrame
+            value = None
+        elif name == "reviews_count" and isinstance(value, float):
+            value = int(value)  # A DataFrame column with gaps turns counts into floats
+        values[name] = value
+    return values
+
+
+def content_hash(record):
+    """Hash of the tracked fields of an asdict(Business) record, ignoring whitespace"""
+    payload = json.dumps(tracked_values(record), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def diff_records(old, new):
+    """Returns {field: [old, new]} for the tracked fields that differ"""
+    old_values, new_values = tracked_values(old), tracked_values(new)
+    return {name: [old_values[name], new_values[name]]
+            for name in TRACKED_FIELDS if old_values[name] != new_values[name]}
+
+
+@dataclass
+class StaleLead:
+    """A stored lead due for a refresh"""
+    key: str
+    place_url: str
+    record: dict
+
+
+class SQLiteLeadStore:
+    """
+    Stored leads with content hashes and a change log, in one SQLite file.
+
+    Every lead has a check interval: it starts at `max_age_s` and doubles (up to
+    `max_interval_s`) each time a refresh finds the lead unchanged, and drops
+    back to `max_age_s` when it changes. Leads that rarely change are visited
+    rarely, so refresh work follows the churn rather than the number of leads.
+    Only changed leads have their record rewritten and a change log entry added.
+    """
+
+    def __init__(self, path="output/leads.db", max_age_s=DEFAULT_MAX_AGE_S,
+                 max_interval_s=DEFAULT_MAX_INTERVAL_S):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_age_s = max_age_s
+        self.max_interval_s = max(max_interval_s, max_age_s)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leads (
+                    lead_key TEXT PRIMARY KEY,
+                    place_url TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    last_changed REAL,
+                    check_interval REAL NOT NULL,
+                    next_check REAL NOT NULL,
+                    checks INTEGER NOT NULL DEFAULT 0,
+                    changes INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_next_check ON leads (next_check)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lead_changes (
+                    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lead_key TEXT NOT NULL,
+                    place_url TEXT NOT NULL,
+                    changed_at REAL NOT NULL,
+                    source TEXT NOT NULL,
+                    changes TEXT NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lead_changes_at "
+                         "ON lead_changes (changed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS contacts (
+                    phone_e164 TEXT PRIMARY KEY,
+                    last_contacted REAL NOT NULL,
+                    contacts INTEGER NOT NULL DEFAULT 1
+                )""")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def upsert(self, records, seen_at=None, source="scrape"):
+        """
+        Adds or updates leads from asdict(Business) records (e.g. a finished scrape).
+
+        Records without a place_url are skipped. Existing leads are compared by
+        content hash exactly like a refresh.
+
+        Returns:
+            dict: Counts of "added", "changed", "unchanged" and "skipped" records.
+        """
+        seen_at = seen_at or time.time()
+        counts = {"added": 0, "changed": 0, "unchanged": 0, "skipped": 0}
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for record in records:
+                if not record.get("place_url"):
+                    counts["skipped"] += 1
+                    continue
+                counts[self._apply(conn, record["place_url"], record, seen_at, source)] += 1
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return counts
+
+    def record_check(self, place_url, record, checked_at=None):
+        """
+        Stores the result of re-visiting one lead; `record` is None if the visit failed.
+
+        Returns:
+            str: "changed", "unchanged" or "failed" ("added" if the lead was unknown).
+        """
+        checked_at = checked_at or time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if record is None:
+                # Try again after the base interval, without backing off
+                conn.execute(
+                    "UPDATE leads SET failures = failures + 1, next_check = ? WHERE lead_key = ?",
+                    (checked_at + self.max_age_s, lead_key(place_url)))
+                outcome = "failed"
+            else:
+                outcome = self._apply(conn, place_url, record, checked_at, "refresh")
+            conn.execute("COMMIT")
+            return outcome
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _apply(self, conn, place_url, record, seen_at, source):
+        key = lead_key(place_url)
+        new_hash = content_hash(record)
+        row = conn.execute(
+            "SELECT record, content_hash, check_interval FROM leads WHERE lead_key = ?",
+            (key,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO leads (lead_key, place_url, record, content_hash, first_seen, "
+                "last_seen, check_interval, next_check) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, place_url, json.dumps(record, default=str), new_hash, seen_at, seen_at,
+                 self.max_age_s, seen_at + self.max_age_s))
+            return "added"
+
+        old_record, old_hash, interval = json.loads(row[0]), row[1], row[2]
+        # Hashes stored before a field was added to TRACKED_FIELDS differ without any
+        # tracked value changing; those leads are unchanged and get the new hash
+        if new_hash == old_hash or not diff_records(old_record, record):
+            interval = min(interval * 2, self.max_interval_s)
+            conn.execute(
+                "UPDATE leads SET content_hash = ?, last_seen = ?, check_interval = ?, "
+                "next_check = ?, checks = checks + 1, failures = 0 WHERE lead_key = ?",
+                (new_hash, seen_at, interval, seen_at + interval, key))
+            return "unchanged"
+
+        # Keep fields the new visit could not read (e.g. enrichment) from the stored record
+        merged = {**old_record, **{name: value for name, value in record.items()
+                                   if value not in (None, "")}}
+        for name in TRACKED_FIELDS:
+            merged[name] = record.get(name)
+        if tracked_values(old_record)["phone_number"] != tracked_values(record)["phone_number"]:
+            merged["phone_e164"] = record.get("phone_e164")
+            merged["phone_type"] = record.get("phone_type")
+        conn.execute(
+            "UPDATE leads SET place_url = ?, record = ?, content_hash = ?, last_seen = ?, "
+            "last_changed = ?, check_interval = ?, next_check = ?, checks = checks + 1, "
+            "changes = changes + 1, failures = 0 WHERE lead_key = ?",
+            (place_url, json.dumps(merged, default=str), new_hash, seen_at, seen_at,
+             self.max_age_s, seen_at + self.max_age_s, key))
+        conn.execute(
+            "INSERT INTO lead_changes (lead_key, place_url, changed_at, source, changes) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, place_url, seen_at, source, json.dumps(diff_records(old_record, record),
+                                                          default=str)))
+        return "changed"
+
+    def stale(self, now=None, limit=None):
+        """
+        Leads due for a refresh, highest priority first: leads that change most
+        often, then the longest overdue.
+        """
+        now = now or time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT lead_key, place_url, record FROM leads WHERE next_check <= ? "
+                "ORDER BY CAST(changes AS REAL) / (checks + 1) DESC, next_check ASC "
+                "LIMIT ?", (now, -1 if limit is None else limit)).fetchall()
+        finally:
+            conn.close()
+        return [StaleLead(key, place_url, json.loads(record)) for key, place_url, record in rows]
+
+    def stats(self, now=None):
+        now = now or time.time()
+        conn = self._connect()
+        try:
+            total, stale, changed = conn.execute(
+                "SELECT COUNT(*), SUM(next_check <= ?), SUM(changes > 0) FROM leads",
+                (now,)).fetchone()
+        finally:
+            conn.close()
+        return {"leads": total, "stale": stale or 0, "ever_changed": changed or 0}
+
+    def records(self):
+        """All stored lead records"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT record FROM leads ORDER BY first_seen").fetchall()
+        finally:
+            conn.close()
+        return [json.loads(record) for (record,) in rows]
+
+    def changes(self, since=None):
+        """Change log entries (oldest first) since the given UNIX time"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT lead_key, place_url, changed_at, source, changes FROM lead_changes "
+                "WHERE changed_at >= ? ORDER BY change_id", (since or 0,)).fetchall()
+        finally:
+            conn.close()
+        return [{"lead_key": key, "place_url": place_url,
+                 "changed_at": datetime.datetime.fromtimestamp(changed_at).isoformat(timespec="seconds"),
+                 "source": source, "changes": json.loads(changes)}
+                for key, place_url, changed_at, source, changes in rows]
+
+    def changed_records(self, since):
+        """Current records of the leads that changed since the given UNIX time"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT record FROM leads WHERE last_changed >= ? ORDER BY last_changed",
+                (since,)).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(record) for (record,) in rows]
+
+    def record_contact(self, phone_e164, contacted_at=None):
+        """Remembers that a campaign message was sent to `phone_e164`"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO contacts (phone_e164, last_contacted) VALUES (?, ?) "
+                "ON CONFLICT (phone_e164) DO UPDATE SET last_contacted = excluded.last_contacted, "
+                "contacts = contacts + 1", (phone_e164, contacted_at or time.time()))
+        finally:
+            conn.close()
+
+    def contacted_numbers(self, since=None):
+        """Numbers messaged since the given UNIX time (all time if None)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT phone_e164 FROM contacts WHERE last_contacted >= ?",
+                                (since or 0,)).fetchall()
+        finally:
+            conn.close()
+        return {phone for (phone,) in rows}
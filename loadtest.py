@@ -0,0 +1,358 @@
+"""
+Load test of the Streamlit app with stand-ins for Gemini, Google Maps and WhatsApp.
+
+Runs main_setVal.py for N simulated sessions at once through Streamlit's
+AppTest, in one process like a real Streamlit server: every session types a
+request and presses "Process Request", so the whole main() flow runs (planning,
+admission, browser scrape, Excel export, lead store, scoring, WhatsApp sends).
+The backends are local stand-ins with configurable latencies:
+
+- Gemini: planner_fixture_server.py, via PLANNER_BACKEND=http
+- Google Maps: maps_fixture_server.py, via SCRAPER_MAPS_URL (still needs Chromium)
+- WhatsApp: a stub pywhatkit module whose send just sleeps
+
+Reports p50/p95/p99 end-to-end latency, throughput, event-loop blocking time
+and peak RSS (this process plus its browsers). Every session writes its output
+(Excel files, traces, leads.db) under --workdir, not ./output.
+
+Usage:
+    python loadtest.py --sessions 20 --ramp 10 --planner-latency 1500 \\
+        --place-latency 200 --whatsapp-latency 3000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+
+try:
+    import psutil
+except ImportError:  # Peak RSS falls back to getrusage without psutil
+    psutil = None
+
+from streamlit.testing.v1 import AppTest
+
+from benchmark_scraper import percentile
+from maps_fixture_server import FixtureConfig, MapsFixtureServer
+from planner_fixture_server import PlannerFixtureConfig, PlannerFixtureServer
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_setVal.py")
+SESSION_GRACE_S = 10  # Past --timeout before a session counts as hung
+DEFAULT_REQUEST = "Find 10 cafes in Islamabad sector {session} and send the first 3 'Hello from the load test'"
+
+
+class WhatsAppStub:
+    """Stand-in for pywhatkit: sendwhatmsg_instantly blocks for the configured latency"""
+
+    def __init__(self, latency_ms=0, jitter=0.0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.sent = []
+
+    def sendwhatmsg_instantly(self, phone_no, message, wait_time=15, tab_close=False, close_time=3):
+        time.sleep(self.latency_ms / 1000 * random.uniform(1 - self.jitter, 1 + self.jitter))
+        self.sent.append(phone_no)
+
+    def install(self):
+        """Makes `import pywhatkit` (done lazily by the app) return this stub"""
+        module = types.ModuleType("pywhatkit")
+        module.sendwhatmsg_instantly = self.sendwhatmsg_instantly
+        sys.modules["pywhatkit"] = module
+        return self
+
+
+class LoopLagMonitor(asyncio.DefaultEventLoopPolicy):
+    """
+    Event loop policy that adds a heartbeat to every event loop it creates.
+
+    The heartbeat is a callback rescheduled every `interval_s`; when it runs
+    more than `stall_s` late, something held the loop (blocking I/O, CPU work
+    or a long synchronous call) and the delay is counted as blocking time.
+    Every session's asyncio.run(main()) gets its own loop, and all of them are
+    measured.
+    """
+
+    def __init__(self, interval_s=0.01, stall_s=0.05):
+        super().__init__()
+        self.interval_s = interval_s
+        self.stall_s = stall_s
+        self.loops = 0
+        self.stalls = 0
+        self.blocked_s = 0.0
+        self.max_stall_s = 0.0
+        self._lock = threading.Lock()
+
+    def new_event_loop(self):
+        loop = super().new_event_loop()
+        with self._lock:
+            self.loops += 1
+        loop.call_soon(self._beat, loop, None)
+        return loop
+
+    def _beat(self, loop, expected):
+        now = loop.time()
+        if expected is not None and now - expected > self.stall_s:
+            with self._lock:
+                self.stalls += 1
+                self.blocked_s += now - expected
+                self.max_stall_s = max(self.max_stall_s, now - expected)
+        loop.call_later(self.interval_s, self._beat, loop, now + self.interval_s)
+
+    def summary(self):
+        return {"event_loops": self.loops, "stalls": self.stalls,
+                "blocked_s": round(self.blocked_s, 3), "max_stall_ms": round(self.max_stall_s * 1000, 1)}
+
+
+class RSSSampler:
+    """Samples the RSS of this process and its children (the browsers) in a thread"""
+
+    def __init__(self, interval_s=0.25):
+        self.interval_s = interval_s
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:  # The child exited
+                pass
+        self.peak_mb = max(self.peak_mb, rss / (1024 * 1024))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def start(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+        else:
+            # Peak of this process plus the largest child; kB on Linux
+            self.peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                            + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+        return round(self.peak_mb, 1)
+
+
+def share_streamlit_runtime():
+    """
+    Lets AppTest sessions run side by side.
+
+    AppTest installs a mock Streamlit runtime and the "global.appTest" option
+    around every script run and removes them afterwards, which pulls them out
+    from under sessions still running. Keep the first runtime and the option
+    for the rest of the process instead. Scripts are compiled once and shared,
+    as a Streamlit server does (and ast.parse is not thread-safe on Python 3.11).
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    shared = []
+
+    def instance(cls):
+        if not shared:
+            if cls._instance is None:
+                raise RuntimeError("Runtime hasn't been created!")
+            shared.append(cls._instance)
+        return shared[0]
+
+    get_bytecode = ScriptCache.get_bytecode
+    bytecode = {}
+    compile_lock = threading.Lock()
+
+    def shared_get_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in bytecode:
+                bytecode[script_path] = get_bytecode(self, script_path)
+            return bytecode[script_path]
+
+    ScriptCache.get_bytecode = shared_get_bytecode
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: bool(shared) or cls._instance is not None)
+    config.set_option("global.appTest", True)
+
+
+def run_session(index, request, start_at, timeout_s):
+    """One simulated user: open the app, enter `request`, press "Process Request" """
+    time.sleep(max(0.0, start_at - time.perf_counter()))
+    result = {"session": index, "seconds": None, "ok": False, "errors": []}
+    try:
+        at = AppTest.from_file(APP_SCRIPT, default_timeout=timeout_s)
+        at.run()
+        next(t for t in at.text_area if t.label == "Enter your request").input(
+            request.format(session=index))
+        button = next(b for b in at.button if b.label == "Process Request")
+        start = time.perf_counter()
+        button.click().run()
+        result["seconds"] = time.perf_counter() - start
+        result["errors"] = ([element.value for element in at.error]
+                            + [element.message for element in at.exception])
+        result["ok"] = not result["errors"]
+    except Exception as e:  # A timed-out or crashed session counts as failed
+        result["errors"].append(f"{type(e).__name__}: {e}")
+    return result
+
+
+def run_sessions(sessions, request, start, ramp_s, timeout_s):
+    """
+    Runs the sessions on daemon threads, each under a hard deadline.
+
+    AppTest's timeout does not interrupt a script stuck inside asyncio.run, so a
+    session still running SESSION_GRACE_S after its timeout is abandoned and
+    reported as failed; its daemon thread cannot keep the harness from exiting.
+    """
+    finished = [None] * sessions
+    threads = []
+    for index in range(sessions):
+        start_at = start + ramp_s * index / sessions
+
+        def target(index=index, start_at=start_at):
+            finished[index] = run_session(index, request, start_at, timeout_s)
+
+        thread = threading.Thread(target=target, name=f"load-test-session-{index}", daemon=True)
+        thread.start()
+        threads.append((thread, start_at))
+
+    results = []
+    for index, (thread, start_at) in enumerate(threads):
+        thread.join(max(0.0, start_at + timeout_s + SESSION_GRACE_S - time.perf_counter()))
+        if thread.is_alive():
+            results.append({"session": index, "seconds": None, "ok": False,
+                            "errors": [f"Hung: still running {timeout_s + SESSION_GRACE_S:.0f}s "
+                                       f"after it started; abandoned"]})
+        else:
+            results.append(finished[index])
+    return results
+
+
+def run_load_test(sessions, request, ramp_s, timeout_s, planner_config, fixture_config,
+                  whatsapp):
+    """
+    Runs `sessions` concurrent sessions against fresh stand-in servers.
+
+    Returns:
+        dict: Per-session results and the aggregate report.
+    """
+    monitor = LoopLagMonitor()
+    asyncio.set_event_loop_policy(monitor)
+    share_streamlit_runtime()
+    whatsapp.install()
+    with PlannerFixtureServer(planner_config) as planner_server, \
+            MapsFixtureServer(fixture_config) as maps_server:
+        os.environ["PLANNER_BACKEND"] = "http"
+        os.environ["PLANNER_URL"] = planner_server.plan_url
+        os.environ["SCRAPER_MAPS_URL"] = maps_server.maps_url
+        sampler = RSSSampler().start()
+        start = time.perf_counter()
+        results = run_sessions(sessions, request, start, ramp_s, timeout_s)
+        seconds = time.perf_counter() - start
+        peak_rss_mb = sampler.stop()
+        planner_requests = planner_server.request_count
+        maps_requests = dict(maps_server.request_counts)
+
+    latencies = [r["seconds"] for r in results if r["ok"]]
+    report = {
+        "sessions": sessions,
+        "succeeded": len(latencies),
+        "failed": sessions - len(latencies),
+        "wall_s": round(seconds, 2),
+        "throughput_per_min": round(len(latencies) / seconds * 60, 2),
+        "latency_s": {name: round(percentile(latencies, fraction), 2)
+                      for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+                     if latencies else None,
+        "event_loop": monitor.summary(),
+        "peak_rss_mb": peak_rss_mb,
+        "whatsapp_sends": len(whatsapp.sent),
+        "planner_requests": planner_requests,
+        "maps_requests": maps_requests,
+    }
+    return {"report": report, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with stubbed Gemini, Maps and WhatsApp.")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--ramp", type=float, default=0.0,
+                        help="Seconds over which session starts are spread")
+    parser.add_argument("--request", default=DEFAULT_REQUEST,
+                        help="Request each session sends; {session} is replaced by its number")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds per session; sessions still running "
+                             f"{SESSION_GRACE_S}s later are reported as hung")
+    # Stand-in latencies
+    parser.add_argument("--planner-latency", type=int, default=1000, help="ms")
+    parser.add_argument("--planner-error-rate", type=float, default=0.0)
+    parser.add_argument("--results", type=int, default=FixtureConfig.results)
+    parser.add_argument("--page-load-latency", type=int, default=0, help="ms")
+    parser.add_argument("--search-latency", type=int, default=0, help="ms")
+    parser.add_argument("--scroll-latency", type=int, default=0, help="ms")
+    parser.add_argument("--place-latency", type=int, default=0, help="ms")
+    parser.add_argument("--whatsapp-latency", type=int, default=2000, help="ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Applied to every latency")
+    # Scraper waits; the production waits are tuned for the live site
+    parser.add_argument("--wait", type=int, default=500,
+                        help="ms for each of the scraper's fixed waits")
+    parser.add_argument("--workdir", help="Where sessions write their output (default: a temp dir)")
+    parser.add_argument("--json", help="Also write the report and per-session results here")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="loadtest_"))
+    os.environ["SKIP_SYSTEM_DEPENDENCIES"] = "1"
+    for name in ("page_load_wait_ms", "type_wait_ms", "search_wait_ms", "scroll_wait_ms",
+                 "listing_wait_ms"):
+        os.environ[f"SCRAPER_{name.upper()}"] = str(args.wait)
+
+    outcome = run_load_test(
+        args.sessions, args.request, args.ramp, args.timeout,
+        PlannerFixtureConfig(latency_ms=args.planner_latency, jitter=args.jitter,
+                             error_rate=args.planner_error_rate),
+        FixtureConfig(results=args.results, page_load_latency_ms=args.page_load_latency,
+                      search_latency_ms=args.search_latency,
+                      scroll_latency_ms=args.scroll_latency,
+                      place_latency_ms=args.place_latency, jitter=args.jitter),
+        WhatsAppStub(args.whatsapp_latency, args.jitter))
+    report = outcome["report"]
+
+    print(f"Sessions:          {report['succeeded']} succeeded, {report['failed']} failed")
+    print(f"Wall time:         {report['wall_s']:.2f} s")
+    print(f"Throughput:        {report['throughput_per_min']:.2f} requests/min")
+    if report["latency_s"]:
+        latency = report["latency_s"]
+        print(f"Latency:           p50 {latency['p50']:.2f} s  p95 {latency['p95']:.2f} s  "
+              f"p99 {latency['p99']:.2f} s")
+    loop = report["event_loop"]
+    print(f"Event-loop blocking: {loop['blocked_s']:.2f} s in {loop['stalls']} stalls "
+          f"(longest {loop['max_stall_ms']:.0f} ms) across {loop['event_loops']} loops")
+    print(f"Peak RSS:          {report['peak_rss_mb']:.0f} MB")
+    print(f"Backend calls:     {report['planner_requests']} plans, "
+          f"{report['whatsapp_sends']} WhatsApp sends, Maps {report['maps_requests']}")
+    print(f"Output in:         {os.getcwd()}")
+    for result in outcome["results"]:
+        if not result["ok"]:
+            first_lines = [(str(error).splitlines() or [""])[0] for error in result["errors"]]
+            print(f"  session {result['session']}: {'; '.join(first_lines)}")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as fp:
+            json.dump(outcome, fp, indent=2, default=str)
+    return 0 if report["succeeded"] == report["sessions"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,24 +4,42 @@ import asyncio
 import playwright.async_api
 from playwright.async_api import async_playwright
 import os
+import sys
+import socket
+import contextlib
+import functools
 import logging
 from dataclasses import dataclass, asdict, field
 import datetime
 import time
+import re
 import google.generativeai as genai
 from dotenv import load_dotenv
 import json
-import pywhatkit
+from phone_utils import infer_default_region, normalize_phone_series
+from enrichment import enrich_business_list
+from metrics import registry, span, start_job, finish_job
+from checkpoint import CheckpointStore, ScrapeCheckpoint
+from lead_store import SQLiteLeadStore, place_id
+from lead_scoring import ScoringConfig, rank_recipients, score_leads
+from work_queue import DEFAULT_LEASE_SECONDS
+from deadline import DeadlineScheduler
+from pipeline import LeadPipeline
+from warmup import BrowserWarmup
+from renderer_memory import RendererMemoryMonitor
+from profiling import PROFILING_AVAILABLE, RequestProfiler
+from reviews import ReviewConfig, harvest_reviews, parse_review_count, read_reviews_count
+from batch_planner import BatchPlanner, BatchPlanStats
+from admission import AdmissionRejected, get_controller
+from planner import PLANNER_BACKENDS, RuleBasedPlanner, build_planner, resolve_backend
 
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv('GOOGLE_API_KEY')
 
-if not API_KEY:
-    st.error("Error: GOOGLE_API_KEY not found in environment variables.")
-    st.stop()
-
-genai.configure(api_key=API_KEY)
+# Without a key the app still runs, planning with the rule-based planner
+if API_KEY:
+    genai.configure(api_key=API_KEY)
 
 # --- Define Tool Schemas (Functions the LLM can 'call') ---
 search_Maps_func = {
@@ -39,6 +57,15 @@ search_Maps_func = {
                 "type": "INTEGER", # Use UPPERCASE
                 "description": "Optional. The desired approximate number of business results to find. Defaults to 20 if not specified.",
             },
+            "time_budget_seconds": {
+                "type": "INTEGER", # Use UPPERCASE
+                "description": "Optional. Maximum time in seconds the search may take (e.g. 'whatever you can find in 60 seconds'). Partial results are returned when it runs out.",
+            },
+            "query_variants": {
+                "type": "ARRAY", # Use UPPERCASE
+                "items": {"type": "STRING"},
+                "description": "Optional. Alternative search terms for the same leads (e.g. 'graphic design agency in New York' alongside 'graphic designers in New York'). They are searched in parallel with `query` and the results merged.",
+            },
         },
         "required": ["query"],
     },
@@ -70,25 +97,71 @@ prepare_whatsapp_message_func = {
     },
 }
 
-# Initialize the LLM Model with the corrected Tools
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    tools=[search_Maps_func, prepare_whatsapp_message_func] # Pass the corrected dictionaries
-)
+# Planning instructions shared by get_agent_plan and the batch planner
+PLANNING_INSTRUCTIONS = """Analyze the following user request for lead generation using the available tools: 'search_Maps' and 'prepare_whatsapp_message'.
+
+**CRITICAL TASK:** Interpret the user's request to identify the **type of business or place** they are actually looking for on Google Maps, especially when they use terms like 'clients' or 'leads'. Formulate the most effective search query for the 'search_Maps' tool.
 
+**Interpretation Examples:**
+- User: "find me graphic design clients in New York" -> Your interpretation: The user wants businesses that *are* graphic designers or *hire* them. -> **Search Query:** "graphic designers in New York" OR "graphic design agency in New York"
+- User: "look for companies needing marketing services in London" -> Your interpretation: The user wants potential clients for marketing. -> **Search Query:** "marketing agency in London" OR "businesses in London" (less specific, might need clarification)
+- User: "get me plumbing leads in Chicago" -> Your interpretation: The user wants plumbing businesses. -> **Search Query:** "plumbers in Chicago" OR "plumbing companies in Chicago"
+- User: "find cafes in Islamabad and send message X" -> Your interpretation: Direct request. -> **Search Query:** "cafes in Islamabad"
+"""
 
-asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+PLANNING_STEPS = """**Your Steps:**
+1.  Carefully analyze the User Request.
+2.  Determine the core action(s): Search Maps, Prepare WhatsApp message, or Both.
+3.  **If searching:** Formulate the best possible `query` string for Google Maps based on your interpretation (as shown in examples) and identify the `location`. Determine `num_results` (default 20 if unspecified). When your interpretation has alternatives (the OR cases above), put the best one in `query` and up to 3 others in `query_variants`; they are all searched in parallel.
+4.  **If messaging:** Extract the `message` content, the limit `k`, or specific `target_numbers`.
+5.  Identify the correct function(s) ('search_Maps', 'prepare_whatsapp_message') to call and construct their arguments precisely.
+6.  If the plan involves searching and then messaging those results, ensure 'search_Maps' is called first.
+"""
 
-# Ensure necessary system packages are installed
-os.system(
-    'apt-get update && apt-get install -y libnss3 libatk1.0-0 libatk-bridge2.0-0 libx11-xcb1 libxcomposite1 libxcursor1 libxdamage1 libxfixes3 libxi6 libxrandr2 libgbm1 libasound2 libpangocairo-1.0-0 libpango-1.0-0 libgdk-pixbuf2.0-0 libgtk-3-0 libdrm2'
-)
 
-# Install Playwright
-os.system('pip install playwright')
+def build_planning_prompt(user_input):
+    """The full single-request planning prompt sent to Gemini"""
+    return f"""{PLANNING_INSTRUCTIONS}
 
-# Install Playwright browsers
-os.system('playwright install')
+        **User Request:** "{user_input}"
+
+        {PLANNING_STEPS}
+        """
+
+
+def make_planner(backend=None):
+    """
+    Builds the planner for a backend name ("gemini", "http" or "rules"); see
+    planner.build_planner. PLANNER_BACKEND and PLANNER_URL set the defaults.
+    """
+    return build_planner(
+        backend or os.getenv("PLANNER_BACKEND"),
+        tools=[search_Maps_func, prepare_whatsapp_message_func],
+        build_prompt=build_planning_prompt,
+        api_key=API_KEY,
+        url=os.getenv("PLANNER_URL"))
+
+
+# Default planner, built without contacting any service
+planner = make_planner()
+
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+
+def install_system_dependencies():
+    """Installs the system packages, Playwright and its browsers needed by the scraper"""
+    # Ensure necessary system packages are installed
+    os.system(
+        'apt-get update && apt-get install -y libnss3 libatk1.0-0 libatk-bridge2.0-0 libx11-xcb1 libxcomposite1 libxcursor1 libxdamage1 libxfixes3 libxi6 libxrandr2 libgbm1 libasound2 libpangocairo-1.0-0 libpango-1.0-0 libgdk-pixbuf2.0-0 libgtk-3-0 libdrm2'
+    )
+
+    # Install Playwright
+    os.system('pip install playwright')
+
+    # Install Playwright browsers
+    os.system('playwright install')
 
 
 # Ensure Playwright browsers are installed
@@ -118,26 +191,57 @@ class Business:
     address: str = None
     website: str = None
     phone_number: str = None
-    # reviews_count: int = None
+    reviews_count: int = None
     reviews_average: float = None
+    phone_e164: str = None
+    phone_type: str = None
+    emails: str = None
+    contact_pages: str = None
+    social_handles: str = None
+    place_url: str = None
+    category: str = None
+    found_by: str = None  # Search query (or "; "-joined queries) that returned this place
+
+    def _dedup_key(self):
+        # Prefer the normalized phone so "0300 1234567" and "+92 300 1234567" match
+        return (self.name, self.address, self.website,
+                self.phone_e164 or self.phone_number, self.reviews_average)
 
     def __eq__(self, other):
         if not isinstance(other, Business):
             return NotImplemented
-        return (self.name, self.address, self.website, self.phone_number,
-                self.reviews_average) == \
-               (other.name, other.address, other.website, other.phone_number,
-                 other.reviews_average)
+        return self._dedup_key() == other._dedup_key()
 
     def __hash__(self):
-        return hash((self.name, self.address, self.website, self.phone_number,
-                     self.reviews_average))
+        return hash(self._dedup_key())
+
+    def place_key(self):
+        """Identifies the place across searches: its Maps place id, else name and address"""
+        return place_id(self.place_url) or ((self.name or "").strip().lower(),
+                                            (self.address or "").strip().lower())
+
+    def fill_missing_from(self, other):
+        """Copies fields that are empty here but set on `other` (e.g. from a list card)"""
+        for name in self.__dataclass_fields__:
+            if getattr(self, name) in (None, "") and getattr(other, name) not in (None, ""):
+                setattr(self, name, getattr(other, name))
+
+    def missing_fields(self, fields):
+        """Returns the names in `fields` that are empty on this business"""
+        return [name for name in fields if getattr(self, name) in (None, "")]
+
+    @classmethod
+    def from_dict(cls, record):
+        """Builds a Business from an asdict() record, ignoring unknown keys"""
+        return cls(**{key: value for key, value in record.items()
+                      if key in cls.__dataclass_fields__})
 
 
 @dataclass
 class BusinessList:
     """Holds list of Business objects, and saves to both Excel and CSV"""
     business_list: list[Business] = field(default_factory=list)
+    completeness: dict = None  # Set by deadline-limited scrapes, see DeadlineScheduler.report
     save_at = 'output'
 
     def dataframe(self):
@@ -151,7 +255,8 @@ class BusinessList:
             os.makedirs(self.save_at)
         file_path = f"{self.save_at}/{filename}.xlsx"
         try:
-            self.dataframe().to_excel(file_path, index=False)
+            with span("excel_write", rows=len(self.business_list)):
+                self.dataframe().to_excel(file_path, index=False)
             logging.info(f"Saved data to {file_path}")
             return file_path  # Return the file path after saving
         except Exception as e:
@@ -173,215 +278,997 @@ class BusinessList:
         """Returns the number of rows in the DataFrame"""
         return len(self.business_list)
 
+    def missing_field_report(self, fields=None):
+        """Returns {field: number of businesses where it is empty}"""
+        df = self.dataframe()
+        if df.empty:
+            return {}
+        fields = [name for name in (fields or df.columns) if name in df.columns]
+        missing = df[fields].isna() | (df[fields] == "")
+        return missing.sum().astype(int).to_dict()
+
+    def normalize_phone_numbers(self, default_region=None):
+        """Fills phone_e164/phone_type for every business in one batch"""
+        normalized = normalize_phone_series(
+            [business.phone_number for business in self.business_list],
+            default_region)
+        for business, phone_e164, phone_type in zip(
+                self.business_list, normalized["phone_e164"],
+                normalized["phone_type"]):
+            business.phone_e164 = phone_e164
+            business.phone_type = phone_type
+        return normalized
+
+    def top_recipients(self, k=None, scoring=None, contacted=()):
+        """
+        Returns the k best-scored businesses with distinct messageable numbers, best
+        first, with their scores (see lead_scoring.score_leads).
 
-async def scrape_business(search_term, total):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+        Returns:
+            list[tuple]: (Business, score) pairs.
+        """
+        df = self.dataframe()
+        if df.empty:
+            return []
+        scores = score_leads(df, scoring, contacted)
+        positions = rank_recipients(df, k, scores=scores)
+        return [(self.business_list[position], float(scores[position])) for position in positions]
+
+
+@dataclass
+class ScraperConfig:
+    """Tunable settings for scrape_business; defaults match the live Google Maps site"""
+    maps_url: str = "https://www.google.com/maps"
+    headless: bool = True
+    navigation_timeout_ms: int = 60000
+    page_load_wait_ms: int = 5000
+    type_wait_ms: int = 3000
+    search_wait_ms: int = 5000
+    scroll_wait_ms: int = 2000
+    listing_wait_ms: int = 3000
+    checkpoint_dir: str = "output/checkpoints"  # None disables checkpoints
+    checkpoint_every: int = 5                   # Listings between checkpoint writes
+    cards_only: bool = False                    # Read fields from the feed cards, no clicks
+    required_fields: tuple = ()                 # In cards_only mode, open listings missing these
+    prune_feed: bool = False                    # Collapse processed feed cards (long feeds)
+    prune_keep_cards: int = 10                  # Newest recorded cards left intact when pruning
+    memory_sample_every: int = 5                # Scrolls between renderer memory samples when pruning
+    checkpoint_scope: str = ""                  # Keeps checkpoints of different users apart
+    checkpoint_max_age_s: int = 24 * 3600       # Older checkpoints are discarded, not resumed
+    max_consecutive_errors: int = 5             # Failed listings in a row before giving up
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Defaults, then SCRAPER_<NAME> environment variables, then `overrides`"""
+        config = cls(**overrides)
+        for name, default in vars(cls()).items():
+            value = os.getenv(f"SCRAPER_{name.upper()}")
+            if value is None or name in overrides or isinstance(default, tuple):
+                continue
+            if isinstance(default, bool):
+                value = value.lower() in ("1", "true", "yes")
+            elif default is not None:
+                value = type(default)(value)
+            setattr(config, name, value)
+        return config
+
+    def checkpoint_variant(self):
+        """The settings that change what a scrape collects, for keying its checkpoint"""
+        return "|".join(str(value) for value in (
+            self.maps_url, self.cards_only, self.prune_feed, ",".join(self.required_fields),
+            self.checkpoint_scope))
+
+    @property
+    def place_link_xpath(self):
+        """XPath of the result-feed anchors that open a place"""
+        return f'//a[contains(@href, "{self.maps_url}/place")]'
+
+
+@contextlib.contextmanager
+def timed_stage(timings, stage):
+    """Records the block as a metrics span and appends its duration (seconds) to timings[stage]"""
+    with span(stage) as stage_span:
+        try:
+            yield stage_span
+        finally:
+            if timings is not None:
+                timings.setdefault(stage, []).append(
+                    time.perf_counter() - stage_span.start)
+
+
+async def extract_business_details(page):
+    """Reads the Business fields from the place panel currently open on the page"""
+    name_css_selector = 'h1.DUwDvf.lfPIob'
+    address_xpath = '//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]'
+    website_xpath = '//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]'
+    phone_number_xpath = '//button[contains(@data-item-id, "phone")]//div[contains(@class, "fontBodyMedium")]'
+    reviews_average_xpath = '//div[@jsaction="pane.reviewChart.moreReviews"]//div[@role="img"]'
+
+    business = Business()
+
+    if await page.locator(name_css_selector).count() > 0:
+        business.name = await page.locator(name_css_selector
+                                           ).inner_text()
+    else:
+        business.name = ""
+
+    if await page.locator(address_xpath).count() > 0:
+        address_elements = await page.locator(address_xpath
+                                              ).all()
+        if address_elements:
+            business.address = await address_elements[
+                0].inner_text()
+        else:
+            business.address = ""
+    else:
+        business.address = ""
+
+    if await page.locator(website_xpath).count() > 0:
+        website_elements = await page.locator(website_xpath
+                                              ).all()
+        if website_elements:
+            business.website = await website_elements[
+                0].inner_text()
+        else:
+            business.website = ""
+    else:
+        business.website = ""
+
+    if await page.locator(phone_number_xpath).count() > 0:
+        phone_elements = await page.locator(phone_number_xpath
+                                            ).all()
+        if phone_elements:
+            business.phone_number = await phone_elements[
+                0].inner_text()
+        else:
+            business.phone_number = ""
+    else:
+        business.phone_number = ""
+
+    business.reviews_count = await read_reviews_count(page)
+
+    if await page.locator(reviews_average_xpath).count() > 0:
+        reviews_average_text = await page.locator(
+            reviews_average_xpath).get_attribute('aria-label')
+        if reviews_average_text:
+            business.reviews_average = float(
+                reviews_average_text.split()[0].replace(
+                    ',', '.').strip())
+        else:
+            business.reviews_average = None
+    else:
+        business.reviews_average = None
+
+    return business
+
+
+# Reads one result card (from its place link); parse_listing_card() interprets the text
+READ_CARD_JS = """
+link => {
+    const card = link.closest('div.Nv2PK') || link.parentElement;
+    const text = selector => {
+        const node = card.querySelector(selector);
+        return node ? node.textContent.trim() : null;
+    };
+    return {
+        href: link.href,
+        name: link.getAttribute('aria-label') || text('.fontHeadlineSmall'),
+        rating: text('span.MW4etd'),
+        reviews: text('span.UY7F9'),
+        lines: (card.innerText || '').split('\\n').map(line => line.trim()).filter(Boolean),
+    };
+}
+"""
+# Reads every result card in one round trip
+LISTING_CARDS_JS = "links => links.map(" + READ_CARD_JS + ")"
+# Memory-bounded scrolling (ScraperConfig.prune_feed): records every new card in
+# window.__leadgenCards, then empties all but the newest `keep` recorded cards.
+# Emptied cards keep their height, so the feed's scroll position and lazy loading
+# are unaffected. Returns the number of cards recorded so far.
+PRUNE_FEED_JS = """
+({placeLinkPrefix, keep}) => {
+    const readCard = """ + READ_CARD_JS + """;
+    const recorded = window.__leadgenCards = window.__leadgenCards || [];
+    const seen = window.__leadgenSeen = window.__leadgenSeen || new Set();
+    for (const link of document.querySelectorAll(`a[href*="${placeLinkPrefix}"]`)) {
+        if (seen.has(link.href)) continue;
+        seen.add(link.href);
+        recorded.push(readCard(link));
+        const card = link.closest('div.Nv2PK');
+        if (card) card.dataset.leadgen = 'recorded';
+    }
+    const processed = document.querySelectorAll('div.Nv2PK[data-leadgen="recorded"]');
+    for (let i = 0; i < processed.length - keep; i++) {
+        const card = processed[i];
+        card.style.height = card.offsetHeight + 'px';
+        card.replaceChildren();
+        card.dataset.leadgen = 'pruned';
+    }
+    return recorded.length;
+}
+"""
+CARD_RESCUE_TIMEOUT_S = 1.0  # Minimum time to read the feed after a harvest timeout
+CARD_SEPARATOR_REGEX = re.compile(r"\s*[·⋅]\s*")
+CARD_PHONE_REGEX = re.compile(r"\+?[\d\s\-()]{7,}")
+CARD_HOURS_REGEX = re.compile(r"\b(open|opens|closed|closes)\b", re.IGNORECASE)
+CARD_RATING_REGEX = re.compile(r"[\d.,]+\s*\([\d.,KkMm]+\)")
+# Price level ("$$", "PKR 1–500") and service options ("Dine-in", "No-contact delivery")
+# share the category/address lines on some cards
+CARD_PRICE_REGEX = re.compile(
+    r"[$€£₨₹¥]{1,4}|(?:[$€£₨₹¥]|PKR|Rs\.?|USD|EUR|GBP)\s*[\d.,]+(?:\s*[–-]\s*[\d.,]+)?\+?",
+    re.IGNORECASE)
+CARD_SERVICE_REGEX = re.compile(
+    r"(?:no[- ])?(?:dine-?in|take-?out|takeaway|delivery|no-contact delivery|drive-?through"
+    r"|curbside pickup|in-store (?:shopping|pickup)|outdoor seating|onsite services"
+    r"|online (?:appointments|estimates))",
+    re.IGNORECASE)
+
+
+def parse_listing_card(card):
+    """Builds a Business from the text of a results-feed card (see LISTING_CARDS_JS)"""
+    business = Business(name=card.get("name") or "", place_url=card.get("href"))
+    if card.get("rating"):
+        try:
+            business.reviews_average = float(card["rating"].replace(",", "."))
+        except ValueError:
+            pass
+    business.reviews_count = parse_review_count(card.get("reviews"))
+
+    for line in card.get("lines", []):
+        segments = [segment for segment in CARD_SEPARATOR_REGEX.split(line) if segment]
+        for segment in segments:
+            if CARD_PHONE_REGEX.fullmatch(segment) and sum(c.isdigit() for c in segment) >= 7:
+                business.phone_number = business.phone_number or segment
+            elif (len(segments) < 2 or segment == business.name
+                  or CARD_HOURS_REGEX.search(segment) or CARD_RATING_REGEX.fullmatch(segment)
+                  or CARD_PRICE_REGEX.fullmatch(segment) or CARD_SERVICE_REGEX.fullmatch(segment)):
+                continue
+            elif business.category is None:
+                business.category = segment
+            elif business.address is None:
+                business.address = segment
+    return business
+
+
+async def extract_listing_cards(page, config):
+    """Returns the raw card data of every listing currently in the results feed"""
+    if config.prune_feed:
+        # Pruned cards are gone from the DOM; harvest_listings recorded them all
+        return await page.evaluate("() => window.__leadgenCards || []")
+    return await page.locator(config.place_link_xpath).evaluate_all(LISTING_CARDS_JS)
+
+
+@contextlib.asynccontextmanager
+async def open_scraper_page(config, timings=None, warmup=None, browser=None):
+    """
+    Yields (page, preloaded) for one scrape and closes the browser afterwards.
+
+    Uses the page of a BrowserWarmup when one is given and can be claimed, in
+    which case Maps is already loaded (preloaded=True). Otherwise opens a new
+    context in `browser` if one is shared, or launches a fresh browser.
+    """
+    page = await warmup.claim(config) if warmup else None
+    if page is not None:
+        try:
+            yield page, True
+        finally:
+            await warmup.release()
+        return
+
+    if browser is not None:
+        # Shared browser (see scrape_query_variants): one isolated context per scrape
+        context = await browser.new_context()
+        try:
+            yield await context.new_page(), False
+        finally:
+            with contextlib.suppress(Exception):
+                await context.close()
+        return
 
+    async with async_playwright() as p:
+        with timed_stage(timings, "browser_launch"):
+            browser = await p.chromium.launch(headless=config.headless)
+            page = await browser.new_page()
         try:
-            await page.goto("https://www.google.com/maps", timeout=60000)
-            await page.wait_for_timeout(5000)
+            yield page, False
+        finally:
+            with contextlib.suppress(Exception):
+                await browser.close()
 
-            await page.fill('//input[@id="searchboxinput"]', search_term)
-            await page.wait_for_timeout(3000)
 
-            await page.keyboard.press("Enter")
-            await page.wait_for_timeout(5000)
+async def harvest_listings(page, search_term, total, config, timings=None,
+                           should_stop=None, preloaded=False):
+    """
+    Searches Maps and scrolls the results feed until `total` listings are loaded.
 
-            await page.hover(
-                '//a[contains(@href, "https://www.google.com/maps/place")]')
+    `should_stop`, if given, is called after every scroll and ends scrolling
+    early when it returns True (e.g. once a time budget is spent). Pass
+    `preloaded=True` when the page already shows Maps (see BrowserWarmup).
 
-            previously_counted = 0
-            listings = []
+    With config.prune_feed, every new card is recorded in the page and processed
+    cards are emptied after each scroll, so the renderer's memory stays flat on
+    long feeds; renderer memory is sampled while scrolling (see
+    RendererMemoryMonitor). No listing locators are returned in that mode, so
+    callers open listings by href.
 
-            while True:
+    Returns:
+        tuple: (listing locators or None, their /maps/place hrefs)
+    """
+    place_link_xpath = config.place_link_xpath
+
+    if not preloaded:
+        with timed_stage(timings, "page_load"):
+            await page.goto(config.maps_url, timeout=config.navigation_timeout_ms)
+            await page.wait_for_timeout(config.page_load_wait_ms)
+
+    with timed_stage(timings, "search"):
+        await page.fill('//input[@id="searchboxinput"]', search_term)
+        await page.wait_for_timeout(config.type_wait_ms)
+
+        await page.keyboard.press("Enter")
+        await page.wait_for_timeout(config.search_wait_ms)
+
+        await page.hover(place_link_xpath)
+
+    if config.prune_feed:
+        return await harvest_listings_pruned(page, total, config, timings, should_stop)
+
+    previously_counted = 0
+    listings = []
+
+    while True:
+        with timed_stage(timings, "scroll"):
+            await page.mouse.wheel(0, 10000)
+            await page.wait_for_timeout(config.scroll_wait_ms)
+
+            current_count = await page.locator(place_link_xpath).count()
+        if current_count >= total:
+
+            all_listings = await page.locator(place_link_xpath).all()
+
+            listings = all_listings[:total]
+
+            break
+
+        elif current_count == previously_counted or (should_stop and should_stop()):
+
+            listings = await page.locator(place_link_xpath).all()
+
+            break
+
+        else:
+            previously_counted = current_count
+
+    hrefs = await page.locator(place_link_xpath).evaluate_all(
+        "links => links.map(link => link.href)")
+    return listings, hrefs[:len(listings)]
+
+
+async def harvest_listings_pruned(page, total, config, timings=None, should_stop=None):
+    """Scroll loop of harvest_listings for config.prune_feed; returns (None, hrefs)"""
+    monitor = RendererMemoryMonitor(page)
+    prune_args = {"placeLinkPrefix": f"{config.maps_url}/place",
+                  "keep": config.prune_keep_cards}
+    previously_counted = 0
+    scrolls = 0
+    try:
+        while True:
+            with timed_stage(timings, "scroll"):
                 await page.mouse.wheel(0, 10000)
-                await page.wait_for_timeout(2000)
+                await page.wait_for_timeout(config.scroll_wait_ms)
+
+                current_count = await page.evaluate(PRUNE_FEED_JS, prune_args)
+            scrolls += 1
+            if (scrolls - 1) % config.memory_sample_every == 0:
+                await monitor.sample(current_count)
+            if (current_count >= total or current_count == previously_counted
+                    or (should_stop and should_stop())):
+                break
+            previously_counted = current_count
+
+        await monitor.sample(current_count)
+        monitor.report()
+    finally:
+        await monitor.close()
+
+    hrefs = await page.evaluate("() => (window.__leadgenCards || []).map(card => card.href)")
+    return None, hrefs[:total]
 
-                current_count = await page.locator(
-                    '//a[contains(@href, "https://www.google.com/maps/place")]'
-                ).count()
-                if current_count >= total:
 
-                    all_listings = await page.locator(
-                        '//a[contains(@href, "https://www.google.com/maps/place")]'
-                    ).all()
+async def scrape_business_within(search_term, total, time_budget_s, config=None,
+                                 timings=None, on_business=None, should_stop=None,
+                                 warmup=None, browser=None):
+    """
+    Best-effort scrape that returns within `time_budget_s` seconds.
+
+    Scrolls until its share of the budget is spent, reads every harvested card,
+    then opens listings in ranked order (see DeadlineScheduler.rank_for_detail)
+    while time remains. Listings that were not opened keep their card data. The
+    returned BusinessList carries a `completeness` report.
 
-                    listings = all_listings[:total]
+    `on_business`, `should_stop`, `warmup` and `browser` behave as in scrape_business; card-only
+    listings are passed to `on_business` once the detail phase ends.
+    """
+    config = config or ScraperConfig()
+    scheduler = DeadlineScheduler(
+        budget_s=time_budget_s,
+        detail_estimate_s=config.listing_wait_ms / 1000 + 0.5)
+    results, hrefs, fully_extracted = [], [], set()
 
+    async with open_scraper_page(config, timings, warmup, browser) as (page, preloaded):
+        try:
+            # Page load and search run before the first should_stop check, so the
+            # whole harvest is bounded by the budget, not just the scroll loop
+            try:
+                listings, hrefs = await asyncio.wait_for(
+                    harvest_listings(page, search_term, total, config, timings,
+                                     should_stop=scheduler.harvest_over, preloaded=preloaded),
+                    timeout=scheduler.usable())
+                with timed_stage(timings, "card_extraction"):
+                    cards = (await asyncio.wait_for(extract_listing_cards(page, config),
+                                                    timeout=scheduler.usable()))[:len(hrefs)]
+            except asyncio.TimeoutError:
+                # Keep whatever cards the feed shows so far (best effort); reading
+                # them may use the safety margin, plus at most a second
+                scheduler.ran_out = True
+                listings, cards = None, []
+                with contextlib.suppress(Exception):
+                    with timed_stage(timings, "card_extraction"):
+                        cards = await asyncio.wait_for(
+                            extract_listing_cards(page, config),
+                            timeout=max(scheduler.remaining(), CARD_RESCUE_TIMEOUT_S))
+                cards = [card for card in cards if card.get("href")][:total]
+                hrefs = [card["href"] for card in cards]
+                logging.warning(f"Time budget of {time_budget_s}s ran out while harvesting; "
+                                f"keeping the {len(cards)} cards loaded so far.")
+            results = [parse_listing_card(card) for card in cards]
+
+            order = DeadlineScheduler.rank_for_detail([
+                (index, business.reviews_average, business.reviews_count,
+                 bool(business.missing_fields(config.required_fields)))
+                for index, business in enumerate(results)])
+
+            for index in order:
+                if (should_stop and should_stop()) or not scheduler.can_start_detail():
                     break
+                started = time.monotonic()
+
+                async def open_and_extract():
+                    if listings is not None:
+                        with timed_stage(timings, "listing_click"):
+                            await listings[index].click()
+                            await page.wait_for_timeout(config.listing_wait_ms)
+                    else:
+                        # Pruned feed: the card is gone, open the place directly
+                        with timed_stage(timings, "listing_navigate"):
+                            await page.goto(hrefs[index], timeout=config.navigation_timeout_ms)
+                            await page.wait_for_timeout(config.listing_wait_ms)
+                    with timed_stage(timings, "field_extraction"):
+                        return await extract_business_details(page)
 
-                elif current_count == previously_counted:
+                try:
+                    business = await asyncio.wait_for(
+                        open_and_extract(), timeout=scheduler.usable())
+                    business.fill_missing_from(results[index])
+                    business.place_url = hrefs[index]
+                    results[index] = business
+                    fully_extracted.add(index)
+                    registry.inc("scraped_listings_total", status="ok")
+                    if on_business:
+                        on_business(business)
+                except asyncio.TimeoutError:
+                    scheduler.ran_out = True
+                    break
+                except Exception as e:
+                    registry.inc("scraped_listings_total", status="error")
+                    logging.error(f'Error occurred while scraping listing: {e}')
+                finally:
+                    scheduler.record_detail(time.monotonic() - started)
 
-                    listings = await page.locator(
-                        '//a[contains(@href, "https://www.google.com/maps/place")]'
-                    ).all()
+        except Exception as e:
+            logging.error(f'Error occurred during deadline scraping: {e}')
 
+    if on_business:
+        for index, business in enumerate(results):
+            if index not in fully_extracted and business.name:
+                if should_stop and should_stop():
                     break
+                on_business(business)
 
-                else:
-                    previously_counted = current_count
+    business_list = BusinessList(business_list=[b for b in results if b.name])
+    business_list.completeness = scheduler.report(
+        requested=total, harvested=len(hrefs), fully_extracted=len(fully_extracted))
+    business_list.completeness["missing_fields"] = {
+        name: count for name, count in business_list.missing_field_report(
+            ["address", "website", "phone_number", "reviews_average", "reviews_count"]).items() if count}
+    logging.info(f"Deadline scrape finished: {business_list.completeness}")
+    return business_list
 
-            business_list = BusinessList()
 
-            for listing in listings:
-                try:
-                    await listing.click()
-                    await page.wait_for_timeout(3000)
+async def scrape_business(search_term, total, config=None, timings=None,
+                          time_budget_s=None, on_business=None, should_stop=None,
+                          warmup=None, browser=None):
+    """
+    Scrapes up to `total` businesses for a search term from Google Maps.
 
-                    name_css_selector = 'h1.DUwDvf.lfPIob'
-                    address_xpath = '//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]'
-                    website_xpath = '//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]'
-                    phone_number_xpath = '//button[contains(@data-item-id, "phone")]//div[contains(@class, "fontBodyMedium")]'
-                    # review_count_xpath = '//button[@jsaction="pane.reviewChart.moreReviews"]//span'
-                    reviews_average_xpath = '//div[@jsaction="pane.reviewChart.moreReviews"]//div[@role="img"]'
+    Progress is checkpointed to config.checkpoint_dir; if a previous run of the
+    same search stopped early, this run resumes from its checkpoint by opening the
+    remaining place URLs directly instead of searching and scrolling again.
 
-                    business = Business()
+    Args:
+        search_term: The Google Maps search query.
+        total: Maximum number of listings to extract.
+        config: Optional ScraperConfig (e.g. to point at a local fixture server).
+        timings: Optional dict; per-stage durations in seconds are appended to it.
+        time_budget_s: Optional deadline in seconds; see scrape_business_within.
+            Deadline scrapes are not checkpointed.
+        on_business: Optional callback, called with each Business as soon as it
+            is extracted (used to stream leads into the send stage).
+        should_stop: Optional callable checked before each listing; when it
+            returns True the scrape ends early and counts as complete.
+        warmup: Optional BrowserWarmup whose already-loaded Maps page is used
+            instead of launching a new browser.
+        browser: Optional already-running browser to open the page in.
 
-                    if await page.locator(name_css_selector).count() > 0:
-                        business.name = await page.locator(name_css_selector
-                                                           ).inner_text()
-                    else:
-                        business.name = ""
-
-                    if await page.locator(address_xpath).count() > 0:
-                        address_elements = await page.locator(address_xpath
-                                                              ).all()
-                        if address_elements:
-                            business.address = await address_elements[
-                                0].inner_text()
-                        else:
-                            business.address = ""
-                    else:
-                        business.address = ""
-
-                    if await page.locator(website_xpath).count() > 0:
-                        website_elements = await page.locator(website_xpath
-                                                              ).all()
-                        if website_elements:
-                            business.website = await website_elements[
-                                0].inner_text()
-                        else:
-                            business.website = ""
-                    else:
-                        business.website = ""
-
-                    if await page.locator(phone_number_xpath).count() > 0:
-                        phone_elements = await page.locator(phone_number_xpath
-                                                            ).all()
-                        if phone_elements:
-                            business.phone_number = await phone_elements[
-                                0].inner_text()
-                        else:
-                            business.phone_number = ""
+    Returns:
+        BusinessList: Everything extracted, even if the scrape stopped early.
+    """
+    if time_budget_s:
+        return await scrape_business_within(search_term, total, time_budget_s,
+                                            config, timings, on_business, should_stop,
+                                            warmup, browser)
+
+    config = config or ScraperConfig()
+    store = (CheckpointStore(config.checkpoint_dir, config.checkpoint_max_age_s)
+             if config.checkpoint_dir else None)
+    variant = config.checkpoint_variant()
+    checkpoint = store.load(search_term, total, variant) if store else None
+
+    business_list = BusinessList()
+    if checkpoint:
+        business_list.business_list = [Business.from_dict(record)
+                                       for record in checkpoint.records]
+        logging.info(
+            f"Resuming '{search_term}' from checkpoint at listing "
+            f"{checkpoint.next_index}/{len(checkpoint.hrefs)}")
+        if on_business:
+            for business in business_list.business_list:
+                on_business(business)
+
+    async with open_scraper_page(config, timings, warmup, browser) as (page, preloaded):
+        try:
+            listings = None
+            if checkpoint is None or not checkpoint.hrefs:
+                listings, hrefs = await harvest_listings(page, search_term, total,
+                                                         config, timings, preloaded=preloaded)
+                checkpoint = ScrapeCheckpoint(search_term=search_term, total=total,
+                                              hrefs=hrefs, variant=variant)
+                if config.cards_only:
+                    with timed_stage(timings, "card_extraction"):
+                        cards = await extract_listing_cards(page, config)
+                    checkpoint.cards = cards[:len(hrefs)]
+                if store:
+                    store.save(checkpoint)
+
+            # Listings after a failed one may already be recorded; resuming skips them
+            recorded = {record.get("place_url") for record in checkpoint.records}
+            failed = 0
+            consecutive_errors = 0
+            for index in range(checkpoint.next_index, len(checkpoint.hrefs)):
+                if should_stop and should_stop():
+                    logging.info(f"Stopping '{search_term}' early at listing {index}: enough leads")
+                    break
+                if checkpoint.hrefs[index] in recorded:
+                    if not failed:
+                        checkpoint.last_index = index
+                    continue
+                try:
+                    card_business = (parse_listing_card(checkpoint.cards[index])
+                                     if config.cards_only and index < len(checkpoint.cards)
+                                     else None)
+                    if card_business and not card_business.missing_fields(config.required_fields):
+                        # Fast path: the card had everything we need, no click
+                        business = card_business
+                        registry.inc("card_only_listings_total")
                     else:
-                        business.phone_number = ""
-
-                    # if await page.locator(review_count_xpath).count() > 0:
-                    #     review_count_text = await page.locator(
-                    #         review_count_xpath).inner_text()
-                    #     business.reviews_count = int(
-                    #         review_count_text.split()[0].replace(',',
-                    #                                              '').strip())
-                    # else:
-                    #     business.reviews_count = None
-
-                    if await page.locator(reviews_average_xpath).count() > 0:
-                        reviews_average_text = await page.locator(
-                            reviews_average_xpath).get_attribute('aria-label')
-                        if reviews_average_text:
-                            business.reviews_average = float(
-                                reviews_average_text.split()[0].replace(
-                                    ',', '.').strip())
+                        if listings is not None:
+                            with timed_stage(timings, "listing_click"):
+                                await listings[index].click()
+                                await page.wait_for_timeout(config.listing_wait_ms)
                         else:
-                            business.reviews_average = None
-                    else:
-                        business.reviews_average = None
+                            # Resumed job or pruned feed: open the place directly, no card to click
+                            with timed_stage(timings, "listing_navigate"):
+                                await page.goto(checkpoint.hrefs[index],
+                                                timeout=config.navigation_timeout_ms)
+                                await page.wait_for_timeout(config.listing_wait_ms)
+
+                        with timed_stage(timings, "field_extraction"):
+                            business = await extract_business_details(page)
+                        if card_business:
+                            business.fill_missing_from(card_business)
+                    business.place_url = checkpoint.hrefs[index]
 
                     business_list.business_list.append(business)
+                    checkpoint.records.append(asdict(business))
+                    registry.inc("scraped_listings_total", status="ok")
+                    consecutive_errors = 0
+                    if on_business:
+                        on_business(business)
                 except Exception as e:
+                    registry.inc("scraped_listings_total", status="error")
                     logging.error(
                         f'Error occurred while scraping listing: {e}')
-
-            await browser.close()
+                    if page.is_closed():
+                        raise
+                    failed += 1
+                    consecutive_errors += 1
+                    if consecutive_errors >= config.max_consecutive_errors:
+                        raise RuntimeError(
+                            f"{consecutive_errors} listings in a row failed") from e
+
+                # The checkpoint only moves past listings that are all recorded,
+                # so a resumed run retries the ones that failed
+                if not failed:
+                    checkpoint.last_index = index
+                if store and (index + 1) % config.checkpoint_every == 0:
+                    store.save(checkpoint)
+
+            if store and failed:
+                store.save(checkpoint)
+                logging.info(
+                    f"{failed} listing(s) of '{search_term}' failed; "
+                    f"run the same search again to retry them.")
+            elif store:
+                store.delete(search_term, total, variant)
             return business_list
 
         except Exception as e:
             logging.error(f'Error occurred during scraping: {e}')
-            await browser.close()
-            return BusinessList()
+            if store and checkpoint is not None:
+                store.save(checkpoint)
+                logging.info(
+                    f"Checkpoint saved at listing {checkpoint.next_index}; "
+                    f"run the same search again to resume.")
+            return business_list
+
 
-async def get_agent_plan(user_input: str):
+def merge_variant_results(queries, business_lists):
     """
-    Processes user input using the LLM to determine intent and extract parameters.
-    Handles both function calls and text responses safely. Interprets indirect queries.
+    Merges the results of several query variants into one BusinessList.
+
+    Places found by more than one variant appear once, at their first
+    position, with the data of the other copies filling any gaps and
+    `found_by` listing every variant that found them.
+    """
+    merged = {}
+    for query, business_list in zip(queries, business_lists):
+        for business in business_list.business_list:
+            key = business.place_key()
+            if key not in merged:
+                business.found_by = query
+                merged[key] = business
+                continue
+            existing = merged[key]
+            existing.fill_missing_from(business)
+            if query not in existing.found_by.split("; "):
+                existing.found_by = f"{existing.found_by}; {query}"
+    return BusinessList(business_list=list(merged.values()))
+
+
+async def scrape_query_variants(queries, total, config=None, timings=None,
+                                time_budget_s=None, on_business=None, should_stop=None,
+                                warmup=None, max_concurrency=3):
     """
-    planned_calls = []
-    llm_text_output = ""  # To store any textual response from the LLM
+    Runs several phrasings of the same search concurrently in one shared browser.
 
-    try:
-        chat = model.start_chat()
-        # --- Updated Prompt ---
-        prompt = f"""Analyze the following user request for lead generation using the available tools: 'search_Maps' and 'prepare_whatsapp_message'.
+    Each variant scrapes up to `total` listings in its own browser context, at
+    most `max_concurrency` at a time (the first may use `warmup`). Results are
+    merged and deduplicated by place (see merge_variant_results), so the
+    wall-clock cost is close to that of the slowest single search.
+
+    Returns:
+        BusinessList: The merged results; each Business's `found_by` names the
+            variant(s) that returned it.
+    """
+    config = config or ScraperConfig()
+    queries = list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-        **CRITICAL TASK:** Interpret the user's request to identify the **type of business or place** they are actually looking for on Google Maps, especially when they use terms like 'clients' or 'leads'. Formulate the most effective search query for the 'search_Maps' tool.
+    async with async_playwright() as p:
+        with timed_stage(timings, "browser_launch"):
+            browser = await p.chromium.launch(headless=config.headless)
+
+        async def run_variant(position, query):
+            def label_and_forward(business):
+                business.found_by = business.found_by or query
+                on_business(business)
+
+            async with semaphore:
+                with span("query_variant", query=query):
+                    return await scrape_business(
+                        query, total, config, timings, time_budget_s,
+                        on_business=label_and_forward if on_business else None,
+                        should_stop=should_stop,
+                        warmup=warmup if position == 0 else None,
+                        browser=browser)
 
-        **Interpretation Examples:**
-        - User: "find me graphic design clients in New York" -> Your interpretation: The user wants businesses that *are* graphic designers or *hire* them. -> **Search Query:** "graphic designers in New York" OR "graphic design agency in New York"
-        - User: "look for companies needing marketing services in London" -> Your interpretation: The user wants potential clients for marketing. -> **Search Query:** "marketing agency in London" OR "businesses in London" (less specific, might need clarification)
-        - User: "get me plumbing leads in Chicago" -> Your interpretation: The user wants plumbing businesses. -> **Search Query:** "plumbers in Chicago" OR "plumbing companies in Chicago"
-        - User: "find cafes in Islamabad and send message X" -> Your interpretation: Direct request. -> **Search Query:** "cafes in Islamabad"
+        try:
+            business_lists = await asyncio.gather(
+                *(run_variant(position, query) for position, query in enumerate(queries)))
+        finally:
+            with contextlib.suppress(Exception):
+                await browser.close()
 
-        **User Request:** "{user_input}"
+    business_list = merge_variant_results(queries, business_lists)
+    logging.info(
+        f"Query variants {queries} returned "
+        f"{sum(len(b.business_list) for b in business_lists)} listings, "
+        f"{len(business_list.business_list)} unique")
+    return business_list
 
-        **Your Steps:**
-        1.  Carefully analyze the User Request.
-        2.  Determine the core action(s): Search Maps, Prepare WhatsApp message, or Both.
-        3.  **If searching:** Formulate the best possible `query` string for Google Maps based on your interpretation (as shown in examples) and identify the `location`. Determine `num_results` (default 20 if unspecified).
-        4.  **If messaging:** Extract the `message` content, the limit `k`, or specific `target_numbers`.
-        5.  Identify the correct function(s) ('search_Maps', 'prepare_whatsapp_message') to call and construct their arguments precisely.
-        6.  If the plan involves searching and then messaging those results, ensure 'search_Maps' is called first.
-        """
-        # --- End of Updated Prompt ---
-
-        response = chat.send_message(prompt)
-
-        # (Rest of the function to parse response remains the same...)
-        # Iterate through the parts of the response candidate
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                # --- Check for Function Call FIRST ---
-                if part.function_call:
-                    call = part.function_call
-                    function_name = call.name
-                    args = {key: value for key, value in call.args.items()} if hasattr(call, 'args') else {}
-
-                    if function_name == "search_Maps" and "num_results" not in args:
-                        args["num_results"] = 20
-
-                    planned_calls.append({
-                        "function_name": function_name,
-                        "args": args
-                    })
-                # --- If not a function call, check for text ---
-                elif hasattr(part, 'text'):
-                    llm_text_output += part.text + "\n"
-
-        if not planned_calls and not llm_text_output:
-            try:
-                llm_text_output = response.text
-            except ValueError as ve:
-                llm_text_output = f"LLM response contained a function call but no text. ({ve})"
-            except Exception as text_exc:
-                 llm_text_output = f"Could not extract text response: {text_exc}"
+
+async def harvest_place_urls(search_term, total, config=None, timings=None):
+    """
+    Harvest phase of a distributed scrape: returns the /maps/place URLs of up
+    to `total` listings without opening any of them.
+    """
+    config = config or ScraperConfig()
+    async with open_scraper_page(config, timings) as (page, _):
+        _, hrefs = await harvest_listings(page, search_term, total, config, timings)
+        return hrefs
+
+
+async def run_detail_worker(queue, job_id, config=None, worker_id=None, pages=1,
+                            lease_seconds=DEFAULT_LEASE_SECONDS, timings=None):
+    """
+    Detail phase of a distributed scrape: leases place URLs from a WorkQueue and
+    extracts each one until the job has no pending or leased tasks left.
+
+    Run one worker per machine (or several per machine); each uses `pages`
+    concurrent tabs in a single browser.
+
+    Returns:
+        int: Number of places this worker extracted.
+    """
+    config = config or ScraperConfig()
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    processed = 0
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=config.headless)
+
+        async def work(tab_id):
+            nonlocal processed
+            page = await browser.new_page()
+            while True:
+                task = await asyncio.to_thread(queue.lease, job_id, tab_id, lease_seconds)
+                if task is None:
+                    if await asyncio.to_thread(queue.is_finished, job_id):
+                        break
+                    # Other workers still hold leases; wait in case one expires
+                    await asyncio.sleep(1)
+                    continue
+                try:
+                    with timed_stage(timings, "listing_navigate"):
+                        await page.goto(task.url, timeout=config.navigation_timeout_ms)
+                        await page.wait_for_timeout(config.listing_wait_ms)
+                    with timed_stage(timings, "field_extraction"):
+                        business = await extract_business_details(page)
+                    if not business.name:
+                        raise ValueError("place panel did not load")
+                    business.place_url = task.url
+                    if not await asyncio.to_thread(queue.complete, task, asdict(business)):
+                        # Lease expired and another worker owns the task now
+                        registry.inc("scraped_listings_total", status="lease_lost")
+                        continue
+                    registry.inc("scraped_listings_total", status="ok")
+                    processed += 1
+                except Exception as e:
+                    registry.inc("scraped_listings_total", status="error")
+                    logging.error(f"Worker {tab_id} failed on {task.url} "
+                                  f"(attempt {task.attempts}): {e}")
+                    await asyncio.to_thread(queue.fail, task, f"{type(e).__name__}: {e}")
+                    if page.is_closed():
+                        page = await browser.new_page()
+            await page.close()
+
+        try:
+            await asyncio.gather(*(work(f"{worker_id}/{i}") for i in range(pages)))
+        finally:
+            with contextlib.suppress(Exception):
+                await browser.close()
+    return processed
+
+
+def collect_results(queue, job_id):
+    """Merges a distributed job's results into one deduplicated BusinessList"""
+    businesses = [Business.from_dict(record) for record in queue.results(job_id)]
+    return BusinessList(business_list=list(dict.fromkeys(businesses)))
+
+
+async def refresh_stale_leads(store, config=None, limit=None, pages=1, default_region=None,
+                              timings=None, now=None):
+    """
+    Re-visits the stored leads that are due (see SQLiteLeadStore.stale), most
+    likely to have changed first, and records each visit in the store, which
+    rewrites a lead and logs the change only when its content hash differs.
+
+    Uses `pages` concurrent tabs in one browser. Leads are opened by their place
+    URL, so no search or scrolling is needed.
+
+    Returns:
+        dict: Number of leads that were "changed", "unchanged" or "failed".
+    """
+    config = config or ScraperConfig()
+    leads = await asyncio.to_thread(store.stale, now, limit)
+    counts = {"changed": 0, "unchanged": 0, "failed": 0, "added": 0}
+    if not leads:
+        return counts
+    logging.info(f"Refreshing {len(leads)} stale leads with {pages} tabs")
+    pending = iter(leads)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=config.headless)
+
+        async def work():
+            page = await browser.new_page()
+            for lead in pending:
+                record = None
+                try:
+                    with timed_stage(timings, "listing_navigate"):
+                        await page.goto(lead.place_url, timeout=config.navigation_timeout_ms)
+                        await page.wait_for_timeout(config.listing_wait_ms)
+                    with timed_stage(timings, "field_extraction"):
+                        business = await extract_business_details(page)
+                    if not business.name:
+                        raise ValueError("place panel did not load")
+                    business.place_url = lead.place_url
+                    business.category = business.category or lead.record.get("category")
+                    business.found_by = lead.record.get("found_by")
+                    BusinessList(business_list=[business]).normalize_phone_numbers(default_region)
+                    record = asdict(business)
+                except Exception as e:
+                    logging.error(f"Refresh failed for {lead.place_url}: {e}")
+                    if page.is_closed():
+                        page = await browser.new_page()
+                outcome = await asyncio.to_thread(store.record_check, lead.place_url, record)
+                counts[outcome] += 1
+                registry.inc("lead_refreshes_total", outcome=outcome)
+            await page.close()
+
+        try:
+            await asyncio.gather(*(work() for _ in range(max(pages, 1))))
+        finally:
+            with contextlib.suppress(Exception):
+                await browser.close()
+    logging.info(f"Lead refresh finished: {counts}")
+    return counts
+
+
+async def get_agent_plan(user_input: str, request_planner=None, budget_s=None):
+    """
+    Processes user input using the LLM to determine intent and extract parameters.
+    Handles both function calls and text responses safely. Interprets indirect queries.
+
+    Uses `request_planner` (default: the module-level planner). With `budget_s`,
+    a planner that misses its share of the budget falls back to a faster backend.
+    """
+    try:
+        planned_calls, llm_text_output = await (request_planner or planner).plan_within(
+            user_input, budget_s)
 
     except Exception as e:
         error_message = f"An error occurred during LLM interaction: {type(e).__name__} - {str(e)}"
         st.error(error_message)
         return [], error_message
 
-    return planned_calls, llm_text_output.strip()
+    return planned_calls, llm_text_output
+
+
+def current_user_id():
+    """Identifies the user for admission fairness: login email, else client IP, else session"""
+    with contextlib.suppress(Exception):
+        if st.user.is_logged_in:
+            return st.user.email
+    with contextlib.suppress(Exception):
+        if st.context.ip_address:
+            return st.context.ip_address
+    with contextlib.suppress(Exception):
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx().session_id
+    return "anonymous"
+
+
+@st.cache_resource
+def get_batch_planner():
+    """One BatchPlanner per server process, so its model and instructions are built once"""
+    return BatchPlanner(
+        tools=[search_Maps_func, prepare_whatsapp_message_func],
+        instructions=f"{PLANNING_INSTRUCTIONS}\n{PLANNING_STEPS}")
+
+
+def render_batch_planning():
+    """Plans many pasted requests (one per line) in a single LLM call"""
+    with st.expander("📋 Plan many requests at once"):
+        batch_input = st.text_area(
+            "One request per line",
+            placeholder="Find cafes in Islamabad\nGet me plumbing leads in Chicago and message 5 of them 'Hi!'",
+            key="batch_input")
+        if not st.button("Plan Batch"):
+            return
+        requests = [line.strip() for line in batch_input.splitlines() if line.strip()]
+        if not requests:
+            st.error("Please enter at least one request")
+            return
+
+        if not API_KEY:
+            st.warning("Batch planning needs GOOGLE_API_KEY; planning each request with the rule-based planner.")
+            rule_planner = RuleBasedPlanner()
+            plans = [rule_planner.plan_sync(request) for request in requests]
+            st.dataframe(pd.DataFrame([{"request": request, "calls": json.dumps(planned_calls), "text": text}
+                                       for request, (planned_calls, text) in zip(requests, plans)]))
+            return
+
+        stats = BatchPlanStats()
+        with st.spinner(f"Planning {len(requests)} requests..."):
+            plans = get_batch_planner().plan(requests, stats)
+
+        rows = [{"request": request,
+                 "calls": json.dumps(planned_calls, default=str),
+                 "text": text}
+                for request, (planned_calls, text) in zip(requests, plans)]
+        st.dataframe(pd.DataFrame(rows))
+        st.caption(
+            f"{stats.round_trips} LLM round trips for {len(requests)} requests "
+            f"({stats.retried} retried, {stats.failed} failed, {stats.seconds:.1f}s).")
+        st.download_button(
+            label="Download plans (JSON)",
+            data=json.dumps(rows, indent=2),
+            file_name="batch_plans.json",
+            mime="application/json"
+        )
+
+
+def render_timing_breakdown(job):
+    """Shows how a job's time split across LLM planning, scraping, export and messaging"""
+    breakdown = job.breakdown()
+    if not breakdown:
+        return
+    with st.expander("⏱️ Timing breakdown"):
+        timing_df = pd.DataFrame(breakdown)[["stage", "count", "total_s", "mean_s", "max_s"]]
+        st.dataframe(timing_df.round(3))
+        st.bar_chart(timing_df.set_index("stage")["total_s"])
+        st.download_button(
+            label="Download trace (JSON)",
+            data=json.dumps(job.to_dict(), indent=2, default=str),
+            file_name=f"trace_{job.job_id}.json",
+            mime="application/json"
+        )
+
+
+def render_profile(profiler):
+    """Shows the slowest Playwright calls of a profiled job and links its profile files"""
+    if not profiler.paths:
+        return
+    with st.expander("🔬 Profile"):
+        calls = profiler.playwright_calls.table()
+        if calls:
+            st.caption("Playwright calls, slowest total first")
+            st.dataframe(pd.DataFrame(calls).head(20))
+        with open(profiler.paths["speedscope"], "rb") as fp:
+            st.download_button(
+                label="Download profile (speedscope, open at speedscope.app)",
+                data=fp,
+                file_name=os.path.basename(profiler.paths["speedscope"]),
+                mime="application/json"
+            )
+        with open(profiler.paths["html"], "rb") as fp:
+            st.download_button(
+                label="Download profile (flame graph, HTML)",
+                data=fp,
+                file_name=os.path.basename(profiler.paths["html"]),
+                mime="text/html"
+            )
 
 
 async def main():
@@ -407,125 +1294,348 @@ async def main():
         placeholder="e.g., Find cafes in Islamabad and send them a promotional message"
     )
 
+    enrich_websites = st.checkbox(
+        "Enrich leads from their websites (emails, contact pages, social handles)")
+    harvest_review_texts = st.checkbox(
+        "Harvest reviews for each result (streamed to output/reviews)")
+    max_reviews = st.number_input(
+        "Reviews per place", min_value=1, max_value=1000, value=50, step=10,
+        disabled=not harvest_review_texts)
+    cards_only = st.checkbox(
+        "Fast mode: read results from the list cards instead of opening each listing")
+    prune_feed = st.checkbox(
+        "Memory-bounded scrolling for long result lists (listings are opened by URL)")
+    campaign_targeting = st.radio(
+        "Campaign recipients", ("Best-scored leads", "First leads found (sends while searching)"),
+        help="Best-scored leads waits for the search and ranks leads by rating, review count, "
+             "phone, website and prior contact (LEAD_SCORE_* weights).")
+    time_budget_input = st.number_input(
+        "Time budget per search in seconds (0 = no limit)", min_value=0, max_value=3600,
+        value=0, step=10)
+    default_backend = resolve_backend(os.getenv("PLANNER_BACKEND"), API_KEY)
+    planner_backend = st.selectbox(
+        "Planner", PLANNER_BACKENDS, index=PLANNER_BACKENDS.index(default_backend),
+        help="gemini: Gemini function calling; http: local planning service (PLANNER_URL); "
+             "rules: offline rule-based planner. Slower planners fall back to faster ones.")
+    planning_budget = st.number_input(
+        "Planning latency budget in seconds (0 = no limit)", min_value=0.0, max_value=60.0,
+        value=float(os.getenv("PLANNER_BUDGET_S", 0)), step=0.5)
+    profile_request = st.checkbox(
+        "Profile this request (saves a speedscope profile under output/profiles)",
+        disabled=not PROFILING_AVAILABLE,
+        help=None if PROFILING_AVAILABLE else "Install pyinstrument to enable profiling")
+    if not API_KEY:
+        st.warning("GOOGLE_API_KEY not found in environment variables; Gemini planning is unavailable.")
 
     if st.button("Process Request"):
+        job = start_job(user_input)
+        profiler = None
         if not user_input:
             st.error("Please enter your request")
         else:
-            with st.spinner("Analyzing your request..."):
-                planned_calls, llm_response = await get_agent_plan(user_input)
-
-                if planned_calls:
-                    st.success("Request analyzed successfully!")
-                    st.json(planned_calls) # Show the plan
-
-                    # --- Store results temporarily if needed for later steps ---
-                    search_results_list = None
-
-                    # Process each planned call
-                    for call in planned_calls:
-                        if call["function_name"] == "search_Maps":
-                            with st.spinner("Searching Google Maps..."):
-                                # --- Get and VALIDATE num_results ---
-                                num_results_arg = call["args"].get("num_results", 20) # Default to 20
-                                try:
-                                    # Convert to integer
-                                    num_results_int = int(num_results_arg)
-                                    if num_results_int <= 0: # Add check for non-positive
-                                        st.warning(f"Number of results must be positive ('{num_results_arg}' received). Defaulting to 20.")
-                                        num_results_int = 5
-                                except (ValueError, TypeError):
-                                    st.warning(f"Invalid value received for number of results ('{num_results_arg}'). Defaulting to 20.")
-                                    num_results_int = 20
-                                # --- End Validation ---
-
-                                # Pass the validated integer to the scraper
-                                business_list = await scrape_business(
-                                    call["args"]["query"],
-                                    num_results_int # Use the integer value
-                                )
-                                search_results_list = business_list # Store for potential later use
-
-                                if business_list and business_list.business_list: # Check if list is not None and not empty
-                                    st.success(f"Found {len(business_list.business_list)} results!")
-                                    st.dataframe(business_list.dataframe())
-
-                                    # Save results
-                                    current_datetime = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                                    search_for_filename = call["args"]["query"].replace(' ', '_').replace('/','_') # Basic sanitization
-                                    excel_filename = f"({len(business_list.business_list)}_Rows)__{current_datetime}__({search_for_filename})"
-
-                                    excel_file_path = business_list.save_to_excel(excel_filename)
-                                    if excel_file_path:
+            profiler = RequestProfiler(job.job_id).start() if profile_request else None
+            admission = get_controller()
+            user_id = current_user_id()
+            # Most requests search Maps: start the browser while the LLM is still planning,
+            # but only if a browser slot is free right now (otherwise the search queues)
+            ticket = admission.try_admit(user_id)
+            warmup = BrowserWarmup(ScraperConfig.from_env()).start() if ticket else None
+            try:
+                with st.spinner("Analyzing your request..."):
+                    planned_calls, llm_response = await get_agent_plan(
+                        user_input, make_planner(planner_backend), budget_s=planning_budget or None)
+                    if not any(c["function_name"] == "search_Maps" for c in planned_calls):
+                        if warmup:
+                            await warmup.release()
+                        admission.release(ticket)
+
+                    if planned_calls:
+                        st.success("Request analyzed successfully!")
+                        st.json(planned_calls) # Show the plan
+
+                        # --- Store results temporarily if needed for later steps ---
+                        search_results_list = None
+                        pipelined_calls = set()  # Message calls already sent while searching
+
+                        # Process each planned call
+                        for call in planned_calls:
+                            if call["function_name"] == "search_Maps":
+                                with st.spinner("Searching Google Maps..."):
+                                    # --- Get and VALIDATE num_results ---
+                                    num_results_arg = call["args"].get("num_results", 20) # Default to 20
+                                    try:
+                                        # Convert to integer
+                                        num_results_int = int(num_results_arg)
+                                        if num_results_int <= 0: # Add check for non-positive
+                                            st.warning(f"Number of results must be positive ('{num_results_arg}' received). Defaulting to 20.")
+                                            num_results_int = 5
+                                    except (ValueError, TypeError):
+                                        st.warning(f"Invalid value received for number of results ('{num_results_arg}'). Defaulting to 20.")
+                                        num_results_int = 20
+                                    # --- End Validation ---
+
+                                    # Pass the validated integer to the scraper
+                                    # Fast mode still opens listings without a phone if we will message them
+                                    needs_phone = any(c["function_name"] == "prepare_whatsapp_message"
+                                                      for c in planned_calls)
+                                    scraper_config = ScraperConfig.from_env(
+                                        checkpoint_scope=user_id,
+                                        cards_only=cards_only,
+                                        prune_feed=prune_feed,
+                                        required_fields=("phone_number",) if needs_phone else ()
+                                    )
+                                    # A budget stated in the request wins over the UI setting
+                                    try:
+                                        time_budget_s = int(call["args"].get("time_budget_seconds") or time_budget_input)
+                                    except (ValueError, TypeError):
+                                        time_budget_s = int(time_budget_input)
+                                    default_region = infer_default_region(call["args"]["query"])
+
+                                    # A following message call for the top k search results is
+                                    # pipelined: messages go out while the scrape is still running
+                                    message_call = next(
+                                        (c for c in planned_calls[planned_calls.index(call) + 1:]
+                                         if c["function_name"] == "prepare_whatsapp_message"), None)
+                                    try:
+                                        pipeline_k = int(message_call["args"]["k"])
+                                    except (TypeError, KeyError, ValueError):
+                                        pipeline_k = None
+                                    if message_call and message_call["args"].get("target_numbers"):
+                                        pipeline_k = None
+                                    if campaign_targeting == "Best-scored leads":
+                                        pipeline_k = None  # Ranking needs the complete search results
+
+                                    # Alternative phrasings are searched in parallel and merged
+                                    queries = [call["args"]["query"]] + list(call["args"].get("query_variants") or [])
+                                    scrape = functools.partial(
+                                        scrape_query_variants if len(queries) > 1 else scrape_business,
+                                        queries if len(queries) > 1 else call["args"]["query"],
+                                        num_results_int, # Use the integer value
+                                        config=scraper_config,
+                                        time_budget_s=time_budget_s or None,
+                                        warmup=warmup # Only the first search gets the warm browser
+                                    )
+                                    # The warm-up ticket covers one browser and page; variants launch a
+                                    # second, shared browser next to it with up to 3 pages in flight
+                                    if ticket is not None and len(queries) > 1:
+                                        if not admission.resize(ticket, browsers=2, pages=min(len(queries), 3)):
+                                            if warmup:
+                                                await warmup.release()
+                                            admission.release(ticket)
+                                            ticket = None
+                                    # Browsers are shared across sessions: wait for a slot if none is held
+                                    if ticket is None:
+                                        queue_status = st.empty()
                                         try:
-                                            with open(excel_file_path, 'rb') as fp:
+                                            ticket = await admission.admit(
+                                                user_id, pages=min(len(queries), 3),
+                                                on_wait=lambda position, wait_s: queue_status.info(
+                                                    f"All browsers are busy. You are number {position} in the queue "
+                                                    f"(about {wait_s:.0f}s)."))
+                                        except AdmissionRejected as e:
+                                            st.error(f"{e}. Please try again later.")
+                                            continue
+                                        queue_status.empty()
+                                    try:
+                                        if pipeline_k and pipeline_k > 0:
+                                            message_content = message_call["args"].get("message", "")
+                                            st.info(f"Messaging the first {pipeline_k} leads with a WhatsApp number while the search runs...")
+
+                                            def report_send(business, sent):
+                                                if sent:
+                                                    st.success(f"Message sent to {business.name} ({business.phone_e164})")
+                                                else:
+                                                    st.error(f"Failed to send message to {business.phone_e164}")
+
+                                            pipeline = LeadPipeline(pipeline_k, default_region)
+                                            business_list = await pipeline.run(
+                                                scrape,
+                                                functools.partial(send_whatsapp_message, message=message_content),
+                                                on_sent=report_send)
+                                            pipelined_calls.add(id(message_call))
+                                            st.caption(
+                                                f"Campaign: {pipeline.stats.sent} sent, {pipeline.stats.failed} failed in "
+                                                f"{pipeline.stats.total_s:.1f}s (search took {pipeline.stats.scrape_s:.1f}s"
+                                                f"{', stopped early' if pipeline.stats.stopped_early else ''}).")
+                                        else:
+                                            business_list = await scrape()
+                                    finally:
+                                        admission.release(ticket)
+                                        ticket = None
+                                    search_results_list = business_list # Store for potential later use
+
+                                    business_list.normalize_phone_numbers(default_region)
+
+                                    if enrich_websites and business_list.business_list:
+                                        with st.spinner("Enriching leads from their websites..."):
+                                            await enrich_business_list(business_list)
+
+                                    review_file = None
+                                    review_file_incomplete = False
+                                    if harvest_review_texts and business_list.business_list:
+                                        review_config = ReviewConfig(max_reviews_per_place=int(max_reviews))
+                                        try:
+                                            with st.spinner("Harvesting reviews..."):
+                                                async with admission.admitted(user_id, pages=review_config.tabs):
+                                                    review_result = await harvest_reviews(
+                                                        [business.place_url for business in business_list.business_list],
+                                                        review_config)
+                                            # The place panel's count is the authoritative one
+                                            for business in business_list.business_list:
+                                                count = review_result["reviews_count"].get(business.place_url)
+                                                if count is not None:
+                                                    business.reviews_count = count
+                                            review_file = review_result["path"]
+                                            if review_result["error"]:
+                                                review_file_incomplete = True
+                                                st.warning(
+                                                    f"Writing reviews failed after {review_result['reviews']} "
+                                                    f"reviews ({review_result['error']}); the review file is incomplete.")
+                                            else:
+                                                st.caption(f"Harvested {review_result['reviews']} reviews.")
+                                        except AdmissionRejected as e:
+                                            st.warning(f"Skipped review harvesting: {e}")
+                                        except Exception as e:
+                                            # The search results are still shown and saved below
+                                            logging.error(f"Review harvesting failed: {e}")
+                                            st.warning(f"Review harvesting failed: {type(e).__name__}: {e}")
+
+                                    if business_list and business_list.business_list: # Check if list is not None and not empty
+                                        st.success(f"Found {len(business_list.business_list)} results!")
+                                        if len(queries) > 1:
+                                            found_by = business_list.dataframe()["found_by"].str.split("; ").explode().value_counts()
+                                            st.caption("Results per search variant: " + ", ".join(
+                                                f"'{query}': {found_by.get(query, 0)}" for query in queries))
+                                        if business_list.completeness:
+                                            report = business_list.completeness
+                                            status = "Time budget ran out" if report["timed_out"] else "Finished within the time budget"
+                                            st.info(
+                                                f"{status} ({report['elapsed_s']}s of {report['time_budget_s']}s): "
+                                                f"{report['fully_extracted']} listings fully extracted, "
+                                                f"{report['card_only']} from list cards only.")
+                                        if cards_only:
+                                            missing = {name: count for name, count in business_list.missing_field_report(
+                                                ["name", "address", "phone_number", "reviews_average", "reviews_count", "category"]).items() if count}
+                                            if missing:
+                                                st.caption(f"Fields missing from list cards: {missing}")
+                                        st.dataframe(business_list.dataframe())
+
+                                        # Keep the leads for later refreshes (see refresh_leads.py)
+                                        try:
+                                            stored = SQLiteLeadStore().upsert(
+                                                [asdict(business) for business in business_list.business_list])
+                                            if stored["changed"]:
+                                                st.caption(f"{stored['changed']} known leads changed since they were last seen.")
+                                        except Exception as e:
+                                            logging.warning(f"Failed to store leads: {e}")
+
+                                        # Save results
+                                        current_datetime = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                                        search_for_filename = call["args"]["query"].replace(' ', '_').replace('/','_') # Basic sanitization
+                                        excel_filename = f"({len(business_list.business_list)}_Rows)__{current_datetime}__({search_for_filename})"
+
+                                        excel_file_path = business_list.save_to_excel(excel_filename)
+                                        if excel_file_path:
+                                            try:
+                                                with open(excel_file_path, 'rb') as fp:
+                                                    st.download_button(
+                                                        label="Download Results (Excel)",
+                                                        data=fp,
+                                                        file_name=f"{excel_filename}.xlsx",
+                                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" # Correct MIME type
+                                                    )
+                                            except FileNotFoundError:
+                                                 st.error(f"Could not read file for download: {excel_file_path}")
+                                        else:
+                                             st.error("Failed to save results to Excel.")
+                                        if review_file:
+                                            with open(review_file, 'rb') as fp:
                                                 st.download_button(
-                                                    label="Download Results (Excel)",
+                                                    label="Download Reviews (incomplete)" if review_file_incomplete
+                                                    else "Download Reviews",
                                                     data=fp,
-                                                    file_name=f"{excel_filename}.xlsx",
-                                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" # Correct MIME type
+                                                    file_name=os.path.basename(review_file),
+                                                    mime="application/x-ndjson"
                                                 )
-                                        except FileNotFoundError:
-                                             st.error(f"Could not read file for download: {excel_file_path}")
                                     else:
-                                         st.error("Failed to save results to Excel.")
-                                else:
-                                     st.warning("No results found or scraping failed.")
-
-
-                        elif call["function_name"] == "prepare_whatsapp_message":
-                            st.info("WhatsApp Message Action:")
-                            message_content = call['args'].get('message', '*No message content provided*')
-                            k_value = call['args'].get('k')
-                            target_numbers = call['args'].get('target_numbers')
-
-                            st.write(f"**Message:** {message_content}")
-
-                            # Handle direct target numbers if provided
-                            if target_numbers:
-                                st.write("**Target numbers (direct):**", target_numbers)
-                                with st.spinner("Sending messages to direct numbers..."):
-                                    for number in target_numbers:
-                                        if await send_whatsapp_message(number, message_content):
-                                            st.success(f"Message sent to {number}")
-                                        else:
-                                            st.error(f"Failed to send message to {number}")
-
-                            # Handle search results if available
-                            elif search_results_list and search_results_list.business_list:
-                                if k_value is not None:
-                                    try:
-                                        k_int = int(k_value)
-                                        st.write(f"**Number of recipients (k):** {k_int}")
-                                        
-                                        # Get phone numbers from search results
-                                        phone_numbers = [
-                                            business.phone_number 
-                                            for business in search_results_list.business_list[:k_int]
-                                            if business.phone_number  # Only include if phone number exists
-                                        ]
+                                         st.warning("No results found or scraping failed.")
+
+
+                            elif call["function_name"] == "prepare_whatsapp_message":
+                                if id(call) in pipelined_calls:
+                                    continue  # Already sent while the search was running
+                                st.info("WhatsApp Message Action:")
+                                message_content = call['args'].get('message', '*No message content provided*')
+                                k_value = call['args'].get('k')
+                                target_numbers = call['args'].get('target_numbers')
+
+                                st.write(f"**Message:** {message_content}")
+
+                                # Handle direct target numbers if provided
+                                if target_numbers:
+                                    st.write("**Target numbers (direct):**", target_numbers)
+                                    with st.spinner("Sending messages to direct numbers..."):
+                                        for number in target_numbers:
+                                            if await send_whatsapp_message(number, message_content):
+                                                st.success(f"Message sent to {number}")
+                                            else:
+                                                st.error(f"Failed to send message to {number}")
+
+                                # Handle search results if available
+                                elif search_results_list and search_results_list.business_list:
+                                    if k_value is not None:
+                                        try:
+                                            k_int = int(k_value)
+                                            st.write(f"**Number of recipients (k):** {k_int}")
                                         
-                                        if not phone_numbers:
-                                            st.warning("No valid phone numbers found in the search results.")
-                                        else:
-                                            with st.spinner(f"Sending messages to {len(phone_numbers)} recipients..."):
-                                                for number in phone_numbers:
-                                                    if await send_whatsapp_message(number, message_content):
-                                                        st.success(f"Message sent to {number}")
-                                                    else:
-                                                        st.error(f"Failed to send message to {number}")
+                                            # Rank the leads and pick the k best with a messageable number
+                                            scoring = ScoringConfig.from_env()
+                                            try:
+                                                contacted = SQLiteLeadStore().contacted_numbers(
+                                                    time.time() - scoring.contact_window_days * 86400)
+                                            except Exception as e:
+                                                logging.warning(f"Could not read prior contacts: {e}")
+                                                contacted = set()
+                                            recipients = search_results_list.top_recipients(k_int, scoring, contacted)
+                                            phone_numbers = [business.phone_e164 for business, _ in recipients]
+
+                                            if not phone_numbers:
+                                                st.warning("No valid phone numbers found in the search results.")
+                                            else:
+                                                st.dataframe(pd.DataFrame(
+                                                    [{"name": business.name, "phone": business.phone_e164,
+                                                      "score": round(score, 3)} for business, score in recipients]))
+                                                with st.spinner(f"Sending messages to {len(phone_numbers)} recipients..."):
+                                                    for number in phone_numbers:
+                                                        if await send_whatsapp_message(number, message_content):
+                                                            st.success(f"Message sent to {number}")
+                                                        else:
+                                                            st.error(f"Failed to send message to {number}")
                                         
-                                    except (ValueError, TypeError):
-                                        st.warning(f"Invalid value received for k ('{k_value}')")
+                                        except (ValueError, TypeError):
+                                            st.warning(f"Invalid value received for k ('{k_value}')")
+                                    else:
+                                        st.warning("No 'k' value provided to limit the number of recipients.")
                                 else:
-                                    st.warning("No 'k' value provided to limit the number of recipients.")
-                            else:
-                                st.warning("No search results available to send messages to.")
+                                    st.warning("No search results available to send messages to.")
 
 
-                else: # No planned calls from LLM
-                    st.info("LLM Response:")
-                    st.write(llm_response if llm_response else "No specific action identified by the AI.")
+                    else: # No planned calls from LLM
+                        st.info("LLM Response:")
+                        st.write(llm_response if llm_response else "No specific action identified by the AI.")
+            finally:
+                if warmup:
+                    await warmup.release() # No-op if a search already used and closed it
+                admission.release(ticket)
+                if profiler:
+                    profiler.stop()
+
+        finish_job(job)
+        render_timing_breakdown(job)
+        if profiler:
+            render_profile(profiler)
+
+    render_batch_planning()
 
 
 async def send_whatsapp_message(phone_number: str, message: str, wait_time: int = 25) -> bool:
@@ -541,27 +1651,44 @@ async def send_whatsapp_message(phone_number: str, message: str, wait_time: int
         bool: True if message was sent successfully, False otherwise
     """
     try:
+        # Imported lazily: pywhatkit needs a display as soon as it is imported
+        import pywhatkit
+
         logging.info(f"Attempting to send WhatsApp message to: {phone_number}")
         logging.info(f"Message: {message}")
         logging.info(f"Waiting {wait_time} seconds for WhatsApp Web/Desktop...")
         
-        pywhatkit.sendwhatmsg_instantly(
-            phone_no=phone_number,
-            message=message,
-            wait_time=wait_time,
-            tab_close=True,
-            close_time=3
-        )
+        # pywhatkit blocks for the whole send; run it in a thread so a scrape
+        # running alongside (see LeadPipeline) keeps making progress
+        with span("whatsapp_send"):
+            await asyncio.to_thread(
+                pywhatkit.sendwhatmsg_instantly,
+                phone_no=phone_number,
+                message=message,
+                wait_time=wait_time,
+                tab_close=True,
+                close_time=3
+            )
         
         logging.info("Message sent successfully!")
+        registry.inc("whatsapp_messages_total", status="sent")
+        try:
+            # Lead scoring ranks recently contacted numbers down
+            SQLiteLeadStore().record_contact(phone_number)
+        except Exception as e:
+            logging.warning(f"Could not record contact with {phone_number}: {e}")
         return True
         
     except Exception as e:
         error_type = type(e).__name__
         logging.error(f"An error occurred: {error_type} - {e}")
         st.error(f"Failed to send message to {phone_number}. Error: {error_type}")
+        registry.inc("whatsapp_messages_total", status="failed")
         return False
 
 
 if __name__ == "__main__":
+    # Set by loadtest.py, whose simulated sessions all re-run this script
+    if not os.getenv("SKIP_SYSTEM_DEPENDENCIES"):
+        install_system_dependencies()
     asyncio.run(main())
@@ -0,0 +1,434 @@
+"""
+Local stand-in for Google Maps that reproduces the DOM contract scrape_business
+depends on, so the scraper can be exercised reproducibly and offline.
+
+The page serves:
+  - '#searchboxinput'; pressing Enter loads results into a scrollable feed
+  - '/maps/place' anchors in the feed, lazily loaded in pages as the feed scrolls
+  - a place panel with the 'h1.DUwDvf.lfPIob' heading, 'data-item-id'
+    address/phone/authority buttons and the rating 'aria-label'
+  - a 'Reviews' tab whose panel lazily loads 'div.jftiEf' reviews as it scrolls
+
+Usage:
+    python maps_fixture_server.py --port 8600 --results 120 --place-latency 300
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+CATEGORIES = ["Cafe", "Coffee shop", "Bakery", "Restaurant", "Barber shop",
+              "Graphic designer", "Marketing agency", "Plumber"]
+STREETS = ["Jinnah Avenue", "Blue Area", "Broadway", "Baker Street", "Main Boulevard",
+           "Gulshan Avenue", "Market Road", "Station Road"]
+NAME_WORDS = ["Blue", "Golden", "Urban", "Corner", "Royal", "Green", "Sunny", "Metro",
+              "Crown", "Velvet", "Maple", "Cedar"]
+
+
+@dataclass
+class FixtureConfig:
+    """Shape and timing of the fake Maps site"""
+    results: int = 60                 # Places available per query
+    page_size: int = 10               # Cards added to the feed per lazy-load
+    page_load_latency_ms: int = 0     # Delay serving the /maps page
+    search_latency_ms: int = 0        # Delay before the first page of results
+    scroll_latency_ms: int = 0        # Delay before each further page of results
+    place_latency_ms: int = 0         # Delay before a place panel is returned
+    reviews_latency_ms: int = 0       # Delay before each page of reviews
+    max_reviews: int = 200            # Reviews served per place (at most its review count)
+    jitter: float = 0.0               # Random +/- fraction applied to every latency
+    seed: int = 7
+
+
+def _query_key(query):
+    return hashlib.sha1(query.strip().lower().encode("utf-8")).hexdigest()[:8]
+
+
+def make_place(query_key, index, seed=7):
+    """Deterministically generates the place at `index` for a query"""
+    rng = random.Random(f"{seed}:{query_key}:{index}")
+    category = rng.choice(CATEGORIES)
+    name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {category} {index + 1}"
+    phone_kind = rng.random()
+    if phone_kind < 0.6:
+        phone = f"0300 {rng.randint(1000000, 9999999)}"
+    elif phone_kind < 0.85:
+        phone = f"051 {rng.randint(1000000, 9999999)}"
+    else:
+        phone = ""
+    has_rating = rng.random() < 0.9
+    return {
+        "id": f"{query_key}_{index}",
+        "name": name,
+        "category": category,
+        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+        "phone": phone,
+        "website": f"{name.lower().replace(' ', '')}.example" if rng.random() < 0.6 else "",
+        "rating": round(rng.uniform(3.0, 5.0), 1) if has_rating else None,
+        "reviews_count": rng.randint(1, 5000) if has_rating else None,
+    }
+
+
+REVIEW_WORDS = ["Great", "coffee", "friendly", "staff", "slow", "service", "clean", "place",
+                "would", "recommend", "prices", "fair", "busy", "weekends", "parking", "easy"]
+
+
+def make_review(place_id, index, seed=7):
+    """Deterministically generates review `index` of a place"""
+    rng = random.Random(f"{seed}:{place_id}:review:{index}")
+    return {
+        "id": f"{place_id}_r{index}",
+        "author": f"{rng.choice(NAME_WORDS)} {rng.choice(STREETS).split()[0]}",
+        "rating": rng.randint(1, 5),
+        "published": f"{rng.randint(1, 11)} months ago",
+        "text": " ".join(rng.choice(REVIEW_WORDS) for _ in range(rng.randint(4, 40))),
+    }
+
+
+def place_url(origin, place):
+    """Builds the '/maps/place' URL of a place, shaped like the real one"""
+    slug = quote(place["name"].replace(" ", "+"))
+    return f"{origin}/maps/place/{slug}/data=!4m2!3m1!1s{place['id']}"
+
+
+APP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Google Maps (fixture)</title>
+<style>
+  body { margin: 0; font-family: sans-serif; display: flex; }
+  #side { width: 420px; display: flex; flex-direction: column; height: 100vh; }
+  #searchboxinput { margin: 8px; padding: 8px; font-size: 15px; }
+  div[role="feed"] { flex: 1; overflow-y: auto; }
+  .Nv2PK { position: relative; height: 110px; border-bottom: 1px solid #ddd; padding: 6px; box-sizing: border-box; }
+  .Nv2PK a.hfpxzc { position: absolute; inset: 0; z-index: 1; }
+  #pane { flex: 1; padding: 16px; height: 100vh; overflow-y: auto; }
+  .m6QErb.DxyBCb { height: 70vh; overflow-y: auto; }
+  .jftiEf { padding: 8px; border-bottom: 1px solid #eee; }
+</style>
+</head>
+<body>
+<div id="side">
+  <input id="searchboxinput" type="text" autocomplete="off">
+  <div role="feed" aria-label="Results" id="feed"></div>
+</div>
+<div id="pane"></div>
+<script>
+const PAGE_SIZE = __PAGE_SIZE__;
+const feed = document.getElementById("feed");
+const pane = document.getElementById("pane");
+let query = null, offset = 0, loading = false, exhausted = false;
+
+function el(tag, attrs, text) {
+  const node = document.createElement(tag);
+  for (const [key, value] of Object.entries(attrs || {})) node.setAttribute(key, value);
+  if (text !== undefined && text !== null) node.textContent = text;
+  return node;
+}
+
+function renderCard(place) {
+  const card = el("div", {"class": "Nv2PK"});
+  const link = el("a", {"class": "hfpxzc", "href": place.url, "aria-label": place.name,
+                        "data-place-id": place.id});
+  card.appendChild(link);
+  card.appendChild(el("div", {"class": "qBF1Pd fontHeadlineSmall"}, place.name));
+  const ratingLine = el("div", {"class": "W4Efsd"});
+  if (place.rating !== null) {
+    const stars = el("span", {"class": "ZkP5Je", "role": "img",
+                              "aria-label": place.rating + " stars " + place.reviews_count + " Reviews"});
+    stars.appendChild(el("span", {"class": "MW4etd"}, String(place.rating)));
+    stars.appendChild(el("span", {"class": "UY7F9"}, "(" + place.reviews_count.toLocaleString("en-US") + ")"));
+    ratingLine.appendChild(stars);
+  }
+  card.appendChild(ratingLine);
+  card.appendChild(el("div", {"class": "W4Efsd"}, place.category + " · " + place.address));
+  card.appendChild(el("div", {"class": "W4Efsd"},
+                      "Open 24 hours" + (place.phone ? " · " + place.phone : "")));
+  return card;
+}
+
+async function loadMore() {
+  if (loading || exhausted || query === null) return;
+  loading = true;
+  try {
+    const response = await fetch("/maps/api/search?q=" + encodeURIComponent(query) +
+                                 "&offset=" + offset + "&limit=" + PAGE_SIZE);
+    const data = await response.json();
+    for (const place of data.results) feed.appendChild(renderCard(place));
+    offset += data.results.length;
+    exhausted = data.end;
+    if (exhausted) feed.appendChild(el("div", {"class": "PbZDve"}, "You've reached the end of the list."));
+  } finally {
+    loading = false;
+  }
+  // Keep filling while the feed is not scrollable yet
+  if (!exhausted && feed.scrollHeight <= feed.clientHeight) loadMore();
+}
+
+function search(value) {
+  query = value; offset = 0; exhausted = false;
+  feed.replaceChildren();
+  loadMore();
+}
+
+async function showPlace(id) {
+  const response = await fetch("/maps/api/place/" + encodeURIComponent(id));
+  const place = await response.json();
+  const panel = el("div", {"role": "main", "aria-label": place.name});
+  panel.appendChild(el("h1", {"class": "DUwDvf lfPIob"}, place.name));
+  if (place.rating !== null) {
+    const chart = el("div", {"jsaction": "pane.reviewChart.moreReviews"});
+    chart.appendChild(el("div", {"role": "img", "aria-label": place.rating + " stars"}));
+    panel.appendChild(chart);
+    const more = el("button", {"jsaction": "pane.reviewChart.moreReviews"});
+    more.appendChild(el("span", {}, place.reviews_count.toLocaleString("en-US") + " reviews"));
+    panel.appendChild(more);
+  }
+  panel.appendChild(el("button", {"class": "DkEaL"}, place.category));
+  const address = el("button", {"data-item-id": "address"});
+  address.appendChild(el("div", {"class": "Io6YTe fontBodyMedium"}, place.address));
+  panel.appendChild(address);
+  if (place.website) {
+    const site = el("a", {"data-item-id": "authority", "href": "https://" + place.website});
+    site.appendChild(el("div", {"class": "Io6YTe fontBodyMedium"}, place.website));
+    panel.appendChild(site);
+  }
+  if (place.phone) {
+    const phone = el("button", {"data-item-id": "phone:tel:" + place.phone.replace(/\\s/g, "")});
+    phone.appendChild(el("div", {"class": "Io6YTe fontBodyMedium"}, place.phone));
+    panel.appendChild(phone);
+  }
+  if (place.rating !== null) {
+    const tab = el("button", {"role": "tab", "aria-label": "Reviews for " + place.name}, "Reviews");
+    tab.addEventListener("click", () => showReviews(panel, place.id));
+    panel.appendChild(tab);
+  }
+  pane.replaceChildren(panel);
+}
+
+function showReviews(panel, id) {
+  const list = el("div", {"class": "m6QErb DxyBCb"});
+  panel.appendChild(list);
+  let reviewOffset = 0, reviewsLoading = false, reviewsEnd = false;
+  async function loadReviews() {
+    if (reviewsLoading || reviewsEnd) return;
+    reviewsLoading = true;
+    try {
+      const response = await fetch("/maps/api/reviews/" + encodeURIComponent(id) +
+                                   "?offset=" + reviewOffset + "&limit=10");
+      const data = await response.json();
+      for (const review of data.reviews) {
+        const node = el("div", {"class": "jftiEf", "data-review-id": review.id});
+        node.appendChild(el("div", {"class": "d4r55"}, review.author));
+        node.appendChild(el("span", {"class": "kvMYJc", "role": "img",
+                                     "aria-label": review.rating + " stars"}));
+        node.appendChild(el("span", {"class": "rsqaWe"}, review.published));
+        node.appendChild(el("span", {"class": "wiI7pd"}, review.text));
+        list.appendChild(node);
+      }
+      reviewOffset += data.reviews.length;
+      reviewsEnd = data.end;
+    } finally {
+      reviewsLoading = false;
+    }
+  }
+  list.addEventListener("scroll", () => {
+    if (list.scrollTop + list.clientHeight >= list.scrollHeight - 200) loadReviews();
+  });
+  loadReviews();
+}
+
+document.getElementById("searchboxinput").addEventListener("keydown", (event) => {
+  if (event.key === "Enter") search(event.target.value);
+});
+feed.addEventListener("scroll", () => {
+  if (feed.scrollTop + feed.clientHeight >= feed.scrollHeight - 200) loadMore();
+});
+feed.addEventListener("click", (event) => {
+  const link = event.target.closest("a.hfpxzc");
+  if (!link) return;
+  event.preventDefault();
+  showPlace(link.dataset.placeId);
+});
+
+// Direct navigation to a place URL opens its panel
+const match = location.pathname.match(/^\\/maps\\/place\\/.*!1s([^!/]+)/);
+if (match) showPlace(decodeURIComponent(match[1]));
+</script>
+</body>
+</html>
+"""
+
+
+class MapsFixtureServer:
+    """
+    Serves the fake Maps site from a background thread.
+
+    Usage:
+        with MapsFixtureServer(FixtureConfig(results=100)) as server:
+            config = ScraperConfig(maps_url=server.maps_url)
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or FixtureConfig()
+        self.request_counts = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def maps_url(self):
+        return f"{self.url}/maps"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count(self, route):
+        with self._lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+    def _sleep(self, latency_ms):
+        if latency_ms <= 0:
+            return
+        jitter = self.config.jitter
+        time.sleep(latency_ms / 1000 * random.uniform(1 - jitter, 1 + jitter))
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def _send(self, status, body, content_type):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_json(self, data, status=200):
+                self._send(status, json.dumps(data), "application/json")
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path
+                config = server.config
+                origin = f"http://{self.headers.get('Host', 'localhost')}"
+
+                if path == "/maps" or path.startswith("/maps/place/"):
+                    server._count("page")
+                    server._sleep(config.page_load_latency_ms)
+                    html = APP_HTML.replace("__PAGE_SIZE__", str(config.page_size))
+                    self._send(200, html, "text/html; charset=utf-8")
+
+                elif path == "/maps/api/search":
+                    params = parse_qs(parsed.query)
+                    query = params.get("q", [""])[0]
+                    offset = int(params.get("offset", ["0"])[0])
+                    limit = int(params.get("limit", [str(config.page_size)])[0])
+                    server._count("search" if offset == 0 else "scroll")
+                    server._sleep(config.search_latency_ms if offset == 0
+                                  else config.scroll_latency_ms)
+                    key = _query_key(query)
+                    stop = min(offset + limit, config.results)
+                    results = []
+                    for index in range(offset, stop):
+                        place = make_place(key, index, config.seed)
+                        place["url"] = place_url(origin, place)
+                        results.append(place)
+                    self._send_json({"results": results, "end": stop >= config.results})
+
+                elif path.startswith("/maps/api/place/"):
+                    server._count("place")
+                    server._sleep(config.place_latency_ms)
+                    place_id = path.rsplit("/", 1)[-1]
+                    key, _, index = place_id.partition("_")
+                    if not index.isdigit() or int(index) >= config.results:
+                        self._send_json({"error": "not found"}, status=404)
+                        return
+                    place = make_place(key, int(index), config.seed)
+                    place["url"] = place_url(origin, place)
+                    self._send_json(place)
+
+                elif path.startswith("/maps/api/reviews/"):
+                    server._count("reviews")
+                    server._sleep(config.reviews_latency_ms)
+                    place_id = path.rsplit("/", 1)[-1]
+                    key, _, index = place_id.partition("_")
+                    if not index.isdigit() or int(index) >= config.results:
+                        self._send_json({"error": "not found"}, status=404)
+                        return
+                    place = make_place(key, int(index), config.seed)
+                    available = min(place["reviews_count"] or 0, config.max_reviews)
+                    params = parse_qs(parsed.query)
+                    offset = int(params.get("offset", ["0"])[0])
+                    stop = min(offset + int(params.get("limit", ["10"])[0]), available)
+                    self._send_json({
+                        "reviews": [make_review(place_id, i, config.seed) for i in range(offset, stop)],
+                        "end": stop >= available,
+                    })
+
+                else:
+                    self._send(404, "Not found", "text/plain")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local Google Maps stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--results", type=int, default=FixtureConfig.results)
+    parser.add_argument("--page-size", type=int, default=FixtureConfig.page_size)
+    parser.add_argument("--page-load-latency", type=int, default=0, help="ms")
+    parser.add_argument("--search-latency", type=int, default=0, help="ms")
+    parser.add_argument("--scroll-latency", type=int, default=0, help="ms")
+    parser.add_argument("--place-latency", type=int, default=0, help="ms")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FixtureConfig(results=args.results, page_size=args.page_size,
+                           page_load_latency_ms=args.page_load_latency,
+                           search_latency_ms=args.search_latency,
+                           scroll_latency_ms=args.scroll_latency,
+                           place_latency_ms=args.place_latency, jitter=args.jitter)
+    server = MapsFixtureServer(config, host=args.host, port=args.port)
+    print(f"Serving Google Maps fixture at {server.maps_url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import contextlib
+import contextvars
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+# Histogram buckets (seconds) covering everything from a locator query to a full scrape
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+                   120, 300)
+METRIC_PREFIX = "leadgen"
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(label_key, extra=None):
+    pairs = list(label_key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class MetricsRegistry:
+    """Process-wide Prometheus-style counters and histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, help_text=None, **labels):
+        """Increments counter `name` with the given labels"""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+            if help_text:
+                self._help[name] = help_text
+
+    def observe(self, name, value, help_text=None, **labels):
+        """Records `value` (seconds) in histogram `name` with the given labels"""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            state = series.setdefault(key, {"buckets": [0] * len(self.buckets),
+                                            "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+            if help_text:
+                self._help[name] = help_text
+
+    def render_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = f"{METRIC_PREFIX}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full_name} {self._help[name]}")
+                lines.append(f"# TYPE {full_name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                full_name = f"{METRIC_PREFIX}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full_name} {self._help[name]}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, state in sorted(series.items()):
+                    for bound, count in zip(self.buckets, state["buckets"]):
+                        lines.append(f"{full_name}_bucket{_format_labels(key, {'le': bound})} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(key, {'le': '+Inf'})} {state['count']}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {state['sum']}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {state['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path="output/metrics.prom"):
+        """Writes the exposition text to a file (e.g. for node_exporter's textfile collector)"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as fp:
+            fp.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+
+registry = MetricsRegistry()
+
+
+@dataclass
+class Span:
+    """One timed stage of a job"""
+    name: str
+    span_id: str
+    parent_id: str = None
+    start: float = 0.0
+    duration: float = None
+    status: str = "ok"
+    attributes: dict = field(default_factory=dict)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@dataclass
+class JobTrace:
+    """All spans recorded while a job (one 'Process Request' run) is active"""
+    job_id: str
+    description: str = ""
+    started_at: str = None
+    start: float = 0.0
+    spans: list[Span] = field(default_factory=list)
+
+    def breakdown(self):
+        """Returns per-stage totals, slowest first, as a list of dicts"""
+        stages = {}
+        for span in self.spans:
+            if span.duration is None:
+                continue
+            stage = stages.setdefault(span.name, {"stage": span.name, "count": 0,
+                                                  "total_s": 0.0, "max_s": 0.0})
+            stage["count"] += 1
+            stage["total_s"] += span.duration
+            stage["max_s"] = max(stage["max_s"], span.duration)
+        for stage in stages.values():
+            stage["mean_s"] = stage["total_s"] / stage["count"]
+        return sorted(stages.values(), key=lambda stage: -stage["total_s"])
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "description": self.description,
+            "started_at": self.started_at,
+            "spans": [{
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "start_offset_ms": round((span.start - self.start) * 1000, 3),
+                "duration_ms": None if span.duration is None else round(span.duration * 1000, 3),
+                "status": span.status,
+                "attributes": span.attributes,
+            } for span in self.spans],
+        }
+
+    def write_json(self, directory="output/traces"):
+        """Saves the trace as JSON and returns the file path"""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, f"{self.job_id}.json")
+        with open(path, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=2, default=str)
+        return path
+
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def start_job(description=""):
+    """Starts a new JobTrace and makes it current for this task and its children"""
+    job = JobTrace(
+        job_id=f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}",
+        description=description,
+        started_at=datetime.datetime.now().isoformat(timespec="seconds"),
+        start=time.perf_counter(),
+    )
+    _current_job.set(job)
+    return job
+
+
+def finish_job(job, trace_dir="output/traces", metrics_path="output/metrics.prom"):
+    """Clears the current job and exports its trace and the process metrics"""
+    if _current_job.get() is job:
+        _current_job.set(None)
+    try:
+        job.write_json(trace_dir)
+        registry.write_prometheus(metrics_path)
+    except OSError as e:
+        logging.warning(f"Failed to export metrics for job {job.job_id}: {e}")
+    return job
+
+
+def current_job():
+    return _current_job.get()
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Times a block as a stage of the current job.
+
+    Every span feeds the 'stage_duration_seconds' histogram, even outside a job;
+    inside a job it is also added to the job's trace.
+    """
+    parent = _current_span.get()
+    current = Span(name=name, span_id=uuid.uuid4().hex[:12],
+                   parent_id=parent.span_id if parent else None,
+                   start=time.perf_counter(), attributes=dict(attributes))
+    job = _current_job.get()
+    if job is not None:
+        job.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.start
+        registry.observe("stage_duration_seconds", current.duration,
+                         help_text="Duration of scrape/agent stages", stage=name)
+        if current.status == "error":
+            registry.inc("stage_errors_total", help_text="Stages that raised", stage=name)
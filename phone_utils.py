@@ -0,0 +1,223 @@
+import re
+import logging
+
+import numpy as np
+import pandas as pd
+
+# --- Region Rules ---
+# Numbering rules for the regions we usually search in. Each entry holds the
+# country calling code, the national trunk prefix, the allowed lengths of the
+# national significant number, and regexes used to classify numbers as mobile
+# or fixed line. A missing 'mobile' pattern means the region does not
+# distinguish the two (e.g. the North American Numbering Plan).
+#
+# An optional 'valid' regex restricts which national numbers are accepted.
+# Regions without one accept any digits of an allowed length, which lets
+# through some numbers that are not actually allocated; it is only meant to
+# catch scraping garbage, not to replace a full numbering-plan library.
+PHONE_REGIONS = {
+    "PK": {
+        "country_code": "92",
+        "trunk_prefix": "0",
+        "lengths": (9, 10),
+        # Mobiles are 3XX + 7 digits; landline area codes never start with 0, 1 or 3
+        "valid": r"3\d{9}|[24-9]\d{8,9}",
+        "mobile": r"3\d{9}",
+        "keywords": ["pakistan", "islamabad", "rawalpindi", "karachi", "lahore",
+                     "peshawar", "quetta", "multan", "faisalabad", "malakand"],
+    },
+    "US": {
+        "country_code": "1",
+        "trunk_prefix": "1",
+        "lengths": (10,),
+        "valid": r"[2-9]\d{2}[2-9]\d{6}",
+        "mobile": None,
+        "keywords": ["united states", "usa", "new york", "chicago", "los angeles",
+                     "san francisco", "houston", "boston", "seattle", "miami"],
+    },
+    "GB": {
+        "country_code": "44",
+        "trunk_prefix": "0",
+        "lengths": (9, 10),
+        # 10 digits except some 01 areas and 0800; nothing starts with 0, 4 or 6
+        "valid": r"1\d{8,9}|[235789]\d{9}|800\d{6}",
+        "mobile": r"7[1-9]\d{8}",
+        "keywords": ["united kingdom", "uk", "england", "london", "manchester",
+                     "birmingham", "liverpool", "glasgow", "edinburgh"],
+    },
+    "BD": {
+        "country_code": "880",
+        "trunk_prefix": "0",
+        "lengths": (8, 9, 10),
+        "mobile": r"1[3-9]\d{8}",
+        "keywords": ["bangladesh", "bangaldesh", "dhaka", "sylhet", "chittagong",
+                     "khulna", "rajshahi"],
+    },
+    "IN": {
+        "country_code": "91",
+        "trunk_prefix": "0",
+        "lengths": (10,),
+        "mobile": r"[6-9]\d{9}",
+        "keywords": ["india", "delhi", "mumbai", "bangalore", "bengaluru",
+                     "hyderabad", "chennai", "kolkata"],
+    },
+    "AE": {
+        "country_code": "971",
+        "trunk_prefix": "0",
+        "lengths": (8, 9),
+        "mobile": r"5\d{8}",
+        "keywords": ["united arab emirates", "uae", "dubai", "abu dhabi",
+                     "sharjah"],
+    },
+}
+
+PHONE_TYPE_MOBILE = "mobile"
+PHONE_TYPE_FIXED_LINE = "fixed_line"
+PHONE_TYPE_FIXED_LINE_OR_MOBILE = "fixed_line_or_mobile"
+PHONE_TYPE_UNKNOWN = "unknown"
+PHONE_TYPE_INVALID = "invalid"
+
+# Types that can plausibly receive a WhatsApp message
+MESSAGEABLE_PHONE_TYPES = (PHONE_TYPE_MOBILE, PHONE_TYPE_FIXED_LINE_OR_MOBILE,
+                           PHONE_TYPE_UNKNOWN)
+
+_KEYWORD_PATTERNS = {
+    region: re.compile(r"\b(" + "|".join(re.escape(k) for k in rules["keywords"]) + r")\b")
+    for region, rules in PHONE_REGIONS.items()
+}
+
+
+def infer_default_region(query, fallback=None):
+    """
+    Infers the default phone region from a search query.
+
+    Args:
+        query: The Google Maps search query (e.g., 'cafes in Islamabad').
+        fallback: Region code returned when nothing in the query matches.
+
+    Returns:
+        str: A region code from PHONE_REGIONS, or `fallback`.
+    """
+    if not query:
+        return fallback
+    text = query.lower().replace("_", " ")
+    best_region, best_position = fallback, None
+    for region, pattern in _KEYWORD_PATTERNS.items():
+        match = pattern.search(text)
+        # The earliest mention wins, e.g. "London, Ontario" is still GB-first
+        if match and (best_position is None or match.start() < best_position):
+            best_region, best_position = region, match.start()
+    return best_region
+
+
+_EXTENSION_PATTERN = re.compile(r"(?:ext\.?|extension|x|#)\s*\d{1,6}$", re.IGNORECASE)
+
+
+def _length_pattern(lengths):
+    return rf"\d{{{min(lengths)},{max(lengths)}}}"
+
+
+def normalize_phone_series(phones, default_region=None):
+    """
+    Converts a Series of raw phone strings to E.164 in one vectorized pass.
+
+    Numbers written with '+' or '00' are parsed against their own country code;
+    everything else is treated as a national number of `default_region`.
+    A trailing extension ('ext. 12', 'x12', '#12') is dropped.
+
+    Args:
+        phones: pandas Series (or list) of phone numbers as scraped.
+        default_region: Region code from PHONE_REGIONS used for national numbers.
+
+    Returns:
+        pd.DataFrame: Columns 'phone_e164' (None when invalid) and 'phone_type',
+        indexed like the input.
+    """
+    phones = pd.Series(phones, dtype="object")
+    raw = phones.fillna("").astype(str).str.strip()
+    raw = raw.str.replace(_EXTENSION_PATTERN, "", regex=True).str.strip()
+    digits = raw.str.replace(r"\D", "", regex=True)
+    international = (raw.str.startswith("+") | digits.str.startswith("00")).to_numpy()
+    has_digits = (digits != "").to_numpy()
+
+    region_col = np.full(len(raw), None, dtype=object)
+    national = np.full(len(raw), "", dtype=object)
+
+    # International numbers: split off a known country code in a single regex.
+    # Longest codes first so '880' is not swallowed by a shorter code.
+    codes = sorted(PHONE_REGIONS.items(), key=lambda item: -len(item[1]["country_code"]))
+    code_to_region = {rules["country_code"]: region for region, rules in codes}
+    code_alternation = "|".join(rules["country_code"] for _, rules in codes)
+    intl_parts = digits[international].str.extract(
+        rf"^(?:00)?({code_alternation})?(\d*)$")
+    known = intl_parts[0].notna().to_numpy()
+    intl_positions = np.flatnonzero(international)
+    region_col[intl_positions[known]] = intl_parts[0][known].map(code_to_region).to_numpy()
+    national[intl_positions[known]] = intl_parts[1][known].to_numpy()
+
+    # National numbers: strip the trunk prefix, or a country code written
+    # without '+' (e.g. "923001234567"), when what remains has a valid length.
+    local = ~international & has_digits
+    if default_region in PHONE_REGIONS and local.any():
+        rules = PHONE_REGIONS[default_region]
+        remainder = f"(?={_length_pattern(rules['lengths'])}$)"
+        local_parts = digits[local].str.extract(
+            rf"^(?:{re.escape(rules['trunk_prefix'])}{remainder}|"
+            rf"{re.escape(rules['country_code'])}{remainder})?(\d+)$")
+        region_col[local] = default_region
+        national[local] = local_parts[0].to_numpy()
+
+    phone_e164 = np.full(len(raw), None, dtype=object)
+    phone_type = np.full(len(raw), PHONE_TYPE_INVALID, dtype=object)
+    national_series = pd.Series(national, dtype="object")
+
+    for region, rules in PHONE_REGIONS.items():
+        positions = np.flatnonzero(region_col == region)
+        if not len(positions):
+            continue
+        numbers = national_series.iloc[positions]
+        valid = numbers.str.fullmatch(rules.get("valid") or _length_pattern(rules["lengths"]))
+        valid &= numbers.str.len().isin(list(rules["lengths"]))
+        valid = valid.to_numpy(dtype=bool)
+        if rules["mobile"]:
+            is_mobile = numbers.str.fullmatch(rules["mobile"]).to_numpy(dtype=bool)
+            kinds = np.where(is_mobile, PHONE_TYPE_MOBILE, PHONE_TYPE_FIXED_LINE)
+        else:
+            kinds = np.full(len(positions), PHONE_TYPE_FIXED_LINE_OR_MOBILE, dtype=object)
+        phone_type[positions[valid]] = kinds[valid]
+        phone_e164[positions[valid]] = ("+" + rules["country_code"] + numbers[valid]).to_numpy()
+
+    # International numbers outside our rule table: keep if E.164-sized
+    unknown_positions = intl_positions[~known]
+    if len(unknown_positions):
+        unknown_digits = digits.iloc[unknown_positions].str.replace(r"^00", "", regex=True)
+        sized = unknown_digits.str.len().between(8, 15).to_numpy(dtype=bool)
+        phone_type[unknown_positions[sized]] = PHONE_TYPE_UNKNOWN
+        phone_e164[unknown_positions[sized]] = ("+" + unknown_digits[sized]).to_numpy()
+
+    # object dtype keeps invalid numbers as None; pandas 3 would otherwise infer
+    # the str dtype and turn them into NaN, which is truthy and never equal to itself
+    return pd.DataFrame({"phone_e164": phone_e164, "phone_type": phone_type},
+                        index=phones.index, dtype=object)
+
+
+def normalize_phone_column(df, column="phone_number", default_region=None):
+    """
+    Adds 'phone_e164' and 'phone_type' columns to a DataFrame of leads.
+
+    Args:
+        df: DataFrame holding a raw phone column (e.g. BusinessList.dataframe()).
+        column: Name of the raw phone column.
+        default_region: Region code used for national numbers.
+
+    Returns:
+        pd.DataFrame: A copy of `df` with the normalized columns set.
+    """
+    if column not in df.columns:
+        logging.warning(f"Column '{column}' not found; skipping phone normalization")
+        return df
+    normalized = normalize_phone_series(df[column], default_region)
+    df = df.copy()
+    df["phone_e164"] = normalized["phone_e164"]
+    df["phone_type"] = normalized["phone_type"]
+    return df
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from metrics import registry
+from phone_utils import MESSAGEABLE_PHONE_TYPES, normalize_phone_series
+
+
+@dataclass
+class PipelineStats:
+    """Timings of one pipelined search-and-message run, in seconds from its start"""
+    queued: int = 0
+    sent: int = 0
+    failed: int = 0
+    stopped_early: bool = False
+    first_send_s: float = None
+    scrape_s: float = None
+    total_s: float = None
+
+
+@dataclass
+class LeadPipeline:
+    """
+    Streams leads from a running scrape into the WhatsApp send stage.
+
+    The scraper hands each extracted business to offer(). Businesses whose phone
+    normalizes to a messageable number are queued once per number; a sender task
+    works through the queue while the scrape continues. The scrape is asked to
+    stop (should_stop) as soon as `k` leads are queued, so a campaign takes about
+    max(scrape, send) instead of scrape + send.
+    """
+    k: int
+    default_region: str = None
+    stats: PipelineStats = field(default_factory=PipelineStats)
+
+    def __post_init__(self):
+        self._queue = asyncio.Queue()
+        self._numbers = set()
+
+    def is_full(self):
+        return len(self._numbers) >= self.k
+
+    def offer(self, business):
+        """Normalizes the business's phone and queues it if it is a new messageable lead"""
+        if business.phone_e164 is None and business.phone_number:
+            normalized = normalize_phone_series([business.phone_number], self.default_region)
+            business.phone_e164 = normalized["phone_e164"].iloc[0]
+            business.phone_type = normalized["phone_type"].iloc[0]
+        if (self.is_full() or not business.phone_e164
+                or business.phone_type not in MESSAGEABLE_PHONE_TYPES
+                or business.phone_e164 in self._numbers):
+            return False
+        self._numbers.add(business.phone_e164)
+        self._queue.put_nowait(business)
+        self.stats.queued += 1
+        return True
+
+    async def _send_all(self, send, on_sent, start):
+        while True:
+            business = await self._queue.get()
+            if business is None:
+                return
+            sent = await send(business.phone_e164)
+            if self.stats.first_send_s is None:
+                self.stats.first_send_s = time.monotonic() - start
+            if sent:
+                self.stats.sent += 1
+            else:
+                self.stats.failed += 1
+            if on_sent:
+                on_sent(business, sent)
+
+    async def run(self, scrape, send, on_sent=None):
+        """
+        Runs the scrape and the send stage concurrently.
+
+        Args:
+            scrape: Called as scrape(on_business=..., should_stop=...); must return
+                an awaitable BusinessList (e.g. a partial of scrape_business).
+            send: Async callable taking a phone number, returning True if sent.
+            on_sent: Optional callback(business, sent) after each send attempt.
+
+        Returns:
+            BusinessList: Everything the scrape extracted, messaged or not.
+        """
+        start = time.monotonic()
+        sender = asyncio.create_task(self._send_all(send, on_sent, start))
+        try:
+            business_list = await scrape(on_business=self.offer, should_stop=self.is_full)
+        finally:
+            self.stats.scrape_s = time.monotonic() - start
+            self._queue.put_nowait(None)  # Sender exits after draining the queue
+            await sender
+
+        self.stats.stopped_early = self.is_full()
+        self.stats.total_s = time.monotonic() - start
+        registry.observe("pipeline_duration_seconds", self.stats.total_s)
+        logging.info(f"Pipelined campaign finished: {self.stats}")
+        return business_list
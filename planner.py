@@ -0,0 +1,292 @@
+import abc
+import asyncio
+import logging
+import re
+import time
+
+import aiohttp
+
+from metrics import registry, span
+
+DEFAULT_NUM_RESULTS = 20
+DEFAULT_PLANNER_URL = "http://127.0.0.1:8700/plan"
+PLANNER_BACKENDS = ("gemini", "http", "rules")
+
+
+def parse_agent_response(response, default_num_results=DEFAULT_NUM_RESULTS):
+    """
+    Extracts the planned function calls and any text from a Gemini response.
+
+    Returns:
+        tuple: (planned_calls, llm_text_output)
+    """
+    planned_calls = []
+    llm_text_output = ""
+
+    # Iterate through the parts of the response candidate
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            # --- Check for Function Call FIRST ---
+            if part.function_call:
+                call = part.function_call
+                function_name = call.name
+                args = {key: value for key, value in call.args.items()} if hasattr(call, 'args') else {}
+
+                if function_name == "search_Maps" and "num_results" not in args:
+                    args["num_results"] = default_num_results
+                if "query_variants" in args:
+                    args["query_variants"] = [str(variant) for variant in args["query_variants"]]
+
+                planned_calls.append({
+                    "function_name": function_name,
+                    "args": args
+                })
+            # --- If not a function call, check for text ---
+            elif hasattr(part, 'text'):
+                llm_text_output += part.text + "\n"
+
+    if not planned_calls and not llm_text_output:
+        try:
+            llm_text_output = response.text
+        except ValueError as ve:
+            llm_text_output = f"LLM response contained a function call but no text. ({ve})"
+        except Exception as text_exc:
+             llm_text_output = f"Could not extract text response: {text_exc}"
+
+    return planned_calls, llm_text_output.strip()
+
+
+class Planner(abc.ABC):
+    """
+    Turns a natural-language request into planned tool calls.
+
+    Every backend returns the same (planned_calls, text) tuple, where each
+    planned call is {"function_name": ..., "args": {...}}.
+    """
+    name = "planner"
+    expected_latency_s = 1.0  # Typical latency; FallbackPlanner reserves this much for it
+
+    @abc.abstractmethod
+    async def plan(self, user_input):
+        """Returns (planned_calls, text) for `user_input`"""
+
+    async def plan_within(self, user_input, budget_s=None):
+        """Plans `user_input`, raising asyncio.TimeoutError after `budget_s` seconds"""
+        with span("llm_planning", backend=self.name):
+            if budget_s is None:
+                return await self.plan(user_input)
+            return await asyncio.wait_for(self.plan(user_input), timeout=budget_s)
+
+
+class GeminiPlanner(Planner):
+    """Plans with Gemini function calling; the model is created on first use"""
+    name = "gemini"
+    expected_latency_s = 3.0
+
+    def __init__(self, tools, build_prompt, model_name="gemini-1.5-flash-latest", model=None):
+        self.tools = tools
+        self.build_prompt = build_prompt
+        self.model_name = model_name
+        self.model = model
+
+    async def plan(self, user_input):
+        if self.model is None:
+            import google.generativeai as genai
+            self.model = genai.GenerativeModel(model_name=self.model_name, tools=self.tools)
+        chat = self.model.start_chat()
+        # send_message blocks; run it in a thread so the event loop (and a budget
+        # timeout, or a browser warm-up) keeps running
+        response = await asyncio.to_thread(chat.send_message, self.build_prompt(user_input))
+        return parse_agent_response(response)
+
+
+class HTTPPlanner(Planner):
+    """
+    Plans through a local HTTP service (see planner_fixture_server.py).
+
+    POSTs {"request": user_input} and expects {"planned_calls": [...], "text": "..."}
+    back, so any local model can be put behind the same contract.
+    """
+    name = "http"
+    expected_latency_s = 0.5
+
+    def __init__(self, url=DEFAULT_PLANNER_URL, timeout_s=30):
+        self.url = url
+        self.timeout_s = timeout_s
+
+    async def plan(self, user_input):
+        timeout = aiohttp.ClientTimeout(total=self.timeout_s)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(self.url, json={"request": user_input}) as response:
+                response.raise_for_status()
+                body = await response.json()
+        planned_calls = body.get("planned_calls") or []
+        for call in planned_calls:
+            if call.get("function_name") == "search_Maps":
+                call.setdefault("args", {}).setdefault("num_results", DEFAULT_NUM_RESULTS)
+        return planned_calls, (body.get("text") or "").strip()
+
+
+# --- Rule-based planning ---
+QUOTED_MESSAGE_REGEX = re.compile(r"(?:^|(?<=[\s:]))[\"'“‘](.+?)[\"'”’](?=[\s.,!?;]|$)")
+MESSAGE_AFTER_REGEX = re.compile(r"\b(?:message|saying|text)\s*:\s*(.+)$", re.IGNORECASE)
+PHONE_NUMBER_REGEX = re.compile(r"(?<![\w+])\+?\d[\d\s-]{7,}\d")
+MESSAGE_INTENT_REGEX = re.compile(r"\b(send|message|whatsapp|text|msg)\b", re.IGNORECASE)
+SEARCH_REGEX = re.compile(
+    r"\b(?:find|search(?:\s+for)?|look(?:ing)?\s+for|show(?:\s+me)?|get(?:\s+me)?|list|scrape)\s+"
+    r"(?:me\s+)?(?:some\s+|all\s+|the\s+)?(?:(?P<count>\d+)\s+)?"
+    r"(?P<query>.+?)(?=\s+and\s+(?:then\s+)?(?:send|message|text|whatsapp)\b|\s+then\b|[,;]|\.(?:\s|$)|$)",
+    re.IGNORECASE)
+LEAD_WORDS_REGEX = re.compile(r"\b(?:clients|leads|customers|prospects)\b", re.IGNORECASE)
+K_REGEX = re.compile(
+    r"\b(?:first|top)\s+(\d+)\b|\b(\d+)\s+of\s+them\b|"
+    r"\bto\s+(\d+)\s+(?:of\s+them|leads|businesses|results|people|places)\b",
+    re.IGNORECASE)
+NUM_RESULTS_REGEX = re.compile(
+    r"\b(\d+)\s+(?:results|businesses|places|shops|listings|leads)\b|\bmaybe\s+(\d+)\b",
+    re.IGNORECASE)
+
+
+def _first_int(match):
+    return int(next(group for group in match.groups() if group)) if match else None
+
+
+class RuleBasedPlanner(Planner):
+    """
+    Regex planner for the common request shapes: "find <places> in <city>",
+    "... and send the first <k> '<message>'", "send '<message>' to <numbers>".
+
+    Needs no network and answers in well under a millisecond, which makes it the
+    last fallback when a model is slow or unavailable.
+    """
+    name = "rules"
+    expected_latency_s = 0.01
+
+    async def plan(self, user_input):
+        return self.plan_sync(user_input)
+
+    def plan_sync(self, user_input):
+        text = " ".join(user_input.split())
+        message_match = QUOTED_MESSAGE_REGEX.search(text) or MESSAGE_AFTER_REGEX.search(text)
+        message = message_match.group(1).strip() if message_match else None
+        # Numbers inside the message must not be read as recipients or counts
+        rest = text.replace(message_match.group(0), " ") if message_match else text
+
+        target_numbers = [re.sub(r"[\s-]", "", number)
+                          for number in PHONE_NUMBER_REGEX.findall(rest)]
+        for number in PHONE_NUMBER_REGEX.findall(rest):
+            rest = rest.replace(number, " ")
+        wants_message = bool(message) or bool(MESSAGE_INTENT_REGEX.search(rest))
+        search_match = None if target_numbers else SEARCH_REGEX.search(rest)
+
+        planned_calls = []
+        if search_match:
+            query = LEAD_WORDS_REGEX.sub("businesses", search_match.group("query"))
+            query = re.sub(r"\s+(?:for me|please)$", "", query.strip(" .!?"), flags=re.IGNORECASE)
+            num_results = (int(search_match.group("count")) if search_match.group("count")
+                           else _first_int(NUM_RESULTS_REGEX.search(rest)))
+            if num_results is None and not wants_message:
+                num_results = _first_int(K_REGEX.search(rest))
+            planned_calls.append({"function_name": "search_Maps",
+                                  "args": {"query": query,
+                                           "num_results": num_results or DEFAULT_NUM_RESULTS}})
+        if wants_message and (message or target_numbers):
+            args = {"message": message or ""}
+            if target_numbers:
+                args["target_numbers"] = target_numbers
+            else:
+                k = _first_int(K_REGEX.search(rest))
+                if k:
+                    args["k"] = k
+            planned_calls.append({"function_name": "prepare_whatsapp_message", "args": args})
+
+        if not planned_calls:
+            return [], ("I can search Google Maps for businesses (e.g. 'find cafes in Islamabad') "
+                        "and send them WhatsApp messages (e.g. \"... and send the first 5 'Hello!'\").")
+        return planned_calls, ""
+
+
+class FallbackPlanner(Planner):
+    """
+    Tries backends in order (best first, fastest last) within one latency budget.
+
+    Each backend gets the budget that is left minus what the backends after it
+    are expected to need; when it times out or fails, the next one plans the
+    request instead. The last backend always runs to completion.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.name = "+".join(backend.name for backend in backends)
+        self.expected_latency_s = backends[0].expected_latency_s
+
+    async def plan(self, user_input):
+        return await self.plan_within(user_input)
+
+    async def plan_within(self, user_input, budget_s=None):
+        start = time.monotonic()
+        for position, backend in enumerate(self.backends):
+            is_last = position == len(self.backends) - 1
+            timeout = None
+            if budget_s is not None and not is_last:
+                reserve = sum(later.expected_latency_s for later in self.backends[position + 1:])
+                timeout = budget_s - (time.monotonic() - start) - reserve
+                if timeout <= 0:
+                    registry.inc("planner_fallbacks_total", backend=backend.name, reason="no_budget")
+                    continue
+            try:
+                return await backend.plan_within(user_input, timeout)
+            except asyncio.TimeoutError:
+                reason = "timeout"
+            except Exception as e:
+                if is_last:
+                    raise
+                reason = "error"
+                logging.warning(f"Planner '{backend.name}' failed: {type(e).__name__} - {e}")
+            registry.inc("planner_fallbacks_total", backend=backend.name, reason=reason)
+            logging.info(f"Planner '{backend.name}' gave up ({reason}); falling back")
+        raise asyncio.TimeoutError("No planner backend finished within the budget")
+
+
+def resolve_backend(backend=None, api_key=None):
+    """
+    Normalizes a backend name such as a PLANNER_BACKEND value ("Gemini" -> "gemini").
+
+    Without a name, Gemini is chosen when an API key is available and the
+    rule-based planner otherwise. An unknown name logs a warning and falls back
+    to the rule-based planner instead of failing.
+    """
+    name = (backend or "").strip().lower()
+    if not name:
+        return "gemini" if api_key else "rules"
+    if name not in PLANNER_BACKENDS:
+        logging.warning(f"Unknown planner backend {backend!r}; expected one of "
+                        f"{', '.join(PLANNER_BACKENDS)}. Using the rule-based planner.")
+        return "rules"
+    return name
+
+
+def build_planner(backend=None, tools=None, build_prompt=None, api_key=None,
+                  url=None, model_name="gemini-1.5-flash-latest"):
+    """
+    Returns the planner for `backend` ("gemini", "http" or "rules"), with the
+    rule-based planner behind it as the fast fallback.
+
+    `backend` is resolved with resolve_backend, so it defaults to Gemini when an
+    API key is available and unknown names get the rule-based planner. A Gemini
+    planner also falls back to the HTTP planner first when `url` is given.
+    """
+    backend = resolve_backend(backend, api_key)
+    rules = RuleBasedPlanner()
+    if backend == "rules":
+        return rules
+    if backend == "http":
+        return FallbackPlanner([HTTPPlanner(url or DEFAULT_PLANNER_URL), rules])
+    if backend == "gemini":
+        if not api_key:
+            logging.warning("No Gemini API key; planning with the rule-based planner")
+            return rules
+        backends = [GeminiPlanner(tools, build_prompt, model_name)]
+        if url:
+            backends.append(HTTPPlanner(url))
+        return FallbackPlanner(backends + [rules])
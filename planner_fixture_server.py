@@ -0,0 +1,136 @@
+"""
+Local HTTP stand-in for the planning LLM, for offline runs and latency tests.
+
+POST /plan with {"request": "..."} returns {"planned_calls": [...], "text": "..."}
+(the HTTPPlanner contract), planned by the rule-based planner after a
+configurable delay.
+
+Usage:
+    python planner_fixture_server.py --port 8700 --latency 1500 --jitter 0.3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from planner import RuleBasedPlanner
+
+
+@dataclass
+class PlannerFixtureConfig:
+    """Timing of the fake planning service"""
+    latency_ms: int = 0       # Delay before every plan is returned
+    jitter: float = 0.0       # Random +/- fraction applied to the latency
+    error_rate: float = 0.0   # Fraction of requests answered with HTTP 503
+
+
+class PlannerFixtureServer:
+    """
+    Serves rule-based plans from a background thread.
+
+    Usage:
+        with PlannerFixtureServer(PlannerFixtureConfig(latency_ms=800)) as server:
+            planner = HTTPPlanner(server.plan_url)
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or PlannerFixtureConfig()
+        self.request_count = 0
+        self._planner = RuleBasedPlanner()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def plan_url(self):
+        return f"{self.url}/plan"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path != "/plan":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                with server._lock:
+                    server.request_count += 1
+                config = server.config
+                if config.latency_ms > 0:
+                    time.sleep(config.latency_ms / 1000
+                               * random.uniform(1 - config.jitter, 1 + config.jitter))
+                if random.random() < config.error_rate:
+                    self._send_json(503, {"error": "planner overloaded"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    user_input = json.loads(self.rfile.read(length))["request"]
+                except (ValueError, KeyError, TypeError):
+                    self._send_json(400, {"error": "expected {\"request\": \"...\"}"})
+                    return
+                planned_calls, text = server._planner.plan_sync(user_input)
+                self._send_json(200, {"planned_calls": planned_calls, "text": text})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the planning LLM.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=int, default=0, help="ms")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = PlannerFixtureConfig(latency_ms=args.latency, jitter=args.jitter,
+                                  error_rate=args.error_rate)
+    server = PlannerFixtureServer(config, host=args.host, port=args.port)
+    print(f"Serving planner stand-in at {server.plan_url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # Profiling is unavailable without pyinstrument
+    Profiler = None
+
+PROFILING_AVAILABLE = Profiler is not None
+
+# Per-call Playwright timings of the profiled request; None everywhere else
+_playwright_calls = contextvars.ContextVar("playwright_calls", default=None)
+_hook_lock = threading.Lock()
+_hook_users = 0
+_original_inner_send = None
+
+
+async def _timed_inner_send(self, *args, **kwargs):
+    calls = _playwright_calls.get()
+    if calls is None:
+        return await _original_inner_send(self, *args, **kwargs)
+    method = args[0] if args else kwargs.get("method")
+    name = f"{getattr(self._object, '_type', 'Object')}.{method}"
+    start = time.perf_counter()
+    try:
+        return await _original_inner_send(self, *args, **kwargs)
+    finally:
+        calls.record(name, time.perf_counter() - start)
+
+
+def _playwright_channel():
+    """Playwright's private Channel class, or None if this version does not have _inner_send"""
+    try:
+        from playwright._impl._connection import Channel
+    except ImportError:
+        return None
+    return Channel if callable(getattr(Channel, "_inner_send", None)) else None
+
+
+def _install_playwright_hook():
+    """
+    Wraps Playwright's protocol send while at least one request is profiled.
+
+    Channel._inner_send is private, so a Playwright release may rename it; the
+    hook is then skipped with a warning and only the sampling profile is taken.
+
+    Returns:
+        True if the hook is installed and must be released with _uninstall_playwright_hook()
+    """
+    global _hook_users, _original_inner_send
+    channel = _playwright_channel()
+    with _hook_lock:
+        if _hook_users == 0:
+            if channel is None:
+                logging.warning("Playwright has no Channel._inner_send; profiling without "
+                                "per-call Playwright timings")
+                return False
+            _original_inner_send = channel._inner_send
+            channel._inner_send = _timed_inner_send
+        _hook_users += 1
+    return True
+
+
+def _uninstall_playwright_hook():
+    global _hook_users
+    from playwright._impl._connection import Channel
+    with _hook_lock:
+        _hook_users -= 1
+        if _hook_users == 0:
+            Channel._inner_send = _original_inner_send
+
+
+class PlaywrightCallStats:
+    """Count and total/max seconds of each Playwright call, e.g. 'Frame.goto'"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def record(self, name, seconds):
+        stats = self.calls.setdefault(name, {"call": name, "count": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["count"] += 1
+        stats["total_s"] += seconds
+        stats["max_s"] = max(stats["max_s"], seconds)
+
+    def table(self):
+        """Calls sorted by total time, slowest first"""
+        rows = sorted(self.calls.values(), key=lambda stats: -stats["total_s"])
+        return [dict(row, total_s=round(row["total_s"], 4), max_s=round(row["max_s"], 4))
+                for row in rows]
+
+
+class RequestProfiler:
+    """
+    Sampling profile of one "Process Request" run.
+
+    Uses pyinstrument in async mode, so awaits inside the request (and tasks it
+    starts) are attributed to the code that awaited them rather than lost in
+    the event loop. Work handed to threads (asyncio.to_thread) is not sampled.
+    Every Playwright call made by the request is timed as well, by wrapping
+    Playwright's protocol channel for as long as a profile is running.
+
+    Nothing is installed until start() is called, so an unprofiled request runs
+    exactly as before.
+
+    Usage:
+        profiler = RequestProfiler(job.job_id).start()
+        ...
+        paths = profiler.stop()
+    """
+
+    def __init__(self, name, directory="output/profiles", interval_s=0.001):
+        self.name = name
+        self.directory = directory
+        self.interval_s = interval_s
+        self.playwright_calls = PlaywrightCallStats()
+        self.paths = {}
+        self._profiler = None
+        self._token = None
+        self._hooked = False
+
+    def start(self):
+        if not PROFILING_AVAILABLE:
+            raise RuntimeError("Profiling needs pyinstrument (pip install pyinstrument)")
+        self._profiler = Profiler(interval=self.interval_s, async_mode="enabled")
+        self._profiler.start()
+        self._token = _playwright_calls.set(self.playwright_calls)
+        self._hooked = _install_playwright_hook()
+        return self
+
+    def stop(self):
+        """Stops profiling and writes the profile files; returns {kind: path}"""
+        if self._profiler is None:
+            return self.paths
+        try:
+            session = self._profiler.stop()
+        finally:
+            if self._hooked:
+                _uninstall_playwright_hook()
+                self._hooked = False
+            _playwright_calls.reset(self._token)
+            self._profiler = None
+        try:
+            self.paths = self.write(session)
+        except OSError as e:
+            logging.warning(f"Failed to save profile {self.name}: {e}")
+        return self.paths
+
+    def write(self, session):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        base = os.path.join(self.directory, self.name)
+        paths = {"speedscope": f"{base}.speedscope.json", "html": f"{base}.html",
+                 "playwright_calls": f"{base}.playwright.json"}
+        with open(paths["speedscope"], "w", encoding="utf-8") as fp:
+            fp.write(SpeedscopeRenderer().render(session))
+        with open(paths["html"], "w", encoding="utf-8") as fp:
+            fp.write(HTMLRenderer().render(session))
+        with open(paths["playwright_calls"], "w", encoding="utf-8") as fp:
+            json.dump(self.playwright_calls.table(), fp, indent=2)
+        logging.info(f"Saved profile to {paths['speedscope']}")
+        return paths
@@ -0,0 +1,100 @@
+"""
+Keeps stored leads fresh by re-visiting only those that are due.
+
+    # 1. Import leads exported by the app (any file with a place_url column)
+    python refresh_leads.py import output/*.xlsx
+
+    # 2. Re-visit leads not seen for 7 days (backing off for leads that never change)
+    python refresh_leads.py refresh --max-age-days 7 --limit 500 --pages 3
+
+    # 3. Export the leads that changed, and the change log
+    python refresh_leads.py changes --since-days 1
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import sys
+import time
+
+import pandas as pd
+
+from lead_store import DEFAULT_MAX_AGE_S, DEFAULT_MAX_INTERVAL_S, SQLiteLeadStore
+from main_setVal import Business, BusinessList, ScraperConfig, refresh_stale_leads
+
+DAY_S = 24 * 3600
+
+
+def read_records(path):
+    df = pd.read_csv(path) if path.endswith(".csv") else pd.read_excel(path)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+def import_leads(args, store):
+    for path in args.files:
+        counts = store.upsert(read_records(path), source=f"import:{path}")
+        logging.info(f"Imported {path}: {counts}")
+    print(store.stats())
+    return 0
+
+
+def refresh(args, store):
+    config = ScraperConfig(maps_url=args.maps_url, listing_wait_ms=args.listing_wait)
+    counts = asyncio.run(refresh_stale_leads(store, config, limit=args.limit, pages=args.pages,
+                                             default_region=args.region))
+    print(counts)
+    return 0
+
+
+def changes(args, store):
+    since = time.time() - args.since_days * DAY_S
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    business_list = BusinessList(business_list=[Business.from_dict(record)
+                                                for record in store.changed_records(since)])
+    if not business_list.business_list:
+        print("No leads changed in that period.")
+        return 0
+    file_path = business_list.save_to_excel(args.output or f"changed_leads_{stamp}")
+    log_path = f"{business_list.save_at}/lead_changes_{stamp}.jsonl"
+    with open(log_path, "w", encoding="utf-8") as fp:
+        for entry in store.changes(since):
+            fp.write(json.dumps(entry, default=str) + "\n")
+    print(f"{business_list.get_row_size()} changed leads in {file_path}; change log in {log_path}")
+    return 0 if file_path else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh stale leads with change detection.")
+    parser.add_argument("--db", default="output/leads.db", help="SQLite lead store")
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_S / DAY_S,
+                        help="Re-check leads not seen for this long")
+    parser.add_argument("--max-interval-days", type=float, default=DEFAULT_MAX_INTERVAL_S / DAY_S,
+                        help="Longest back-off for leads that keep coming back unchanged")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Add leads from exported Excel/CSV files")
+    import_parser.add_argument("files", nargs="+")
+
+    refresh_parser = subparsers.add_parser("refresh", help="Re-visit the leads that are due")
+    refresh_parser.add_argument("--limit", type=int, help="Most leads to visit in this run")
+    refresh_parser.add_argument("--pages", type=int, default=1, help="Concurrent browser tabs")
+    refresh_parser.add_argument("--region", help="Default phone region, e.g. PK")
+    refresh_parser.add_argument("--maps-url", default=ScraperConfig.maps_url)
+    refresh_parser.add_argument("--listing-wait", type=int,
+                                default=ScraperConfig.listing_wait_ms, help="ms")
+
+    changes_parser = subparsers.add_parser("changes", help="Export leads changed recently")
+    changes_parser.add_argument("--since-days", type=float, default=1)
+    changes_parser.add_argument("--output", help="Excel file name (without extension)")
+
+    args = parser.parse_args(argv)
+    store = SQLiteLeadStore(args.db, max_age_s=args.max_age_days * DAY_S,
+                            max_interval_s=args.max_interval_days * DAY_S)
+    commands = {"import": import_leads, "refresh": refresh, "changes": changes}
+    return commands[args.command](args, store)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
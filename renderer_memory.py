@@ -0,0 +1,79 @@
+import contextlib
+import logging
+import time
+
+from metrics import span
+
+MB = 1024 * 1024
+
+
+class RendererMemoryMonitor:
+    """
+    Samples a page's renderer memory (JS heap and live DOM nodes) over time.
+
+    Reads Chromium's Performance.getMetrics through a CDP session, so it only
+    reports on Chromium; on other browsers sample() quietly returns None.
+    report() logs the series and records it on the current job trace as a
+    "renderer_memory" span.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.samples = []
+        self._cdp = None
+        self._unavailable = False
+        self._start = time.monotonic()
+
+    async def _metrics(self):
+        if self._cdp is None:
+            self._cdp = await self.page.context.new_cdp_session(self.page)
+            await self._cdp.send("Performance.enable")
+        result = await self._cdp.send("Performance.getMetrics")
+        return {metric["name"]: metric["value"] for metric in result["metrics"]}
+
+    async def sample(self, cards):
+        """Records one sample tagged with the number of cards harvested so far"""
+        if self._unavailable:
+            return None
+        try:
+            metrics = await self._metrics()
+        except Exception as e:
+            logging.info(f"Renderer memory is not available: {e}")
+            self._unavailable = True
+            return None
+        sample = {
+            "elapsed_s": round(time.monotonic() - self._start, 2),
+            "cards": cards,
+            "js_heap_mb": round(metrics.get("JSHeapUsedSize", 0) / MB, 1),
+            "dom_nodes": int(metrics.get("Nodes", 0)),
+        }
+        self.samples.append(sample)
+        return sample
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        return {
+            "samples": len(self.samples),
+            "first_js_heap_mb": self.samples[0]["js_heap_mb"],
+            "last_js_heap_mb": self.samples[-1]["js_heap_mb"],
+            "peak_js_heap_mb": max(sample["js_heap_mb"] for sample in self.samples),
+            "peak_dom_nodes": max(sample["dom_nodes"] for sample in self.samples),
+        }
+
+    async def close(self):
+        """Detaches the CDP session; safe to call twice"""
+        if self._cdp is not None:
+            with contextlib.suppress(Exception):
+                await self._cdp.detach()
+            self._cdp = None
+
+    def report(self):
+        """Logs the samples and attaches them to the current job trace"""
+        summary = self.summary()
+        if not summary:
+            return summary
+        with span("renderer_memory", **summary) as memory_span:
+            memory_span.set(series=self.samples)
+        logging.info(f"Renderer memory while scrolling: {summary}")
+        return summary
@@ -0,0 +1,340 @@
+"""
+Review harvesting: pages through each place's reviews panel and streams the
+reviews to a JSONL or Parquet file as they are read.
+
+Places are harvested in parallel browser tabs. Memory stays bounded by the
+number of tabs (capped by ReviewConfig.memory_budget_mb), a fixed-size queue
+between the tabs and the writer, and by collapsing reviews in the page once
+they are read.
+
+Usage:
+    python reviews.py output/leads.xlsx --max-reviews 100 --format parquet
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+from playwright.async_api import async_playwright
+
+from metrics import registry, span
+
+REVIEW_FIELDS = ("place_url", "place_name", "review_id", "author", "rating", "published", "text")
+REVIEWS_TAB_SELECTOR = 'button[role="tab"][aria-label^="Reviews"]'
+REVIEW_COUNT_XPATH = '//button[@jsaction="pane.reviewChart.moreReviews"]//span'
+REVIEW_COUNT_LABEL_SELECTOR = 'div.F7nice span[aria-label*="review" i]'
+
+# Expands truncated review texts ("More") so the next read gets the full text
+EXPAND_REVIEWS_JS = """
+() => {
+    const buttons = document.querySelectorAll('div.jftiEf button.w8nwRe');
+    buttons.forEach(button => button.click());
+    return buttons.length;
+}
+"""
+# Returns up to `limit` reviews not read before on this page, empties reviews
+# read earlier (keeping their height, so the panel still loads more) and
+# scrolls the reviews panel to its end
+READ_REVIEWS_JS = """
+({limit, keep}) => {
+    const seen = window.__leadgenReviews = window.__leadgenReviews || new Set();
+    const fresh = [];
+    let panel = null;
+    for (const node of document.querySelectorAll('div.jftiEf[data-review-id]')) {
+        panel = panel || node.closest('div.m6QErb.DxyBCb') || node.parentElement;
+        const id = node.getAttribute('data-review-id');
+        if (seen.has(id) || fresh.length >= limit) continue;
+        seen.add(id);
+        const text = selector => {
+            const child = node.querySelector(selector);
+            return child ? child.textContent.trim() : null;
+        };
+        const stars = node.querySelector('span.kvMYJc');
+        fresh.push({
+            review_id: id,
+            author: text('.d4r55'),
+            rating: stars ? stars.getAttribute('aria-label') : null,
+            published: text('span.rsqaWe'),
+            text: text('span.wiI7pd'),
+        });
+        node.dataset.leadgen = 'read';
+    }
+    const read = document.querySelectorAll('div.jftiEf[data-leadgen="read"]');
+    for (let i = 0; i < read.length - keep; i++) {
+        read[i].style.height = read[i].offsetHeight + 'px';
+        read[i].replaceChildren();
+        read[i].dataset.leadgen = 'pruned';
+    }
+    if (panel) panel.scrollTop = panel.scrollHeight;
+    return fresh;
+}
+"""
+
+
+@dataclass
+class ReviewConfig:
+    """Settings for harvest_reviews"""
+    max_reviews_per_place: int = 50
+    concurrency: int = 3           # Places harvested in parallel (one tab each)...
+    memory_budget_mb: int = 1024   # ...but no more tabs than fit in this budget
+    tab_memory_mb: int = 150       # Estimated renderer memory of one reviews tab
+    queue_size: int = 200          # Reviews buffered between the tabs and the writer
+    batch_size: int = 100          # Reviews per write (Parquet row group)
+    keep_rendered: int = 10        # Newest read reviews left intact in the page
+    scroll_wait_ms: int = 1500
+    max_idle_scrolls: int = 3      # Scrolls without new reviews before giving up
+    listing_wait_ms: int = 3000
+    tab_wait_ms: int = 2000
+    navigation_timeout_ms: int = 60000
+    headless: bool = True
+    output_format: str = "jsonl"   # "jsonl" or "parquet"
+    output_dir: str = "output/reviews"
+
+    @property
+    def tabs(self):
+        return max(1, min(self.concurrency, self.memory_budget_mb // max(self.tab_memory_mb, 1)))
+
+
+def parse_star_rating(label):
+    """Parses a star rating label such as '4 stars' or 'Rated 4.0 out of 5'; None if absent"""
+    match = re.search(r"\d+(?:[.,]\d+)?", label or "")
+    return float(match.group(0).replace(",", ".")) if match else None
+
+
+def parse_review_count(text):
+    """
+    Parses a review count such as '1,234 reviews', '(1.234)', '(1 234)' or '(2.1K)';
+    None if absent. Spaces (also no-break spaces) and apostrophes count as thousands
+    separators only when three digits follow them.
+    """
+    match = re.search(r"(\d(?:[\d.,]|[ \u00a0\u202f'](?=\d{3}\b))*)\s*([KkMm]?)\b", text or "")
+    if not match:
+        return None
+    number, suffix = match.groups()
+    number = re.sub(r"[ \u00a0\u202f']", "", number)
+    try:
+        if suffix:
+            multiplier = 1_000 if suffix.lower() == "k" else 1_000_000
+            return int(float(number.replace(",", ".")) * multiplier)
+        return int(number.replace(",", "").replace(".", ""))
+    except ValueError:
+        return None
+
+
+async def read_reviews_count(page):
+    """Reads the total review count from the place panel open on the page; None if absent"""
+    button_span = page.locator(REVIEW_COUNT_XPATH)
+    if await button_span.count() > 0:
+        count = parse_review_count(await button_span.first.inner_text())
+        if count is not None:
+            return count
+    label_span = page.locator(REVIEW_COUNT_LABEL_SELECTOR)
+    if await label_span.count() > 0:
+        return parse_review_count(await label_span.first.get_attribute("aria-label"))
+    return None
+
+
+class JsonlReviewWriter:
+    """Appends reviews to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = open(path, "w", encoding="utf-8")
+
+    def write_batch(self, reviews):
+        for review in reviews:
+            self._fp.write(json.dumps(review, ensure_ascii=False) + "\n")
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+
+class ParquetReviewWriter:
+    """Writes reviews to a Parquet file, one row group per batch"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self.path = path
+        self._schema = pa.schema([(name, pa.float64() if name == "rating" else pa.string())
+                                  for name in REVIEW_FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write_batch(self, reviews):
+        columns = {name: [review.get(name) for review in reviews] for name in REVIEW_FIELDS}
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_review_writer(config, name=None):
+    if not os.path.exists(config.output_dir):
+        os.makedirs(config.output_dir)
+    name = name or f"reviews_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if config.output_format == "parquet":
+        return ParquetReviewWriter(os.path.join(config.output_dir, f"{name}.parquet"))
+    if config.output_format == "jsonl":
+        return JsonlReviewWriter(os.path.join(config.output_dir, f"{name}.jsonl"))
+    raise ValueError(f"Unknown review output format {config.output_format!r}")
+
+
+async def harvest_place_reviews(page, place_url, config, emit):
+    """
+    Opens one place, reads its review count and pages through its reviews,
+    passing each review to the async `emit` callback as soon as it is read.
+
+    Returns:
+        tuple: (reviews_count shown on the place, number of reviews harvested)
+    """
+    await page.goto(place_url, timeout=config.navigation_timeout_ms)
+    await page.wait_for_timeout(config.listing_wait_ms)
+    reviews_count = await read_reviews_count(page)
+    name_heading = page.locator("h1.DUwDvf")
+    place_name = (await name_heading.first.inner_text()) if await name_heading.count() > 0 else None
+
+    cap = config.max_reviews_per_place
+    if reviews_count is not None:
+        cap = min(cap, reviews_count)
+    tab = page.locator(REVIEWS_TAB_SELECTOR)
+    if cap <= 0 or await tab.count() == 0:
+        return reviews_count, 0
+    await tab.first.click()
+    await page.wait_for_timeout(config.tab_wait_ms)
+
+    harvested = 0
+    idle_scrolls = 0
+    while harvested < cap and idle_scrolls < config.max_idle_scrolls:
+        if await page.evaluate(EXPAND_REVIEWS_JS):
+            await page.wait_for_timeout(200)
+        fresh = await page.evaluate(READ_REVIEWS_JS, {"limit": cap - harvested,
+                                                      "keep": config.keep_rendered})
+        idle_scrolls = 0 if fresh else idle_scrolls + 1
+        for review in fresh:
+            review["rating"] = parse_star_rating(review["rating"])
+            await emit({"place_url": place_url, "place_name": place_name, **review})
+        harvested += len(fresh)
+        if harvested < cap:
+            await page.wait_for_timeout(config.scroll_wait_ms)
+    return reviews_count, harvested
+
+
+async def harvest_reviews(place_urls, config=None, name=None, browser=None):
+    """
+    Harvests up to config.max_reviews_per_place reviews for every place URL and
+    streams them to a file in config.output_dir.
+
+    Returns:
+        dict: "path" of the review file, "reviews" written, per place URL the
+            "reviews_count" shown on Maps (None where it could not be read), and
+            the write "error", if writing failed.
+    """
+    config = config or ReviewConfig()
+    place_urls = list(dict.fromkeys(url for url in place_urls if url))
+    queue = asyncio.Queue(maxsize=config.queue_size)
+    writer = open_review_writer(config, name)
+    written = 0
+    write_error = None
+    reviews_count = {}
+
+    async def write_reviews():
+        nonlocal written, write_error
+        batch = []
+        while True:
+            review = await queue.get()
+            if review is not None:
+                batch.append(review)
+            if batch and (review is None or len(batch) >= config.batch_size):
+                if write_error is None:
+                    try:
+                        await asyncio.to_thread(writer.write_batch, batch)
+                        written += len(batch)
+                    except Exception as e:
+                        # Keep draining so the tabs never block on a full queue
+                        write_error = e
+                        logging.error(f"Failed to write reviews to {writer.path}: {e}")
+                batch = []
+            if review is None:
+                return
+
+    async def harvest_all(browser):
+        pending = iter(place_urls)
+
+        async def work():
+            page = await browser.new_page()
+            try:
+                for place_url in pending:
+                    try:
+                        with span("review_harvest"):
+                            count, harvested = await harvest_place_reviews(
+                                page, place_url, config, queue.put)
+                        reviews_count[place_url] = count
+                        registry.inc("harvested_reviews_total", harvested)
+                    except Exception as e:
+                        registry.inc("review_harvest_errors_total")
+                        logging.error(f"Review harvest failed for {place_url}: {e}")
+                        if page.is_closed():
+                            page = await browser.new_page()
+            finally:
+                with contextlib.suppress(Exception):
+                    await page.close()
+
+        await asyncio.gather(*(work() for _ in range(min(config.tabs, len(place_urls)))))
+
+    writer_task = asyncio.create_task(write_reviews())
+    try:
+        if browser is not None:
+            await harvest_all(browser)
+        else:
+            async with async_playwright() as p:
+                own_browser = await p.chromium.launch(headless=config.headless)
+                try:
+                    await harvest_all(own_browser)
+                finally:
+                    with contextlib.suppress(Exception):
+                        await own_browser.close()
+    finally:
+        await queue.put(None)
+        await writer_task
+        writer.close()
+    logging.info(f"Harvested {written} reviews for {len(place_urls)} places into {writer.path}")
+    return {"path": writer.path, "reviews": written, "reviews_count": reviews_count,
+            "error": str(write_error) if write_error else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Harvest Google Maps reviews for exported leads.")
+    parser.add_argument("file", help="Excel/CSV file with a place_url column")
+    parser.add_argument("--max-reviews", type=int, default=ReviewConfig.max_reviews_per_place,
+                        help="Reviews per place")
+    parser.add_argument("--concurrency", type=int, default=ReviewConfig.concurrency)
+    parser.add_argument("--memory-budget", type=int, default=ReviewConfig.memory_budget_mb,
+                        help="MB")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    df = pd.read_csv(args.file) if args.file.endswith(".csv") else pd.read_excel(args.file)
+    config = ReviewConfig(max_reviews_per_place=args.max_reviews, concurrency=args.concurrency,
+                          memory_budget_mb=args.memory_budget, output_format=args.format,
+                          headless=not args.headed)
+    result = asyncio.run(harvest_reviews(df["place_url"].dropna().tolist(), config))
+    print(f"{result['reviews']} reviews written to {result['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import DeadlineScheduler
+
+async_api = pytest.importorskip("playwright.async_api")
+
+
+def test_rank_for_detail_puts_missing_fields_then_quality_first():
+    candidates = [(0, 4.0, 10, False), (1, 4.8, 500, False), (2, None, None, True)]
+    assert DeadlineScheduler.rank_for_detail(candidates) == [2, 1, 0]
+
+
+def test_usable_keeps_safety_margin():
+    scheduler = DeadlineScheduler(budget_s=5, safety_margin_s=1, start=time.monotonic())
+    assert 3.9 < scheduler.usable() <= 4.0
+    scheduler.start -= 10
+    assert scheduler.usable() == 0.1
+
+
+@pytest.fixture(scope="module")
+def chromium():
+    async def probe():
+        async with async_api.async_playwright() as p:
+            browser = await p.chromium.launch()
+            await browser.close()
+
+    try:
+        asyncio.run(probe())
+    except Exception as e:
+        pytest.skip(f"Chromium is not available: {str(e).splitlines()[0]}")
+
+
+def test_tight_budget_keeps_cards_loaded_before_the_deadline(chromium):
+    main_setVal = pytest.importorskip("main_setVal")
+    from maps_fixture_server import FixtureConfig, MapsFixtureServer
+
+    with MapsFixtureServer(FixtureConfig(results=40)) as server:
+        # Scrolling waits far longer than the budget, so the harvest is cut off
+        # after the first page of results has loaded
+        config = main_setVal.ScraperConfig(
+            maps_url=server.maps_url, page_load_wait_ms=200, type_wait_ms=100,
+            search_wait_ms=300, scroll_wait_ms=10000, listing_wait_ms=200,
+            checkpoint_dir=None)
+        start = time.monotonic()
+        business_list = asyncio.run(main_setVal.scrape_business(
+            "cafes in Islamabad", 40, config, time_budget_s=3))
+        elapsed = time.monotonic() - start
+
+    assert business_list.business_list
+    assert all(business.name and business.place_url for business in business_list.business_list)
+    assert business_list.completeness["timed_out"]
+    assert elapsed < 3 + 2.5  # Budget, card rescue and browser shutdown
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from enrichment import EnrichmentConfig, WebsiteEnricher, enrich_business_list
+
+HOME_PAGE = """<html><body>
+<a href="/contact-us">Contact</a> <a href="/menu">Menu</a>
+<a href="https://www.instagram.com/cafe_islamabad/">Instagram</a>
+</body></html>"""
+CONTACT_PAGE = "<html><body>Write to hello@cafe.example or call us.</body></html>"
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    127.0.0.1 redirects to localhost, like example.com redirecting to www.example.com.
+
+    The server's `routes` map a path to (status, body) or a callable returning it,
+    and `requests` records every path requested.
+    """
+
+    def do_GET(self):
+        host, port = self.headers["Host"].rsplit(":", 1)
+        self.server.requests.append(self.path)
+        if host == "127.0.0.1" and self.server.redirect:
+            self.send_response(301)
+            self.send_header("Location", f"http://localhost:{port}{self.path}")
+            self.end_headers()
+            return
+        route = self.server.routes.get(self.path, (404, "Not found"))
+        status, page = route() if callable(route) else route
+        body = page.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    server.daemon_threads = True
+    server.redirect = True
+    server.requests = []
+    server.routes = {"/": (200, HOME_PAGE), "/contact-us": (200, CONTACT_PAGE)}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def enrich(website, cache_dir):
+    business = SimpleNamespace(website=website, emails=None, contact_pages=None,
+                               social_handles=None)
+    config = EnrichmentConfig(cache_dir=str(cache_dir), timeout_seconds=5)
+    asyncio.run(enrich_business_list(SimpleNamespace(business_list=[business]), config))
+    return business
+
+
+def test_contact_pages_follow_redirected_host(site, tmp_path):
+    port = site.server_address[1]
+    business = enrich(f"http://127.0.0.1:{port}/", tmp_path)
+
+    assert business.contact_pages == f"http://localhost:{port}/contact-us"
+    assert business.emails == "hello@cafe.example"
+    assert business.social_handles == "instagram:cafe_islamabad"
+
+
+def test_cached_pages_keep_redirected_host(site, tmp_path):
+    port = site.server_address[1]
+    enrich(f"http://127.0.0.1:{port}/", tmp_path)
+    site.shutdown()
+
+    business = enrich(f"http://127.0.0.1:{port}/", tmp_path)
+    assert business.contact_pages == f"http://localhost:{port}/contact-us"
+    assert business.emails == "hello@cafe.example"
+
+
+@pytest.mark.parametrize("status", [401, 403, 503])
+def test_robots_errors_disallow_everything(site, tmp_path, status):
+    site.redirect = False
+    site.routes["/robots.txt"] = (status, "")
+    business = enrich(f"http://127.0.0.1:{site.server_address[1]}/", tmp_path)
+
+    assert business.emails is None
+    assert site.requests == ["/robots.txt"]
+
+
+def test_server_errors_are_not_cached(site, tmp_path):
+    site.redirect = False
+    statuses = iter([503, 200])
+    site.routes["/"] = lambda: (next(statuses), CONTACT_PAGE)
+    url = f"http://127.0.0.1:{site.server_address[1]}/"
+
+    assert enrich(url, tmp_path).emails is None
+    assert enrich(url, tmp_path).emails == "hello@cafe.example"
+
+
+def test_busy_host_does_not_hold_global_slots(site, tmp_path):
+    site.redirect = False
+    site.routes["/slow"] = site.routes["/slow?2"] = lambda: (time.sleep(1), (200, "slow"))[1]
+    site.routes["/fast"] = (200, "fast")
+    port = site.server_address[1]
+    config = EnrichmentConfig(cache_dir=str(tmp_path), max_concurrency=2,
+                              per_domain_concurrency=1, respect_robots=False)
+
+    async def scenario():
+        async with WebsiteEnricher(config) as enricher:
+            finished = {}
+
+            async def fetch(name, url):
+                await enricher.fetch(url)
+                finished[name] = time.monotonic()
+
+            # Two requests queue on the slow host; the other host must not wait for them
+            await asyncio.gather(fetch("slow1", f"http://127.0.0.1:{port}/slow"),
+                                 fetch("slow2", f"http://127.0.0.1:{port}/slow?2"),
+                                 fetch("fast", f"http://localhost:{port}/fast"))
+            return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["fast"] < finished["slow1"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lead_scoring import ScoringConfig, rank_recipients, score_leads, top_k_indices
+
+
+def leads():
+    return pd.DataFrame([
+        # Two listings share one number; the better one must represent it
+        {"name": "A", "phone_e164": "+923001111111", "phone_type": "mobile",
+         "reviews_average": 3.0, "reviews_count": 5, "website": None},
+        {"name": "A2", "phone_e164": "+923001111111", "phone_type": "mobile",
+         "reviews_average": 4.9, "reviews_count": 900, "website": "a.example"},
+        {"name": "B", "phone_e164": "+923002222222", "phone_type": "mobile",
+         "reviews_average": 4.5, "reviews_count": 300, "website": "b.example"},
+        {"name": "C", "phone_e164": "+923003333333", "phone_type": "mobile",
+         "reviews_average": 4.0, "reviews_count": 50, "website": None},
+        # Landlines and missing numbers are never recipients
+        {"name": "D", "phone_e164": "+92515555555", "phone_type": "fixed_line",
+         "reviews_average": 5.0, "reviews_count": 2000, "website": "d.example"},
+        {"name": "E", "phone_e164": None, "phone_type": "invalid",
+         "reviews_average": 5.0, "reviews_count": 2000, "website": None},
+    ])
+
+
+def names(df, positions):
+    return list(df["name"].to_numpy()[positions])
+
+
+def test_shared_numbers_count_once_with_their_best_listing():
+    df = leads()
+    assert names(df, rank_recipients(df, None)) == ["A2", "B", "C"]
+
+
+def test_recent_contacts_are_penalized():
+    df = leads()
+    scores = score_leads(df, contacted={"+923001111111"})
+    assert scores[1] < score_leads(df)[1]
+    assert names(df, rank_recipients(df, None, contacted={"+923001111111"})) == ["B", "C", "A2"]
+
+
+def test_missing_columns_score_zero():
+    scores = score_leads(pd.DataFrame({"name": ["X", "Y"]}), ScoringConfig())
+    assert scores.tolist() == [0.0, 0.0]
+
+
+@pytest.mark.parametrize("k, expected", [
+    (0, []),
+    (1, ["A2"]),
+    (3, ["A2", "B", "C"]),
+    (10, ["A2", "B", "C"]),
+])
+def test_k_boundaries(k, expected):
+    df = leads()
+    assert names(df, rank_recipients(df, k)) == expected
+
+
+def test_top_k_indices_matches_a_full_sort():
+    scores = np.random.default_rng(1).random(1000)
+    assert top_k_indices(scores, 25).tolist() == np.argsort(-scores)[:25].tolist()
+    assert top_k_indices(scores, 0).tolist() == []
+    assert len(top_k_indices(scores, 5000)) == 1000
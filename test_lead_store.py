@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+from lead_store import SQLiteLeadStore, content_hash, lead_key
+
+DAY = 24 * 3600
+T0 = 1_700_000_000.0
+URL = "https://www.google.com/maps/place/Cafe/data=!4m7!3m6!1s0x38dfbf:0x5a1e!8m2!3d33.7"
+
+
+def lead(**fields):
+    record = {"name": "Cafe Kuch Khaas", "address": "F-6/3, Islamabad", "website": None,
+              "phone_number": "0300 1234567", "reviews_average": 4.5, "reviews_count": 120,
+              "category": "Cafe", "place_url": URL}
+    record.update(fields)
+    return record
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteLeadStore(str(tmp_path / "leads.db"), max_age_s=DAY, max_interval_s=4 * DAY)
+
+
+def row(store, *columns):
+    with sqlite3.connect(store.path) as conn:
+        return conn.execute(f"SELECT {', '.join(columns)} FROM leads WHERE lead_key = ?",
+                            (lead_key(URL),)).fetchone()
+
+
+def test_content_hash_ignores_whitespace_and_untracked_fields():
+    assert content_hash(lead()) == content_hash(lead(name="  Cafe   Kuch Khaas ",
+                                                     phone_e164="+923001234567"))
+    assert content_hash(lead()) == content_hash(lead(reviews_count=120.0))
+    assert content_hash(lead()) != content_hash(lead(reviews_count=121))
+
+
+def test_unchanged_leads_back_off_and_a_change_resets_the_interval(store):
+    assert store.upsert([lead()], seen_at=T0)["added"] == 1
+    assert row(store, "check_interval", "next_check") == (DAY, T0 + DAY)
+
+    intervals = []
+    for visit in range(1, 5):
+        assert store.record_check(URL, lead(), checked_at=T0 + visit * DAY) == "unchanged"
+        intervals.append(row(store, "check_interval")[0])
+    assert intervals == [2 * DAY, 4 * DAY, 4 * DAY, 4 * DAY]  # Capped at max_interval_s
+
+    changed_at = T0 + 10 * DAY
+    assert store.record_check(URL, lead(reviews_count=130), checked_at=changed_at) == "changed"
+    assert row(store, "check_interval", "next_check", "last_changed", "checks", "changes") == (
+        DAY, changed_at + DAY, changed_at, 5, 1)
+
+
+def test_failed_visits_retry_after_the_base_interval(store):
+    store.upsert([lead()], seen_at=T0)
+    store.record_check(URL, lead(), checked_at=T0 + DAY)
+    assert store.record_check(URL, None, checked_at=T0 + 3 * DAY) == "failed"
+    assert row(store, "check_interval", "next_check", "failures") == (2 * DAY, T0 + 4 * DAY, 1)
+
+
+def test_change_log_records_only_what_changed(store):
+    store.upsert([lead(website="kuchkhaas.pk")], seen_at=T0)
+    store.record_check(URL, lead(website="kuchkhaas.pk"), checked_at=T0 + DAY)
+    # The refresh could not read the website; a rating change still keeps it
+    store.record_check(URL, lead(website="kuchkhaas.pk", reviews_average=4.7, address=None),
+                       checked_at=T0 + 2 * DAY)
+
+    log = store.changes()
+    assert len(log) == 1
+    assert log[0]["lead_key"] == "0x38dfbf:0x5a1e"
+    assert log[0]["source"] == "refresh"
+    assert log[0]["changes"] == {"reviews_average": [4.5, 4.7],
+                                 "address": ["F-6/3, Islamabad", None]}
+    assert store.changes(since=T0 + 3 * DAY) == []
+    assert [r["reviews_average"] for r in store.changed_records(T0 + DAY)] == [4.7]
+
+
+def test_the_same_place_from_another_search_is_one_lead(store):
+    store.upsert([lead()], seen_at=T0)
+    other_search = URL.replace("/place/Cafe/", "/place/Cafe+Kuch+Khaas/") + "?hl=en"
+    counts = store.upsert([lead(place_url=other_search), {"name": "no url"}], seen_at=T0 + DAY)
+    assert counts == {"added": 0, "changed": 0, "unchanged": 1, "skipped": 1}
+    assert store.stats(now=T0)["leads"] == 1
+
+
+def test_hashes_from_before_a_new_tracked_field_count_as_unchanged(store):
+    store.upsert([lead()], seen_at=T0)
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("UPDATE leads SET content_hash = 'legacy'")
+    assert store.record_check(URL, lead(), checked_at=T0 + DAY) == "unchanged"
+    assert row(store, "content_hash")[0] == content_hash(lead())
+    assert store.changes() == []
+
+
+def test_stale_orders_frequently_changing_leads_first(store):
+    quiet = URL.replace("0x5a1e", "0xaaaa")
+    busy = URL.replace("0x5a1e", "0xbbbb")
+    store.upsert([lead(place_url=quiet), lead(place_url=busy)], seen_at=T0)
+    store.record_check(busy, lead(place_url=busy, reviews_count=200), checked_at=T0 + DAY)
+    store.record_check(quiet, lead(place_url=quiet), checked_at=T0 + DAY)
+
+    assert store.stale(now=T0 + DAY) == []
+    assert [s.place_url for s in store.stale(now=T0 + 3 * DAY)] == [busy, quiet]
+    assert [s.place_url for s in store.stale(now=T0 + 3 * DAY, limit=1)] == [busy]
+    assert store.stale(now=T0 + 3 * DAY)[0].record["reviews_count"] == 200
+
+
+def test_contacts(store):
+    store.record_contact("+923001234567", contacted_at=T0)
+    store.record_contact("+923001234567", contacted_at=T0 + 5 * DAY)
+    store.record_contact("+447911123456", contacted_at=T0)
+    assert store.contacted_numbers() == {"+923001234567", "+447911123456"}
+    assert store.contacted_numbers(since=T0 + DAY) == {"+923001234567"}
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+from phone_utils import (PHONE_TYPE_FIXED_LINE, PHONE_TYPE_FIXED_LINE_OR_MOBILE,
+                         PHONE_TYPE_INVALID, PHONE_TYPE_MOBILE, PHONE_TYPE_UNKNOWN,
+                         infer_default_region, normalize_phone_column,
+                         normalize_phone_series)
+
+
+def normalize(phone, region=None):
+    row = normalize_phone_series([phone], region).iloc[0]
+    return row["phone_e164"], row["phone_type"]
+
+
+@pytest.mark.parametrize("phone, region, expected", [
+    # Pakistan: national, international and country code without '+'
+    ("0300 1234567", "PK", ("+923001234567", PHONE_TYPE_MOBILE)),
+    ("0300-1234567", None, (None, PHONE_TYPE_INVALID)),
+    ("+92 300 1234567", None, ("+923001234567", PHONE_TYPE_MOBILE)),
+    ("0092 300 1234567", "US", ("+923001234567", PHONE_TYPE_MOBILE)),
+    ("923001234567", "PK", ("+923001234567", PHONE_TYPE_MOBILE)),
+    ("(051) 1234567", "PK", ("+92511234567", PHONE_TYPE_FIXED_LINE)),
+    ("+92 21 34567890", None, ("+922134567890", PHONE_TYPE_FIXED_LINE)),
+    # North America does not tell mobiles from landlines
+    ("(212) 555-0100", "US", ("+12125550100", PHONE_TYPE_FIXED_LINE_OR_MOBILE)),
+    ("+1 212-555-0100", None, ("+12125550100", PHONE_TYPE_FIXED_LINE_OR_MOBILE)),
+    ("1 (212) 555-0100", "US", ("+12125550100", PHONE_TYPE_FIXED_LINE_OR_MOBILE)),
+    # United Kingdom
+    ("+44 20 7946 0958", None, ("+442079460958", PHONE_TYPE_FIXED_LINE)),
+    ("+44 7911 123456", None, ("+447911123456", PHONE_TYPE_MOBILE)),
+    ("07911 123456", "GB", ("+447911123456", PHONE_TYPE_MOBILE)),
+    ("0800 123456", "GB", ("+44800123456", PHONE_TYPE_FIXED_LINE)),
+    # Bangladesh: the three-digit code is not mistaken for a shorter one
+    ("+880 1712-345678", None, ("+8801712345678", PHONE_TYPE_MOBILE)),
+    ("01712-345678", "BD", ("+8801712345678", PHONE_TYPE_MOBILE)),
+    # Extensions are dropped
+    ("+44 20 7946 0958 ext. 123", None, ("+442079460958", PHONE_TYPE_FIXED_LINE)),
+    ("(212) 555-0100 x12", "US", ("+12125550100", PHONE_TYPE_FIXED_LINE_OR_MOBILE)),
+    ("0300 1234567 #4", "PK", ("+923001234567", PHONE_TYPE_MOBILE)),
+    # Countries outside the rule table are kept if E.164-sized
+    ("+49 30 1234567", None, ("+49301234567", PHONE_TYPE_UNKNOWN)),
+])
+def test_normalizes_known_formats(phone, region, expected):
+    assert normalize(phone, region) == expected
+
+
+@pytest.mark.parametrize("phone, region", [
+    (None, "PK"),
+    ("", "PK"),
+    ("N/A", "PK"),
+    ("Call us", "GB"),
+    ("12", "PK"),
+    ("+1234", None),
+    ("0300 12345678901", "PK"),
+    ("(012) 555-0100", "US"),
+    # Right length, but not a number either plan hands out
+    ("+92 123456789", None),
+    ("+92 3001234567 8", None),
+    ("+44 0123456789", None),
+    ("+44 4123456789", None),
+    ("+44 612345678", None),
+])
+def test_rejects_junk(phone, region):
+    assert normalize(phone, region) == (None, PHONE_TYPE_INVALID)
+
+
+def test_invalid_numbers_stay_none():
+    result = normalize_phone_series(pd.Series(["junk", "0300 1234567"], index=[7, 9]), "PK")
+    assert list(result.index) == [7, 9]
+    assert result.loc[7, "phone_e164"] is None
+    assert result["phone_e164"].isna().tolist() == [True, False]
+
+
+def test_normalize_phone_column_copies_and_skips_missing_column():
+    df = pd.DataFrame({"phone_number": ["0300 1234567"]})
+    out = normalize_phone_column(df, default_region="PK")
+    assert out.loc[0, "phone_e164"] == "+923001234567"
+    assert "phone_e164" not in df.columns
+    assert normalize_phone_column(df, column="phone") is df
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("cafes in Islamabad", "PK"),
+    ("plumbers London", "GB"),
+    ("London, Ontario bakeries near Chicago", "GB"),
+    ("restaurants in Dhaka", "BD"),
+    ("dentists", None),
+    ("", None),
+])
+def test_infer_default_region(query, expected):
+    assert infer_default_region(query) == expected
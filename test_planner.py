@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from planner import FallbackPlanner, Planner, RuleBasedPlanner, build_planner, resolve_backend
+
+
+@pytest.mark.parametrize("backend, api_key, expected", [
+    (None, None, "rules"),
+    (None, "key", "gemini"),
+    ("Gemini", "key", "gemini"),
+    (" HTTP ", None, "http"),
+    ("typo", "key", "rules"),
+])
+def test_resolve_backend(backend, api_key, expected):
+    assert resolve_backend(backend, api_key) == expected
+
+
+def test_unknown_backend_builds_rule_based_planner():
+    assert isinstance(build_planner("gpt"), RuleBasedPlanner)
+
+
+def test_planner_without_plan_fails_when_created():
+    class NoPlan(Planner):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPlan()
+
+
+def test_fallback_planner_uses_rules_after_a_timeout():
+    class SlowPlanner(Planner):
+        name = "slow"
+        expected_latency_s = 5
+
+        async def plan(self, user_input):
+            await asyncio.sleep(5)
+
+    planner = FallbackPlanner([SlowPlanner(), RuleBasedPlanner()])
+    planned_calls, _ = asyncio.run(planner.plan_within("find cafes in Islamabad", budget_s=0.2))
+    assert planned_calls[0]["function_name"] == "search_Maps"
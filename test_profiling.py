@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+import pytest
+
+pytest.importorskip("pyinstrument")
+connection = pytest.importorskip("playwright._impl._connection")
+
+import profiling
+
+
+def run_profiled(tmp_path):
+    async def request():
+        await asyncio.sleep(0.01)
+
+    profiler = profiling.RequestProfiler("job", directory=str(tmp_path))
+
+    async def main():
+        profiler.start()
+        await request()
+        return profiler.stop()
+
+    return asyncio.run(main())
+
+
+def test_hook_is_installed_and_restored(tmp_path):
+    original = connection.Channel._inner_send
+    paths = run_profiled(tmp_path)
+    assert connection.Channel._inner_send is original
+    assert set(paths) == {"speedscope", "html", "playwright_calls"}
+
+
+def test_missing_private_send_skips_the_hook(tmp_path, monkeypatch, caplog):
+    monkeypatch.delattr(connection.Channel, "_inner_send")
+    with caplog.at_level(logging.WARNING):
+        paths = run_profiled(tmp_path)
+    assert "per-call Playwright timings" in caplog.text
+    assert not hasattr(connection.Channel, "_inner_send")
+    assert "speedscope" in paths
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright.async_api")
+
+import warmup
+from warmup import BrowserWarmup
+
+
+class FakeDriver:
+    """Stands in for async_playwright(): start() spawns a background task like the real driver"""
+
+    def __init__(self, start_delay=0.05):
+        self.start_delay = start_delay
+        self.connection = None
+        self.stopped = False
+
+    async def start(self):
+        self.connection = asyncio.create_task(asyncio.sleep(3600))
+        await asyncio.sleep(self.start_delay)
+        return self
+
+    async def stop(self):
+        self.connection.cancel()
+        self.stopped = True
+
+
+CONFIG = SimpleNamespace(maps_url="http://127.0.0.1:1/maps", headless=True,
+                         navigation_timeout_ms=1000, page_load_wait_ms=0)
+
+
+def run_with_deadline(coro):
+    asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+@pytest.mark.parametrize("delay", [0, 0.01])
+def test_release_during_driver_start_stops_driver(monkeypatch, delay):
+    driver = FakeDriver()
+    monkeypatch.setattr(warmup, "async_playwright", lambda: driver)
+
+    async def scenario():
+        warm = BrowserWarmup(CONFIG).start()
+        await asyncio.sleep(delay)
+        await warm.release()
+        await asyncio.sleep(0)
+        return warm
+
+    run_with_deadline(scenario())
+    if driver.connection is not None:
+        assert driver.stopped
+        assert driver.connection.done()
+
+
+def test_release_immediately_after_start(monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(warmup, "async_playwright", lambda: driver)
+
+    async def scenario():
+        warm = BrowserWarmup(CONFIG).start()
+        await warm.release()
+        await warm.release()  # Safe to call twice
+        return warm
+
+    run_with_deadline(scenario())
+    assert driver.connection is None or driver.stopped
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from work_queue import SQLiteWorkQueue, WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.enqueue("job", ["a", "b"])
+    return queue
+
+
+def test_workers_claim_different_tasks_in_manifest_order(queue):
+    first = queue.lease("job", "w1")
+    second = queue.lease("job", "w2")
+
+    assert (first.url, first.lease_owner) == ("a", "w1")
+    assert (second.url, second.lease_owner) == ("b", "w2")
+    assert queue.lease("job", "w3") is None
+    assert queue.stats("job") == {"leased": 2}
+
+
+def test_renewed_lease_is_not_reclaimed(queue):
+    task = queue.lease("job", "w1", lease_seconds=0.5)
+    assert queue.renew(task, lease_seconds=60)
+    time.sleep(0.6)
+
+    assert queue.lease("job", "w2").url == "b"
+    assert queue.complete(task, {"name": "A"})
+
+
+def test_expired_lease_is_reclaimed_and_fenced(queue):
+    stale = queue.lease("job", "w1", lease_seconds=-1)
+    reclaimed = queue.lease("job", "w2")
+
+    assert reclaimed.url == stale.url == "a"
+    assert reclaimed.attempts == 2
+    # The first worker finds out it lost the lease and changes nothing
+    assert not queue.renew(stale)
+    assert not queue.fail(stale, "late failure")
+    assert not queue.complete(stale, {"name": "stale"})
+    assert queue.stats("job") == {"leased": 1, "pending": 1}
+
+    assert queue.complete(reclaimed, {"name": "A"})
+    assert queue.results("job") == [{"name": "A"}]
+
+
+def test_task_fails_after_max_attempts(queue):
+    queue.lease("job", "w1", lease_seconds=-1)
+    queue.lease("job", "w2", lease_seconds=-1)
+
+    # Both attempts expired: "a" is failed and "b" is handed out instead
+    assert queue.lease("job", "w3").url == "b"
+    assert queue.stats("job") == {"failed": 1, "leased": 1}
+
+
+def test_backend_missing_a_method_fails_when_created():
+    class PartialQueue(WorkQueue):
+        def enqueue(self, job_id, urls):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialQueue()
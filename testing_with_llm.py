@@ -1,19 +1,20 @@
 import google.generativeai as genai
+import asyncio
 import os
 import json
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 
+from planner import build_planner
+
 # --- 1. Configuration ---
 load_dotenv()
 API_KEY = os.getenv('GOOGLE_API_KEY')
 
-if not API_KEY:
-    print("Error: GOOGLE_API_KEY not found in environment variables.")
-    # Handle the error appropriately, e.g., exit or raise an exception
-    exit() # Or raise ValueError("GOOGLE_API_KEY not set.")
-
-genai.configure(api_key=API_KEY)
+if API_KEY:
+    genai.configure(api_key=API_KEY)
+else:
+    print("GOOGLE_API_KEY not found in environment variables; using the rule-based planner.")
 
 # --- 2. Define Tool Schemas (Functions the LLM can 'call') ---
 
@@ -63,13 +64,26 @@ prepare_whatsapp_message_func = {
 }
 
 
-# --- 3. Initialize the LLM Model with Tools ---
-# Use a model that supports function calling, like Gemini 1.5 Flash or Pro
-# Adjust model name if needed (e.g., 'gemini-1.5-pro-latest')
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    tools=[search_Maps_func, prepare_whatsapp_message_func]
-)
+# --- 3. Choose the Planner Backend ---
+# PLANNER_BACKEND=gemini|http|rules (default: gemini when a key is set), PLANNER_URL for
+# the local HTTP planner, PLANNER_BUDGET_S for a per-request latency budget
+def build_prompt(user_input: str) -> str:
+    return f"""Analyze the following user request for lead generation. Determine the required actions (search Google Maps, send WhatsApp message, or both). Extract all necessary parameters for the corresponding functions.
+
+        User Request: "{user_input}"
+
+        Based on the request, identify the function(s) to call and the arguments for each. If the user wants to send a message based on search results, first call 'search_Maps' and then 'prepare_whatsapp_message'. If they only want to send a message to specific numbers, only call 'prepare_whatsapp_message' with the 'target_numbers'. If they only want to search, only call 'search_Maps'.
+        """
+
+
+planner = build_planner(
+    os.getenv("PLANNER_BACKEND"),
+    tools=[search_Maps_func, prepare_whatsapp_message_func],
+    build_prompt=build_prompt,
+    api_key=API_KEY,
+    url=os.getenv("PLANNER_URL"),
+    model_name="gemini-1.5-flash-latest")
+PLANNER_BUDGET_S = float(os.getenv("PLANNER_BUDGET_S", 0)) or None
 
 
 # --- 4. LLM Interaction Function ---
@@ -88,46 +102,19 @@ def get_agent_plan(user_input: str) -> List[Dict[str, Any]]:
     """
     planned_calls = []
     try:
-        # Start a chat session to maintain context if needed, though for single turn it's simple
-        chat = model.start_chat()
-
-        # Send the user input to the LLM
-        prompt = f"""Analyze the following user request for lead generation. Determine the required actions (search Google Maps, send WhatsApp message, or both). Extract all necessary parameters for the corresponding functions.
-
-        User Request: "{user_input}"
-
-        Based on the request, identify the function(s) to call and the arguments for each. If the user wants to send a message based on search results, first call 'search_Maps' and then 'prepare_whatsapp_message'. If they only want to send a message to specific numbers, only call 'prepare_whatsapp_message' with the 'target_numbers'. If they only want to search, only call 'search_Maps'.
-        """
-        response = chat.send_message(prompt)
-
-        # --- 5. Parse LLM Response for Function Calls ---
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if part.function_call:
-                    call = part.function_call
-                    function_name = call.name
-                    args = {key: value for key, value in call.args.items()}
-
-                    # Basic validation/Defaults (optional based on schema)
-                    if function_name == "search_Maps" and "num_results" not in args:
-                         args["num_results"] = 20 # Set default if LLM didn't
-
-                    planned_calls.append({
-                        "function_name": function_name,
-                        "args": args
-                    })
-                    print(f"LLM wants to call: {function_name} with args: {args}") # Debug print
+        planned_calls, text = asyncio.run(planner.plan_within(user_input, PLANNER_BUDGET_S))
+        for call in planned_calls:
+            print(f"Planner ({planner.name}) wants to call: {call['function_name']} with args: {call['args']}") # Debug print
 
         if not planned_calls:
-             # Handle cases where the LLM responded with text instead of a function call
+             # Handle cases where the planner responded with text instead of a function call
              # This might happen if the request is unclear, or purely conversational.
-             print("LLM did not suggest a specific function call. Response text:")
-             print(response.text)
-
+             print("Planner did not suggest a specific function call. Response text:")
+             print(text)
 
     except Exception as e:
         print(f"An error occurred during LLM interaction: {e}")
-        # Handle exceptions (e.g., API errors, network issues)
+        # Handle exceptions (e.g., API errors, network issues, budget exceeded)
 
     return planned_calls
 
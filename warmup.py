@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+import logging
+
+from playwright.async_api import async_playwright
+
+from metrics import registry, span
+
+
+class BrowserWarmup:
+    """
+    Launches a browser and loads Google Maps speculatively, while the LLM plans.
+
+    start() begins the warm-up in the background as soon as a request is
+    submitted. If the plan contains a search, the scraper claim()s the warmed
+    page and skips its own launch and page load; otherwise release() closes the
+    browser. Only one scrape can claim the page.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.claimed = False
+        self._task = None
+        self._starting = None
+        self._playwright = None
+        self._browser = None
+        self._page = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._warm())
+        return self
+
+    async def _warm(self):
+        with span("browser_warmup"):
+            # The driver start is shielded: cancelling it half way leaks the driver's
+            # connection tasks and hangs the event loop on shutdown. release() waits
+            # for it instead and stops the driver once it is up.
+            self._starting = asyncio.ensure_future(async_playwright().start())
+            self._playwright = await asyncio.shield(self._starting)
+            self._browser = await self._playwright.chromium.launch(headless=self.config.headless)
+            context = await self._browser.new_context()
+            self._page = await context.new_page()
+            await self._page.goto(self.config.maps_url, timeout=self.config.navigation_timeout_ms)
+            await self._page.wait_for_timeout(self.config.page_load_wait_ms)
+
+    def _matches(self, config):
+        return (config.maps_url == self.config.maps_url
+                and config.headless == self.config.headless)
+
+    async def claim(self, config):
+        """
+        Waits for the warm-up to finish and returns its Maps page, or None if the
+        warm-up failed, was already claimed or was made for a different config.
+        """
+        if self._task is None or self.claimed:
+            return None
+        self.claimed = True
+        if not self._matches(config):
+            registry.inc("browser_warmups_total", outcome="mismatch")
+            await self.release()
+            return None
+        try:
+            await self._task
+        except Exception as e:
+            logging.warning(f"Browser warm-up failed, launching a fresh browser: {e}")
+            registry.inc("browser_warmups_total", outcome="failed")
+            await self.release()
+            return None
+        registry.inc("browser_warmups_total", outcome="used")
+        return self._page
+
+    async def release(self):
+        """Stops the warm-up if it is still running and closes its browser; safe to call twice"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._task
+            registry.inc("browser_warmups_total", outcome="cancelled")
+        elif self._task is not None and not self.claimed:
+            registry.inc("browser_warmups_total", outcome="unused")
+            if not self._task.cancelled() and self._task.exception():
+                logging.warning(f"Unused browser warm-up had failed: {self._task.exception()}")
+        self.claimed = True
+        if self._playwright is None and self._starting is not None and not self._starting.cancelled():
+            with contextlib.suppress(Exception):
+                self._playwright = await self._starting
+        self._starting = None
+        if self._browser is not None:
+            with contextlib.suppress(Exception):
+                await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            with contextlib.suppress(Exception):
+                await self._playwright.stop()
+            self._playwright = None
+        self._page = None
@@ -0,0 +1,249 @@
+import abc
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Task:
+    """One place URL leased to a detail worker"""
+    task_id: int
+    job_id: str
+    position: int   # Index in the harvest manifest, used to keep results in order
+    url: str
+    attempts: int
+    lease_owner: str = None
+
+
+class WorkQueue(abc.ABC):
+    """
+    Interface for the detail-phase work queue.
+
+    Implementations must make lease() atomic across processes and machines: a
+    task is handed to one worker at a time, and returns to the queue when its
+    lease expires without complete() or fail() being called.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, job_id, urls):
+        """Adds the manifest URLs for job_id"""
+
+    @abc.abstractmethod
+    def lease(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Returns the next Task for job_id, or None if nothing is available right now"""
+
+    @abc.abstractmethod
+    def renew(self, task, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extends the task's lease; returns False if the lease was lost to another worker"""
+
+    @abc.abstractmethod
+    def complete(self, task, result):
+        """Stores the result; returns False if the task's lease was lost to another worker"""
+
+    @abc.abstractmethod
+    def fail(self, task, error):
+        """Releases the task for a retry; returns False if its lease was lost to another worker"""
+
+    @abc.abstractmethod
+    def stats(self, job_id):
+        """Returns {status: count} for job_id"""
+
+    @abc.abstractmethod
+    def results(self, job_id):
+        """Returns the result dicts of finished tasks in manifest order"""
+
+    def is_finished(self, job_id):
+        stats = self.stats(job_id)
+        return stats.get("pending", 0) == 0 and stats.get("leased", 0) == 0
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Work queue stored in a single SQLite file.
+
+    Safe for many worker processes on one machine (or on a shared volume with
+    working file locks). Leases are claimed inside an IMMEDIATE transaction so
+    two workers never get the same task.
+    """
+
+    def __init__(self, path="output/work_queue.db", max_attempts=DEFAULT_MAX_ATTEMPTS):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at TEXT,
+                    UNIQUE (job_id, url)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_job_status "
+                         "ON tasks (job_id, status)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now().isoformat(timespec="seconds")
+
+    def enqueue(self, job_id, urls):
+        """Adds the manifest URLs for job_id; URLs already queued are ignored"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (job_id, position, url, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(job_id, position, url, self._now()) for position, url in enumerate(urls)])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def lease(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Expired leases go back to the pool (or fail if out of attempts)
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, error = COALESCE(error, 'lease expired') "
+                "WHERE job_id = ? AND status = 'leased' AND lease_expires < ?",
+                (self.max_attempts, job_id, now))
+            row = conn.execute(
+                "SELECT task_id, position, url, attempts FROM tasks "
+                "WHERE job_id = ? AND status = 'pending' ORDER BY position LIMIT 1",
+                (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            task_id, position, url, attempts = row
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated_at = ? WHERE task_id = ?",
+                (worker_id, now + lease_seconds, self._now(), task_id))
+            conn.execute("COMMIT")
+            return Task(task_id=task_id, job_id=job_id, position=position, url=url,
+                        attempts=attempts + 1, lease_owner=worker_id)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # renew(), complete() and fail() only touch a task this worker still holds: once
+    # a lease expires and the task is re-leased, the late worker's update must not
+    # clobber it
+
+    def renew(self, task, lease_seconds=DEFAULT_LEASE_SECONDS):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE task_id = ? AND lease_owner = ? AND status = 'leased' AND lease_expires >= ?",
+                (time.time() + lease_seconds, self._now(), task.task_id, task.lease_owner,
+                 time.time()))
+        finally:
+            conn.close()
+        return self._check_lease(cursor, task)
+
+    def complete(self, task, result):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "updated_at = ? WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+                (json.dumps(result), self._now(), task.task_id, task.lease_owner))
+        finally:
+            conn.close()
+        return self._check_lease(cursor, task)
+
+    def fail(self, task, error):
+        """Returns the task to the queue for a retry, or marks it failed after max_attempts"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+                (self.max_attempts, str(error), self._now(), task.task_id, task.lease_owner))
+        finally:
+            conn.close()
+        return self._check_lease(cursor, task)
+
+    @staticmethod
+    def _check_lease(cursor, task):
+        if cursor.rowcount == 0:
+            logging.warning(f"Lease on {task.url} held by {task.lease_owner} was lost "
+                            f"(expired or re-leased); update ignored.")
+            return False
+        return True
+
+    def stats(self, job_id):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status",
+                (job_id,)).fetchall()
+        finally:
+            conn.close()
+        return dict(rows)
+
+    def results(self, job_id):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT result FROM tasks WHERE job_id = ? AND status = 'done' ORDER BY position",
+                (job_id,)).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(result) for (result,) in rows]
+
+
+def new_job_id(search_term):
+    slug = "_".join(search_term.lower().split())[:30].replace("/", "_")
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{slug}_{uuid.uuid4().hex[:6]}"
+
+
+def write_manifest(search_term, hrefs, job_id, directory="output/manifests"):
+    """Saves the harvest-phase manifest of place URLs and returns its path"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, f"{job_id}.json")
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump({"job_id": job_id, "search_term": search_term,
+                   "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "hrefs": hrefs}, fp, indent=2)
+    logging.info(f"Wrote manifest with {len(hrefs)} places to {path}")
+    return path
+
+
+def read_manifest(path):
+    with open(path, "r", encoding="utf-8") as fp:
+        return json.load(fp)